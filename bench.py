@@ -0,0 +1,465 @@
+"""Micro-benchmarks : feed, indicateurs, fit quantique, IPC chart, runtime (uvloop, orjson).
+
+    python bench.py run --out bench.json             # toutes les mesures
+    python bench.py run --only quantum --quick       # filtre sur le nom, mesures courtes
+    python bench.py compare baseline.json bench.json --threshold 0.10
+
+Données synthétiques à graine fixe (`--seed`) : mêmes prix, mêmes trades à
+chaque lancement. Chaque mesure est calibrée pour durer ~`--target` s,
+répétée `--repeat` fois ; on garde médiane et min en ns/op. `compare` sort
+en code 1 si une médiane dépasse la référence de plus de `threshold`.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from utils.logger import log
+
+_BENCHMARKS: dict = {}
+
+
+def bench(name: str):
+    """Enregistre `setup(rng) -> run(n)` ; `run(n)` exécute n opérations."""
+    def register(setup):
+        _BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _prices(rng, n: int, start: float = 50_000.0) -> np.ndarray:
+    """Marche aléatoire log-normale (volatilité ~ BTC en 1s)."""
+    return start * np.exp(np.cumsum(rng.normal(0, 2e-4, n)))
+
+
+# ── Feed ──
+
+def _feed(with_callbacks: bool):
+    from bot.data import LiveFeed
+    feed = LiveFeed.__new__(LiveFeed)          # pas de client ccxt.pro
+    feed.symbol, feed.candle_seconds = "BTC/USDT", 10
+    feed._current, feed.candles, feed._recv, feed.bus = None, [], None, None
+    feed.on_update = feed.on_new_candle = feed.on_trade = None
+    if with_callbacks:
+        feed.on_update = lambda candle: None
+        feed.on_new_candle = lambda candle: None
+        feed.on_trade = lambda price, amount, ts: None
+    return feed
+
+
+def _bus(feed):
+    """Câblage de main.py : 3 abonnés trade, 2 candle_update coalescés, dispatch par lots."""
+    from bot.bus import EventBus, Trade, CandleUpdate, CandleClose
+    bus = EventBus(slice_ms=1000)
+    for name in ("paper", "strategies", "recorder"):
+        bus.subscribe(Trade, lambda e: None, name=name)
+    bus.subscribe(CandleClose, lambda e: None, name="strategies")
+    bus.subscribe(CandleUpdate, lambda e: None, name="pnl", coalesce=lambda e: e.symbol)
+    bus.subscribe(CandleUpdate, lambda e: None, name="charts",
+                  coalesce=lambda e: (e.symbol, e.candle["_ms"]))
+    feed.bus = bus
+    return bus
+
+
+def _trade_loop(with_callbacks: bool, with_bus: bool = False):
+    def setup(rng):
+        feed = _feed(with_callbacks)
+        bus = _bus(feed) if with_bus else None
+        prices = _prices(rng, 100_000).tolist()
+        amounts = rng.exponential(0.01, 100_000).tolist()
+        # ~50 trades/s → une bougie 10s ferme tous les ~500 trades
+        stamps = (1_700_000_000_000 + np.cumsum(rng.exponential(20, 100_000))).astype(np.int64).tolist()
+
+        def run(n):
+            process, size = feed._process_trade, len(prices)
+            for i in range(n):
+                j = i % size
+                process(prices[j], amounts[j], stamps[j])
+                if bus is not None and not i & 63:
+                    bus._dispatch()       # le dispatcher passe ~tous les 64 trades
+            if bus is not None:
+                bus._dispatch()
+            if len(feed.candles) > 10_000:
+                feed.candles.clear()      # mesure le traitement, pas la croissance de la liste
+        return run
+    return setup
+
+
+bench("feed.process_trade")(_trade_loop(False))
+bench("feed.process_trade+callbacks")(_trade_loop(True))
+bench("feed.process_trade+bus")(_trade_loop(False, with_bus=True))
+
+
+# ── Indicateurs classiques ──
+
+def _classic(factory, method: str):
+    def setup(rng):
+        ind = factory()
+        closes = _prices(rng, 10_000).tolist()
+        for c in closes[:500]:
+            ind.update(c)
+
+        def run(n):
+            fn, size = getattr(ind, method), len(closes)
+            for i in range(n):
+                fn(closes[i % size])
+        return run
+    return setup
+
+
+def _register_classic():
+    from bot.indicators import EMA, RSI, MACD
+    for label, factory in (("ema21", lambda: EMA(21)), ("rsi14", lambda: RSI(14)),
+                           ("macd12_26_9", lambda: MACD(12, 26, 9))):
+        for method in ("update", "compute_next"):
+            bench(f"indicator.{label}.{method}")(_classic(factory, method))
+
+
+_register_classic()
+
+
+# ── Quantum ──
+
+_LOOKBACKS = (100, 200, 500)
+_MAX_NS = (2, 4, 8)
+
+
+def _quantum_update(lookback: int, max_n: int):
+    def setup(rng):
+        from bot.indicators import QuantumIndicator
+        q = QuantumIndicator(lookback=lookback, max_n=max_n)
+        closes = _prices(rng, lookback + 5_000).tolist()
+        volumes = rng.exponential(1.0, len(closes)).tolist()
+        for c, v in zip(closes[:lookback + 150], volumes[:lookback + 150]):
+            q.update(c, v)
+
+        def run(n):
+            size = len(closes)
+            for i in range(n):
+                j = i % size
+                q.update(closes[j], volumes[j])
+        return run
+    return setup
+
+
+def _quantum_fit(lookback: int, max_n: int):
+    def setup(rng):
+        from bot.indicators import QuantumIndicator
+        q = QuantumIndicator(lookback=lookback, max_n=max_n)
+        returns = rng.normal(0, 1e-3, lookback)
+
+        def run(n):
+            for _ in range(n):
+                q._fit_eigenstate(returns)
+        return run
+    return setup
+
+
+def _phase_grid(level: int):
+    def setup(rng):
+        from bot.indicators import QuantumIndicator
+        q = QuantumIndicator()
+        q.energy_level = level
+
+        def run(n):
+            for _ in range(n):
+                q._compute_phase_grid()
+        return run
+    return setup
+
+
+for _lb in _LOOKBACKS:
+    for _mn in _MAX_NS:
+        bench(f"quantum.update[lookback={_lb},max_n={_mn}]")(_quantum_update(_lb, _mn))
+        bench(f"quantum.fit_eigenstate[lookback={_lb},max_n={_mn}]")(_quantum_fit(_lb, _mn))
+for _n in (0, 2, 4, 8):
+    bench(f"quantum.phase_grid[n={_n}]")(_phase_grid(_n))
+
+
+# ── IPC chart (mp.Queue, messages bougie réels) ──
+
+def _echo(inbox, outbox):
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            return
+        outbox.put(msg)
+
+
+def _drain(inbox, outbox):
+    count = 0
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            outbox.put(count)
+            return
+        if msg == "sync":
+            outbox.put(count)
+            count = 0
+            continue
+        count += 1
+
+
+def _candle_msg(price: float) -> tuple:
+    return ("candle", {"time": datetime.now(timezone.utc), "_ms": 1_700_000_000_000,
+                       "open": price, "high": price, "low": price, "close": price,
+                       "volume": 1.5, "_trace": (1_700_000_000_000, 1.0, 2.0, 3.0, 4.0)})
+
+
+def _ipc(target, roundtrip: bool):
+    def setup(rng):
+        inbox, outbox = mp.Queue(), mp.Queue()
+        proc = mp.Process(target=target, args=(inbox, outbox), daemon=True)
+        proc.start()
+        msgs = [_candle_msg(p) for p in _prices(rng, 1_000).tolist()]
+
+        def run(n):
+            if roundtrip:
+                for i in range(n):
+                    inbox.put(msgs[i % len(msgs)])
+                    outbox.get()
+            else:
+                for i in range(n):
+                    inbox.put(msgs[i % len(msgs)])
+                inbox.put("sync")
+                outbox.get()                  # tout a été reçu et dépicklé
+        run.close = lambda: (inbox.put(None), proc.join(2))
+        return run
+    return setup
+
+
+bench("ipc.queue.roundtrip")(_ipc(_echo, True))
+bench("ipc.queue.throughput")(_ipc(_drain, False))
+
+
+# ── Runtime : boucle (asyncio / uvloop) et JSON (json / orjson) ──
+
+def _loop_factories() -> dict:
+    import asyncio
+    from utils import speedups
+    factories = {"asyncio": asyncio.new_event_loop}
+    if speedups.uvloop is not None:
+        factories["uvloop"] = speedups.uvloop.new_event_loop
+    return factories
+
+
+def _feed_pipeline(loop_factory):
+    """Chaîne du process principal : lecteur ws (8 trades par message) → asyncio.Queue
+    → feed → bus, dispatcher dans sa tâche. Mesure le coût par trade, ordonnancement compris."""
+    def setup(rng):
+        import asyncio
+        feed = _feed(False)
+        bus = _bus(feed)
+        bus.slice = 0.005                          # réglage par défaut : tranches de 5ms
+        prices = _prices(rng, 100_000).tolist()
+        amounts = rng.exponential(0.01, 100_000).tolist()
+        stamps = (1_700_000_000_000 + np.cumsum(rng.exponential(20, 100_000))).astype(np.int64).tolist()
+        loop = loop_factory()
+
+        async def pipeline(n):
+            messages = asyncio.Queue(maxsize=64)
+            process, size = feed._process_trade, len(prices)
+
+            async def reader():
+                for i in range(0, n, 8):
+                    await messages.put(i)
+                await messages.put(None)
+
+            async def consumer():
+                while (i := await messages.get()) is not None:
+                    for j in range(i, min(i + 8, n)):
+                        k = j % size
+                        process(prices[k], amounts[k], stamps[k])
+                    await asyncio.sleep(0)         # rend la main comme un `await ws.recv()`
+
+            dispatcher = asyncio.create_task(bus.run())
+            await asyncio.gather(reader(), consumer())
+            dispatcher.cancel()
+            await asyncio.gather(dispatcher, return_exceptions=True)
+            bus._dispatch()
+            if len(feed.candles) > 10_000:
+                feed.candles.clear()
+
+        def run(n):
+            loop.run_until_complete(pipeline(n))
+        run.close = loop.close
+        return run
+    return setup
+
+
+def _compass_frame(rng) -> dict:
+    """Frame envoyée au JS à chaque rendu du compass (distribution + tick + phase)."""
+    import base64
+    f32 = lambda a: base64.b64encode(np.ascontiguousarray(a, dtype="<f4").tobytes()).decode("ascii")
+    return {"dist": {"n": 3, "omega": float(rng.normal()), "sigma": float(rng.exponential()),
+                     "fit_quality": float(rng.random()), "r_grid": f32(np.linspace(-0.01, 0.01, 200)),
+                     "fitted_pdf": f32(rng.random(200)), "hist_counts": f32(rng.random(50)),
+                     "hist_edges": f32(np.linspace(-0.01, 0.01, 51))},
+            "tick": float(rng.normal(0, 1e-3)), "phase": float(rng.uniform(0, 6.28))}
+
+
+def _trace_line(rng) -> dict:
+    """Ligne JSONL d'export trace (4 étapes : résumé + histogramme)."""
+    from utils.metrics import LatencyStats
+    from utils.trace import BUCKETS_MS
+    stages = {}
+    for name in ("exchange", "recv", "queue", "render"):
+        stats = LatencyStats()
+        for v in rng.exponential(0.002, 2_000).tolist():
+            stats.add(v)
+        stages[name] = {**stats.summary(), "buckets": stats.histogram(BUCKETS_MS)}
+    return {"role": "main", "pid": 1234, "time": time.time(), "buckets_ms": BUCKETS_MS, "stages": stages}
+
+
+def _json_dumps(make, backend: str):
+    def setup(rng):
+        from utils import speedups
+        payloads = [make(rng) for _ in range(16)]
+
+        def run(n):
+            speedups.configure({"orjson": backend == "orjson"})
+            dumps = speedups.dumps
+            for i in range(n):
+                dumps(payloads[i & 15])
+            speedups.configure(None)
+        return run
+    return setup
+
+
+def _register_runtime():
+    from utils import speedups
+    for label, factory in _loop_factories().items():
+        bench(f"runtime.feed_pipeline[{label}]")(_feed_pipeline(factory))
+    for backend in ("json", "orjson") if speedups.orjson is not None else ("json",):
+        bench(f"runtime.json.compass_frame[{backend}]")(_json_dumps(_compass_frame, backend))
+        bench(f"runtime.json.trace_line[{backend}]")(_json_dumps(_trace_line, backend))
+
+
+_register_runtime()
+
+
+# ── Exécution ──
+
+def _measure(run, target: float, repeat: int) -> dict:
+    n = 1
+    while True:                       # calibrage : n tel qu'une passe dure ~target
+        start = time.perf_counter()
+        run(n)
+        elapsed = time.perf_counter() - start
+        if elapsed >= target / 4 or n >= 10_000_000:
+            break
+        n *= 2 if elapsed <= 0 else max(2, min(10, int(target / 4 / elapsed) + 1))
+    n = max(1, int(n * target / max(elapsed, 1e-9)))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(n)
+        samples.append((time.perf_counter() - start) / n * 1e9)
+    median = statistics.median(samples)
+    return {"ns_per_op": median, "min_ns": min(samples), "max_ns": max(samples),
+            "ops_per_s": 1e9 / median, "n": n, "repeat": repeat}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_all(only: str | None = None, seed: int = 42, target: float = 0.2, repeat: int = 5) -> dict:
+    results = {}
+    for name, setup in _BENCHMARKS.items():
+        if only and not re.search(only, name):
+            continue
+        run = setup(np.random.default_rng(seed))
+        try:
+            results[name] = _measure(run, target, repeat)
+        finally:
+            if hasattr(run, "close"):
+                run.close()
+        r = results[name]
+        log.info(f"[BENCH] {name:<45} {r['ns_per_op'] / 1000:>10.2f} µs/op "
+                 f"(min {r['min_ns'] / 1000:.2f}, {r['ops_per_s']:,.0f} op/s)")
+    return {
+        "meta": {"time": datetime.now(timezone.utc).isoformat(), "commit": _git_commit(),
+                 "python": platform.python_version(), "numpy": np.__version__,
+                 "machine": platform.machine(), "cpu_count": os.cpu_count(),
+                 "platform": platform.platform(), "seed": seed, "target": target,
+                 "repeat": repeat},
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list[str]:
+    """Liste des benchmarks en régression (médiane > référence × (1 + threshold))."""
+    for key in ("python", "numpy", "machine", "cpu_count"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            log.warning(f"[BENCH] {key} différent : {baseline['meta'].get(key)} → "
+                        f"{current['meta'].get(key)} (comparaison indicative)")
+    regressions = []
+    for name, cur in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            log.info(f"[BENCH] {name:<45} nouveau")
+            continue
+        ratio = cur["ns_per_op"] / base["ns_per_op"]
+        if ratio > 1 + threshold:
+            status = "RÉGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = "amélioration"
+        else:
+            status = "="
+        line = (f"[BENCH] {name:<45} {base['ns_per_op'] / 1000:>10.2f} → "
+                f"{cur['ns_per_op'] / 1000:>10.2f} µs/op  {ratio - 1:+7.1%}  {status}")
+        (log.warning if status == "RÉGRESSION" else log.info)(line)
+    for name in baseline["results"].keys() - current["results"].keys():
+        log.info(f"[BENCH] {name:<45} absent de la mesure courante")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TB - Micro-benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="Lance les benchmarks")
+    p_run.add_argument("--out", default="bench.json", help="Résultats JSON")
+    p_run.add_argument("--only", help="Regex sur le nom des benchmarks")
+    p_run.add_argument("--seed", type=int, default=42)
+    p_run.add_argument("--target", type=float, default=0.2, help="Durée visée par passe (s)")
+    p_run.add_argument("--repeat", type=int, default=5, help="Passes par benchmark")
+    p_run.add_argument("--quick", action="store_true", help="Passes courtes (--target 0.05 --repeat 3)")
+    p_cmp = sub.add_parser("compare", help="Compare à une référence")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Tolérance (0.10 = +10%%)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        target, repeat = (0.05, 3) if args.quick else (args.target, args.repeat)
+        report = run_all(args.only, args.seed, target, repeat)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        log.info(f"[BENCH] {len(report['results'])} résultats → {args.out}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            log.error(f"[BENCH] {len(regressions)} régression(s) > {args.threshold:.0%}")
+            sys.exit(1)
+        log.info("[BENCH] Aucune régression")
+
+
+if __name__ == "__main__":
+    main()
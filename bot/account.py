@@ -0,0 +1,77 @@
+import asyncio
+import ccxt.pro as ccxtpro
+from utils.logger import log
+
+
+class AccountStream:
+    """Flux privé user-data : ordres, fills et soldes poussés par l'exchange.
+
+    Trois boucles `watch_orders` / `watch_my_trades` / `watch_balance` qui
+    alimentent l'`OrderManager` (statuts des ordres, Trades, PNL) et son cache
+    de soldes. `client` est un `ccxt.pro.binance` authentifié (voir
+    `create_client`) ou un `PaperExchange`, qui expose les mêmes `watch_*`.
+    """
+    def __init__(self, client, order_manager, own_client: bool = True):
+        self.client = client
+        self.om = order_manager
+        self.own_client = own_client     # False : client partagé (PaperExchange), pas fermé ici
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def create_client(config: dict):
+        """Client websocket authentifié (mêmes clés / sandbox que l'Exchange REST)."""
+        params = {"apiKey": config["api_key"], "secret": config["secret"]}
+        if config.get("sandbox"):
+            params["sandbox"] = True
+        return ccxtpro.binance(params)
+
+    async def _watch(self, name: str, watch, handle):
+        """Boucle de réception avec reconnexion (backoff exponentiel plafonné)."""
+        backoff = 1.0
+        while True:
+            try:
+                handle(await watch())
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"[ACCOUNT] {name} interrompu: {e} — reconnexion dans {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _on_orders(self, orders: list):
+        for o in orders:
+            self.om.on_exchange_order(o)
+
+    def _on_trades(self, trades: list):
+        for t in trades:
+            self.om.on_exchange_trade(t)
+
+    def _on_balance(self, balance: dict):
+        self.om.balance_cache = balance
+
+    async def run(self):
+        # Soldes initiaux via REST (une seule fois), ensuite uniquement le flux
+        try:
+            self.om.balance_cache = await self.om.exchange.fetch_balance()
+        except Exception as e:
+            log.warning(f"[ACCOUNT] Soldes initiaux indisponibles: {e}")
+        log.info("[ACCOUNT] Flux user-data connecté (ordres, fills, soldes)")
+        await asyncio.gather(
+            self._watch("watch_orders", self.client.watch_orders, self._on_orders),
+            self._watch("watch_my_trades", self.client.watch_my_trades, self._on_trades),
+            self._watch("watch_balance", self.client.watch_balance, self._on_balance),
+        )
+
+    def start(self):
+        """Lance le flux hors de la liste des tâches : il reste actif pendant
+        la clôture des positions à l'arrêt."""
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self.own_client:
+            await self.client.close()
@@ -0,0 +1,339 @@
+"""Backtest d'une `Strategy` sur bougies historiques ou trades enregistrés.
+
+    python -m bot.backtest --strategy bot.my_strategy:MyStrategy --symbol BTC/USDT --days 365
+    python -m bot.backtest --strategy ... --symbol BTC/USDT --data .cache/trades/BTC_USDT-1s.bin --candle-seconds 120
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import time
+from pathlib import Path
+import numpy as np
+import ccxt
+from bot.history import OhlcvCache, aggregate, _NATIVE_TIMEFRAMES
+from bot.indicators import ema_series, rsi_series, macd_series, quantum_series
+from bot.orders import OrderManager
+from bot.paper import PaperExchange
+from bot.pnl import PnlEngine
+from bot.runtime import StrategyRuntime
+from utils.logger import log
+
+
+class Bars:
+    """Bougies historiques en colonnes numpy (time en secondes)."""
+    __slots__ = ("time", "open", "high", "low", "close", "volume", "seconds")
+    FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, array: np.ndarray, seconds: int):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        for i, field in enumerate(self.FIELDS):
+            setattr(self, field, array[:, i])
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.close)
+
+    def column(self, field: str, n: int | None = None) -> np.ndarray:
+        col = getattr(self, field)
+        return col if n is None else col[-n:]
+
+
+def load_bars(path: str | Path, candle_seconds: int | None = None) -> Bars:
+    """Charge des bougies : `.npy` (`OhlcvCache`, ts en ms), `.bin` (`TradeRecorder`,
+    barres 1s) ou `.csv` (ts, open, high, low, close, volume ; ts en s ou ms).
+    Regroupées en bougies de `candle_seconds` si demandé."""
+    path = Path(path)
+    if path.suffix == ".npy":
+        array = np.load(path)
+    elif path.suffix == ".bin":
+        array = np.fromfile(path, dtype=np.float64)
+        array = array[: len(array) - len(array) % 6].reshape(-1, 6)
+        array = array[array[:, 5] >= 0]          # marqueurs de session
+    else:
+        import pandas as pd
+        array = pd.read_csv(path).iloc[:, :6].to_numpy(dtype=np.float64)
+    array = array.copy()
+    if len(array) and array[0, 0] > 1e11:       # timestamps en ms
+        array[:, 0] /= 1000
+    seconds = int(np.median(np.diff(array[:, 0]))) if len(array) > 1 else 60
+    if candle_seconds and candle_seconds != seconds:
+        array = aggregate(array, candle_seconds)
+        seconds = candle_seconds
+    return Bars(array, seconds)
+
+
+def indicator_series(spec: tuple, bars: Bars):
+    """Série complète d'un indicateur déclaré par une stratégie, ex: ("ema", 21)."""
+    kind, *args = spec
+    if kind == "ema":
+        return ema_series(bars.close, *args)
+    if kind == "rsi":
+        return rsi_series(bars.close, *args)
+    if kind == "macd":
+        return macd_series(bars.close, *args)
+    if kind == "quantum":
+        return quantum_series(bars.close, bars.volume, *args)
+    raise ValueError(f"Indicateur inconnu: {kind}")
+
+
+class _NullWriter:
+    """Le backtest n'écrit rien en DB."""
+    def add_order(self, order):
+        pass
+
+    def add_fill(self, order, price, amount, fee):
+        pass
+
+    def update_order(self, order, **fields):
+        pass
+
+
+class SimOrderManager(OrderManager):
+    """`OrderManager` sur `PaperExchange`, sans DB ni chart ni log par fill.
+
+    Chaque exécution est journalisée avec l'index de la bougie courante (`bar`).
+    """
+    def __init__(self, exchange: PaperExchange):
+        super().__init__(exchange, pnl=PnlEngine(), writer=_NullWriter())
+        self.bar = 0
+        self.fills: list[tuple] = []        # (bar, side, price, amount, fee)
+
+    def _apply_fill(self, order, price: float, amount: float, fee: float = 0.0):
+        self.fills.append((self.bar, order.side, price, amount, fee))
+        self.pnl.on_fill(order.symbol, order.side, price, amount)
+
+
+def compute_stats(bars: Bars, fills: list[tuple], quote: float, base: float = 0.0) -> dict:
+    """Courbe d'equity, drawdown et statistiques de trades à partir des fills."""
+    n = len(bars)
+    d_pos = np.zeros(n)
+    d_cash = np.zeros(n)
+    for bar, side, price, amount, fee in fills:
+        sign = 1.0 if side == "buy" else -1.0
+        d_pos[bar] += sign * amount
+        d_cash[bar] -= sign * price * amount + fee
+    position = base + np.cumsum(d_pos)
+    equity = quote + np.cumsum(d_cash) + position * bars.close
+    peak = np.maximum.accumulate(equity)
+    drawdown = equity / peak - 1.0
+
+    # Trades aller-retour : de position nulle à position nulle
+    trades = []
+    pos = cost = 0.0
+    trade_pnl = 0.0
+    for bar, side, price, amount, fee in fills:
+        trade_pnl -= fee
+        if side == "buy":
+            cost += price * amount
+            pos += amount
+        else:
+            avg = cost / pos if pos > 0 else price
+            qty = min(amount, pos)
+            trade_pnl += (price - avg) * qty
+            cost -= avg * qty
+            pos -= qty
+            if pos <= 1e-12:
+                trades.append(trade_pnl)
+                pos = cost = trade_pnl = 0.0
+
+    pnl = np.asarray(trades)
+    returns = np.diff(equity) / equity[:-1] if n > 1 else np.zeros(0)
+    per_year = 365 * 86400 / bars.seconds
+    std = returns.std() if len(returns) else 0.0
+    gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    stats = {
+        "bars": n,
+        "start": float(bars.time[0]) if n else None,
+        "end": float(bars.time[-1]) if n else None,
+        "final_equity": float(equity[-1]) if n else quote,
+        "total_return": float(equity[-1] / equity[0] - 1) if n else 0.0,
+        "max_drawdown": float(drawdown.min()) if n else 0.0,
+        "sharpe": float(returns.mean() / std * math.sqrt(per_year)) if std > 0 else 0.0,
+        "fills": len(fills),
+        "fees": float(sum(f[4] for f in fills)),
+        "trades": len(pnl),
+        "win_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+        "avg_trade": float(pnl.mean()) if len(pnl) else 0.0,
+        "best_trade": float(pnl.max()) if len(pnl) else 0.0,
+        "worst_trade": float(pnl.min()) if len(pnl) else 0.0,
+        "profit_factor": float(gains / losses) if losses > 0 else float("inf") if gains > 0 else 0.0,
+        "exposure": float((position > 1e-12).mean()) if n else 0.0,
+    }
+    return {"equity": equity, "drawdown": drawdown, "stats": stats}
+
+
+class Backtester:
+    """Rejoue une `Strategy` sur des `Bars`.
+
+    - Chemin vectorisé : si la stratégie implémente `signals(bars, indicators)`
+      (position cible par bougie, NaN = inchangée), les séries d'indicateurs
+      sont calculées d'un bloc et seuls les changements de cible passent par
+      l'OrderManager simulé → des années de bougies 1m en quelques secondes.
+    - Chemin événementiel : sinon, `on_candle` / `on_tick` bougie par bougie
+      via `StrategyRuntime` (mêmes `RollingWindow` / `IndicatorSet` qu'en live).
+    Dans les deux cas, un ordre décidé à la clôture d'une bougie est exécuté
+    au prix d'ouverture de la suivante (pas de biais d'anticipation), par
+    `PaperExchange` (fees, soldes, carnet limit).
+    """
+    def __init__(self, strategy_cls, symbol: str, bars: Bars, params: dict | None = None,
+                 balances: dict | None = None, fee: float = 0.001, ticks: bool = True,
+                 series_cache: dict | None = None):
+        self.symbol = symbol
+        self.bars = bars
+        base, quote = symbol.split("/")
+        self.balances = balances or {quote: 10_000.0}
+        self._base, self._quote = base, quote
+        self.exchange = PaperExchange({"balances": self.balances, "maker_fee": fee,
+                                       "taker_fee": fee}, [symbol])
+        self.om = SimOrderManager(self.exchange)
+        self.strategy = strategy_cls(self.om, **(params or {}))
+        self.ticks = ticks
+        self.rejected = 0
+        self._series_cache = series_cache if series_cache is not None else {}
+
+    def _series(self, spec: tuple):
+        spec = tuple(spec)
+        if spec not in self._series_cache:
+            self._series_cache[spec] = indicator_series(spec, self.bars)
+        return self._series_cache[spec]
+
+    def _ts_ms(self, i: int) -> int:
+        return int(self.bars.time[i] * 1000)
+
+    async def _target(self, i: int, target: float):
+        """Exécute à l'ouverture de la bougie `i` l'ordre qui amène la position à `target`."""
+        self.om.bar = i
+        self.exchange.on_trade(self.symbol, float(self.bars.open[i]), None, self._ts_ms(i))
+        delta = target - self.om.pnl.pair(self.symbol).position
+        if abs(delta) < 1e-12:
+            return
+        try:
+            if delta > 0:
+                await self.om.buy(self.symbol, delta)
+            else:
+                await self.om.sell(self.symbol, -delta)
+        except ccxt.BaseError as e:
+            self.rejected += 1
+            log.debug(f"[BACKTEST] Ordre rejeté bougie {i}: {e}")
+
+    async def _run_vectorized(self, signals):
+        n = len(self.bars)
+        target = np.asarray(signals, dtype=np.float64)
+        # NaN = position inchangée → propagation de la dernière cible définie
+        defined = ~np.isnan(target)
+        idx = np.maximum.accumulate(np.where(defined, np.arange(n), -1))
+        initial = self.balances.get(self._base, 0.0)
+        target = np.where(idx >= 0, target[np.maximum(idx, 0)], initial)
+        for i in np.flatnonzero(np.diff(target, prepend=initial)):
+            if i + 1 >= n:
+                break
+            await self._target(int(i) + 1, float(target[i]))
+
+    async def _drain(self):
+        while self.strategy._orders:
+            await asyncio.sleep(0)
+
+    async def _run_events(self):
+        bars, sym, paper = self.bars, self.symbol, self.exchange
+        runtime = StrategyRuntime(budget_ms=math.inf, window=min(len(bars), 5000) or 1)
+        runtime.register(self.strategy, [sym])
+        o, h, l, c, v = (bars.open.tolist(), bars.high.tolist(), bars.low.tolist(),
+                         bars.close.tolist(), bars.volume.tolist())
+        for i in range(len(bars)):
+            ts = self._ts_ms(i)
+            self.om.bar = i
+            paper.on_trade(sym, o[i], None, ts)
+            if self.strategy._orders:
+                await self._drain()          # ordres de la bougie précédente → ouverture
+            # Chemin intra-bougie pour les ordres limit : open → extrême le plus proche → l'autre → close
+            first, second = (l[i], h[i]) if c[i] >= o[i] else (h[i], l[i])
+            paper.on_trade(sym, first, None, ts)
+            paper.on_trade(sym, second, None, ts)
+            paper.on_trade(sym, c[i], None, ts)
+            if self.ticks:
+                runtime.on_trade(sym, c[i], v[i], ts)
+            runtime.on_candle(sym, {"_ms": ts, "open": o[i], "high": h[i], "low": l[i],
+                                    "close": c[i], "volume": v[i]})
+        await self._drain()
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        indicators = {name: self._series(spec) for name, spec in self.strategy.indicators.items()}
+        signals = self.strategy.signals(self.bars, indicators)
+        mode = "vectorisé" if signals is not None else "événementiel"
+        if signals is not None:
+            await self._run_vectorized(signals)
+        else:
+            await self._run_events()
+        result = compute_stats(self.bars, self.om.fills, self.balances.get(self._quote, 0.0),
+                               self.balances.get(self._base, 0.0))
+        result["stats"].update(mode=mode, rejected=self.rejected,
+                               elapsed=time.perf_counter() - start)
+        return result
+
+
+def format_stats(stats: dict) -> str:
+    return (f"{stats['bars']} bougies ({stats['mode']}, {stats['elapsed']:.2f}s) — "
+            f"rendement {stats['total_return'] * 100:+.2f}% | DD max {stats['max_drawdown'] * 100:.2f}% | "
+            f"Sharpe {stats['sharpe']:.2f} | {stats['trades']} trades "
+            f"(win {stats['win_rate'] * 100:.0f}%, PF {stats['profit_factor']:.2f}) | "
+            f"fees {stats['fees']:.2f} | rejets {stats['rejected']}")
+
+
+def load_strategy(path: str):
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+async def _download(symbol: str, candle_seconds: int, days: float, cache_dir: Path) -> Bars:
+    """Bougies Binance depuis `days` jours (cache disque incrémental dédié aux backtests)."""
+    import ccxt.async_support as ccxt_async
+    timeframe = _NATIVE_TIMEFRAMES.get(candle_seconds, "1m")
+    client = ccxt_async.binance()
+    try:
+        since = int((time.time() - days * 86400) * 1000)
+        array = await OhlcvCache(cache_dir).fetch_range(client, symbol, timeframe, since)
+    finally:
+        await client.close()
+    array = array.copy()
+    array[:, 0] /= 1000
+    if timeframe != _NATIVE_TIMEFRAMES.get(candle_seconds):
+        array = aggregate(array, candle_seconds)
+    return Bars(array, candle_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TB - Backtest d'une stratégie")
+    parser.add_argument("--strategy", required=True, help="module:Classe (ex: bot.my_strategy:MyStrategy)")
+    parser.add_argument("--symbol", required=True)
+    parser.add_argument("--data", help="Fichier .npy / .bin / .csv (sinon téléchargement Binance)")
+    parser.add_argument("--days", type=float, default=30, help="Historique à télécharger (jours)")
+    parser.add_argument("--candle-seconds", type=int, default=60)
+    parser.add_argument("--params", default="{}", help="Paramètres de la stratégie (JSON)")
+    parser.add_argument("--balance", type=float, default=10_000.0, help="Solde initial en quote")
+    parser.add_argument("--fee", type=float, default=0.001)
+    parser.add_argument("--no-ticks", action="store_true", help="Chemin événementiel sans on_tick")
+    parser.add_argument("--out", help="Fichier JSON des stats (+ .npy de l'equity à côté)")
+    args = parser.parse_args()
+
+    if args.data:
+        bars = load_bars(args.data, args.candle_seconds)
+    else:
+        cache_dir = Path(__file__).parent.parent / ".cache" / "backtest"
+        bars = asyncio.run(_download(args.symbol, args.candle_seconds, args.days, cache_dir))
+
+    quote = args.symbol.split("/")[1]
+    bt = Backtester(load_strategy(args.strategy), args.symbol, bars, json.loads(args.params),
+                    balances={quote: args.balance}, fee=args.fee, ticks=not args.no_ticks)
+    result = asyncio.run(bt.run())
+    log.info(f"[BACKTEST {args.symbol}] {format_stats(result['stats'])}")
+    if args.out:
+        out = Path(args.out)
+        out.write_text(json.dumps(result["stats"], indent=2))
+        np.save(out.with_suffix(".equity.npy"), result["equity"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""Bus d'événements en process : topics typés, une file par abonné, coalescing, priorités.
+
+Le feed ne fait que publier : `publish()` dépose l'événement dans la file de
+chaque abonné du topic, aucun handler n'est appelé. Un dispatcher asyncio
+draine ensuite les abonnés prêts par priorité décroissante, par tranches de
+`slice_ms`, puis rend la main à la boucle (websockets, feeds). Un abonné lent
+n'accumule que sa propre file (bornée, ou coalescée) ; s'il bloque, il passe
+en `threaded=True` (thread dédié) ou en handler coroutine (tâche dédiée).
+
+Politiques de file (`coalesce`) :
+- None     : FIFO bornée à `max_queue`, les plus anciens sont perdus au-delà
+             (`max_queue=None` : illimitée, rien n'est perdu — matching paper, stratégies)
+- "latest" : seul le dernier événement compte (PNL total)
+- clé      : `coalesce(event)` → dernier événement par clé, ex. `lambda e: e.symbol`
+
+Un abonné peut couvrir plusieurs topics (`subscribe((Trade, CandleClose), ...)`) :
+une seule file, donc les événements lui arrivent dans l'ordre de publication,
+même quand une tranche s'arrête au milieu (stratégies : `on_candle` après les
+trades de la bougie).
+"""
+import asyncio
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from utils.logger import log
+from utils.metrics import LatencyStats
+
+
+# ── Événements ──
+
+class Event:
+    """Base des événements : `TOPIC` nomme le topic, `stamp` = publication (perf_counter)."""
+    __slots__ = ("symbol", "stamp")
+    TOPIC = "event"
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}"
+                           for cls in type(self).__mro__[:-1]
+                           for name in getattr(cls, "__slots__", ()) if name != "stamp")
+        return f"{type(self).__name__}({fields})"
+
+
+class Trade(Event):
+    """Trade brut du feed."""
+    __slots__ = ("price", "amount", "ts")
+    TOPIC = "trade"
+
+    def __init__(self, symbol: str, price: float, amount: float, ts: int):
+        self.symbol, self.price, self.amount, self.ts = symbol, price, amount, ts
+
+
+class CandleUpdate(Event):
+    """Bougie en cours mise à jour (copie, à chaque trade)."""
+    __slots__ = ("candle",)
+    TOPIC = "candle_update"
+
+    def __init__(self, symbol: str, candle: dict):
+        self.symbol, self.candle = symbol, candle
+
+
+class CandleClose(Event):
+    """Bougie clôturée."""
+    __slots__ = ("candle",)
+    TOPIC = "candle_close"
+
+    def __init__(self, symbol: str, candle: dict):
+        self.symbol, self.candle = symbol, candle
+
+
+class Fill(Event):
+    """Exécution comptabilisée par l'OrderManager (REST ou flux user-data)."""
+    __slots__ = ("side", "price", "amount", "fee")
+    TOPIC = "fill"
+
+    def __init__(self, symbol: str, side: str, price: float, amount: float, fee: float = 0.0):
+        self.symbol, self.side, self.price, self.amount, self.fee = symbol, side, price, amount, fee
+
+
+class Pnl(Event):
+    """PNL total converti en USDT."""
+    __slots__ = ("total", "time")
+    TOPIC = "pnl"
+
+    def __init__(self, total: float, time):
+        self.symbol, self.total, self.time = None, total, time
+
+
+TOPICS = {cls.TOPIC: cls for cls in (Trade, CandleUpdate, CandleClose, Fill, Pnl)}
+
+
+# ── Abonnés ──
+
+class Subscription:
+    """File d'un abonné + statistiques (livrés, coalescés, perdus, lag, durée du handler)."""
+    __slots__ = ("name", "event_types", "handler", "priority", "coalesce", "max_queue",
+                 "scheduled", "delivered", "reported", "coalesced", "dropped", "errors", "max_depth",
+                 "lag", "latency", "_items", "__weakref__")
+
+    def __init__(self, name: str, event_types: tuple[type, ...], handler, priority: int = 0,
+                 coalesce=None, max_queue: int | None = 10_000):
+        self.name = name
+        self.event_types = event_types
+        self.handler = handler
+        self.priority = priority
+        self.coalesce = coalesce
+        self.max_queue = max_queue
+        self.scheduled = False
+        self.delivered = 0
+        self.reported = 0           # livrés au dernier rapport
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.lag = LatencyStats()          # publication → début du handler (s)
+        self.latency = LatencyStats()      # durée du handler (s)
+        if coalesce is None:
+            self._items = deque()
+        elif coalesce == "latest":
+            self._items = None
+        else:
+            self._items = OrderedDict()
+
+    @property
+    def topic(self) -> str:
+        return "+".join(t.TOPIC for t in self.event_types)
+
+    def __len__(self):
+        if self.coalesce == "latest":
+            return 0 if self._items is None else 1
+        return len(self._items)
+
+    def offer(self, event: Event):
+        coalesce, items = self.coalesce, self._items
+        if coalesce is None:
+            if self.max_queue is not None and len(items) >= self.max_queue:
+                items.popleft()
+                self.dropped += 1
+            items.append(event)
+            depth = len(items)
+        elif coalesce == "latest":
+            if items is not None:
+                self.coalesced += 1
+            self._items = event
+            depth = 1
+        else:
+            key = coalesce(event)
+            if key in items:
+                self.coalesced += 1
+            elif self.max_queue is not None and len(items) >= self.max_queue:
+                items.popitem(last=False)
+                self.dropped += 1
+            items[key] = event
+            depth = len(items)
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def pop(self) -> Event | None:
+        coalesce, items = self.coalesce, self._items
+        if coalesce is None:
+            return items.popleft() if items else None
+        if coalesce == "latest":
+            self._items = None
+            return items
+        return items.popitem(last=False)[1] if items else None
+
+    def failed(self, event: Event, error: Exception):
+        self.errors += 1
+        if self.errors <= 10 or self.errors % 1000 == 0:
+            log.error(f"[BUS {self.name}] {event.TOPIC} : {error} ({self.errors} erreur(s))")
+
+    def deliver(self, event: Event):
+        start = time.perf_counter()
+        try:
+            self.handler(event)
+        except Exception as e:
+            self.failed(event, e)
+        end = time.perf_counter()
+        self.lag.add(start - event.stamp)
+        self.latency.add(end - start)
+        self.delivered += 1
+
+    def reset_stats(self):
+        self.lag.reset()
+        self.latency.reset()
+        self.coalesced = self.dropped = self.max_depth = 0
+
+
+class _ThreadedSubscription(Subscription):
+    """Handler bloquant : thread dédié, file protégée par un verrou."""
+    __slots__ = ("_cond", "_thread", "_closed")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"bus-{self.name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, event: Event):
+        with self._cond:
+            super().offer(event)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not len(self) and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                event = self.pop()
+            self.deliver(event)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(1.0)
+
+
+class _AsyncSubscription(Subscription):
+    """Handler coroutine : tâche dédiée (un `await` ne retient pas les autres abonnés)."""
+    __slots__ = ("_ready",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ready = asyncio.Event()
+
+    def offer(self, event: Event):
+        super().offer(event)
+        self._ready.set()
+
+    async def run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while (event := self.pop()) is not None:
+                start = time.perf_counter()
+                try:
+                    await self.handler(event)
+                except Exception as e:
+                    self.failed(event, e)
+                self.lag.add(start - event.stamp)
+                self.latency.add(time.perf_counter() - start)
+                self.delivered += 1
+
+
+# ── Bus ──
+
+_BUS_DEFAULT = object()    # `max_queue` non précisé → valeur de la section `bus:`
+
+class EventBus:
+    """Publication non bloquante, dispatch par priorité dans une tâche asyncio (`run()`)."""
+    def __init__(self, slice_ms: float = 5.0, max_queue: int = 10_000, report_every: float = 60.0):
+        self.slice = slice_ms / 1000
+        self.max_queue = max_queue
+        self.report_every = report_every
+        self._subs: dict[type, list[Subscription]] = {}
+        self._ready: list = []                    # tas (-priorité, ordre, abonné)
+        self._order = itertools.count()
+        self._wake: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    @classmethod
+    def from_config(cls, config: dict) -> "EventBus":
+        """`config` : section `bus:`."""
+        return cls(config.get("slice_ms", 5.0), config.get("max_queue", 10_000),
+                   config.get("report_every", 60.0))
+
+    def subscriptions(self) -> list[Subscription]:
+        # Un abonné multi-topics figure dans plusieurs listes : compté une fois
+        return list(dict.fromkeys(sub for subs in self._subs.values() for sub in subs))
+
+    def subscribe(self, event_type: type | tuple[type, ...], handler, name: str | None = None,
+                  priority: int = 0, coalesce=None, max_queue=_BUS_DEFAULT,
+                  threaded: bool = False) -> Subscription:
+        """`event_type` : un topic, ou un tuple de topics partageant une file (ordre de publication).
+
+        `max_queue=None` : file illimitée, pour les abonnés qui ne doivent rien perdre.
+        """
+        event_types = event_type if isinstance(event_type, tuple) else (event_type,)
+        for t in event_types:
+            if not (isinstance(t, type) and issubclass(t, Event)):
+                raise TypeError(f"topic inconnu : {t!r} (attendu : {', '.join(TOPICS)})")
+        name = name or getattr(handler, "__qualname__", repr(handler))
+        if max_queue is _BUS_DEFAULT:
+            max_queue = self.max_queue
+        args = (name, event_types, handler, priority, coalesce, max_queue)
+        if inspect.iscoroutinefunction(handler):
+            sub = _AsyncSubscription(*args)
+            if self._wake is not None:
+                self._tasks.append(asyncio.create_task(sub.run()))
+        elif threaded:
+            sub = _ThreadedSubscription(*args)
+        else:
+            sub = Subscription(*args)
+        for t in event_types:
+            subs = self._subs.setdefault(t, [])
+            subs.append(sub)
+            subs.sort(key=lambda s: -s.priority)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        for t in sub.event_types:
+            subs = self._subs.get(t, [])
+            if sub in subs:
+                subs.remove(sub)
+        if isinstance(sub, _ThreadedSubscription):
+            sub.close()
+
+    def publish(self, event: Event):
+        """Dépose l'événement dans la file de chaque abonné (aucun handler appelé ici)."""
+        subs = self._subs.get(type(event))
+        if not subs:
+            return
+        event.stamp = time.perf_counter()
+        for sub in subs:
+            sub.offer(event)
+            if not sub.scheduled and type(sub) is Subscription:
+                sub.scheduled = True
+                heapq.heappush(self._ready, (-sub.priority, next(self._order), sub))
+        if self._wake is not None:
+            self._wake.set()
+
+    def _dispatch(self):
+        """Une tranche : abonnés prêts par priorité jusqu'à `slice` secondes.
+
+        Une lecture d'horloge par événement (la fin d'un handler sert de début
+        au suivant) ; lag et durée chronométrés sur 1 livraison sur 8.
+        """
+        now = time.perf_counter()
+        deadline = now + self.slice
+        ready = self._ready
+        while ready:
+            _, _, sub = heapq.heappop(ready)
+            pop, handler = sub.pop, sub.handler
+            while now < deadline and (event := pop()) is not None:
+                start = now
+                try:
+                    handler(event)
+                except Exception as e:
+                    sub.failed(event, e)
+                now = time.perf_counter()
+                sub.delivered += 1
+                if not sub.delivered & 7:
+                    sub.lag.add(start - event.stamp)
+                    sub.latency.add(now - start)
+            if len(sub):
+                heapq.heappush(ready, (-sub.priority, next(self._order), sub))
+            else:
+                sub.scheduled = False
+            if now >= deadline:
+                return
+
+    def _report(self):
+        lines = []
+        for sub in self.subscriptions():
+            if sub.delivered == sub.reported and not sub.dropped:
+                continue
+            lag, latency = sub.lag.summary(), sub.latency.summary()
+            lines.append(
+                f"[BUS {sub.name}] {sub.topic} : {sub.delivered - sub.reported} livrés"
+                + (f", {sub.coalesced} coalescés" if sub.coalesced else "")
+                + (f", {sub.dropped} perdus" if sub.dropped else "")
+                + f", file max {sub.max_depth}, lag p50={lag['p50_ms']:.2f}ms p99={lag['p99_ms']:.2f}ms"
+                f", handler p99={latency['p99_ms']:.3f}ms"
+                + (f", {sub.errors} erreur(s)" if sub.errors else ""))
+            sub.reported = sub.delivered
+            sub.reset_stats()
+        for line in lines:
+            (log.warning if " perdus" in line else log.info)(line)
+
+    async def run(self):
+        """Dispatcher : à lancer dans la boucle qui publie."""
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(sub.run()) for sub in self.subscriptions()
+                       if isinstance(sub, _AsyncSubscription)]
+        last_report = time.monotonic()
+        try:
+            while True:
+                if not self._ready:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.report_every)
+                    except asyncio.TimeoutError:
+                        pass
+                self._dispatch()
+                await asyncio.sleep(0)          # feeds et I/O entre deux tranches
+                if time.monotonic() - last_report >= self.report_every:
+                    self._report()
+                    last_report = time.monotonic()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    def close(self):
+        for sub in self.subscriptions():
+            if isinstance(sub, _ThreadedSubscription):
+                sub.close()
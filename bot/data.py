@@ -1,8 +1,14 @@
 import asyncio
+import time
 from datetime import datetime, timezone
 import pandas as pd
 import ccxt.pro as ccxtpro
+from bot.bus import CandleClose, CandleUpdate, Trade
 from utils.logger import log
+from utils.profiling import Section
+from utils.trace import tracer
+
+_CANDLE_BUILD = Section("candle_build")
 
 
 class LiveFeed:
@@ -21,6 +27,12 @@ class LiveFeed:
         self.on_update = None
         # Callback appelé quand une bougie se ferme
         self.on_new_candle = None
+        # Callback appelé pour chaque trade brut (price, amount, timestamp_ms)
+        self.on_trade = None
+        # Réception du dernier lot de trades (wall, mono) — traces de latence
+        self._recv: tuple | None = None
+        # Bus d'événements (bot/bus.py) : trade, candle_update, candle_close publiés en plus des callbacks
+        self.bus = None
 
     def _create_exchange(self, config: dict):
         # Pas de sandbox pour le websocket — données publiques, pas besoin
@@ -32,39 +44,59 @@ class LiveFeed:
         return (timestamp_ms // interval_ms) * interval_ms
 
     def _process_trade(self, price: float, amount: float, timestamp_ms: int):
-        candle_time_ms = self._candle_start_ms(timestamp_ms)
+        if self.on_trade:
+            self.on_trade(price, amount, timestamp_ms)
+        bus = self.bus
+        if bus is not None:
+            bus.publish(Trade(self.symbol, price, amount, timestamp_ms))
+        with _CANDLE_BUILD:
+            candle_time_ms = self._candle_start_ms(timestamp_ms)
 
-        if self._current is None or self._current["_ms"] != candle_time_ms:
-            # Nouvelle bougie — fermer l'ancienne
-            if self._current is not None:
-                self.candles.append(self._current.copy())
-                if self.on_new_candle:
-                    self.on_new_candle(self._current.copy())
+            if self._current is None or self._current["_ms"] != candle_time_ms:
+                # Nouvelle bougie — fermer l'ancienne
+                if self._current is not None:
+                    self.candles.append(self._current.copy())
+                    if self.on_new_candle:
+                        self.on_new_candle(self._current.copy())
+                    if bus is not None:
+                        bus.publish(CandleClose(self.symbol, self._current.copy()))
 
-            self._current = {
-                "time": datetime.fromtimestamp(candle_time_ms / 1000, tz=timezone.utc),
-                "_ms": candle_time_ms,
-                "open": price,
-                "high": price,
-                "low": price,
-                "close": price,
-                "volume": amount,
-            }
-        else:
-            # Mise à jour de la bougie en cours
-            self._current["high"] = max(self._current["high"], price)
-            self._current["low"] = min(self._current["low"], price)
-            self._current["close"] = price
-            self._current["volume"] += amount
+                self._current = {
+                    "time": datetime.fromtimestamp(candle_time_ms / 1000, tz=timezone.utc),
+                    "_ms": candle_time_ms,
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "volume": amount,
+                }
+            else:
+                # Mise à jour de la bougie en cours
+                self._current["high"] = max(self._current["high"], price)
+                self._current["low"] = min(self._current["low"], price)
+                self._current["close"] = price
+                self._current["volume"] += amount
 
-        if self.on_update:
-            self.on_update(self._current.copy())
+        if self.on_update or bus is not None:
+            candle = self._current.copy()
+            if tracer.enabled and self._recv:
+                recv_wall, recv_mono = self._recv
+                now = time.monotonic()
+                tracer.record("exchange_recv", max(0.0, recv_wall - timestamp_ms / 1000))
+                tracer.record("recv_process", now - recv_mono)
+                candle["_trace"] = (timestamp_ms, recv_wall, recv_mono, now)
+            if self.on_update:
+                self.on_update(candle)
+            if bus is not None:
+                bus.publish(CandleUpdate(self.symbol, candle))
 
     async def stream(self):
         log.info(f"Connexion websocket {self.symbol} (bougies {self.candle_seconds}s)...")
         try:
             while True:
                 trades = await self.exchange.watch_trades(self.symbol)
+                if tracer.enabled:
+                    self._recv = (time.time(), time.monotonic())
                 for trade in trades:
                     try:
                         self._process_trade(trade["price"], trade["amount"], trade["timestamp"])
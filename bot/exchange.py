@@ -1,9 +1,16 @@
-import ccxt
+import ssl
+import aiohttp
+import certifi
+import ccxt.async_support as ccxt
 from utils.logger import log
 
 
 class Exchange:
-    """Connexion REST à Binance pour passer des ordres."""
+    """Connexion REST async à Binance pour passer des ordres.
+
+    Doit être instancié dans la boucle asyncio : la session aiohttp (pool de
+    connexions keep-alive) est partagée par tous les appels REST.
+    """
 
     def __init__(self, config: dict):
         params = {}
@@ -13,25 +20,39 @@ class Exchange:
         if config.get("sandbox"):
             params["sandbox"] = True
 
+        # Pool de connexions partagé (ordres concurrents sur plusieurs paires)
+        connector = aiohttp.TCPConnector(
+            limit=config.get("pool_size", 20),
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True,
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+        )
+        self.session = aiohttp.ClientSession(connector=connector, trust_env=True)
+        params["session"] = self.session
+
         self.client = ccxt.binance(params)
         log.info("Exchange REST initialisé" + (" (sandbox)" if params.get("sandbox") else ""))
 
-    def create_order(self, symbol: str, side: str, amount: float, price: float | None = None) -> dict:
+    async def load_markets(self) -> dict:
+        return await self.client.load_markets()
+
+    async def create_order(self, symbol: str, side: str, amount: float, price: float | None = None) -> dict:
         if price is None:
-            order = self.client.create_market_order(symbol, side, amount)
+            order = await self.client.create_market_order(symbol, side, amount)
         else:
-            order = self.client.create_limit_order(symbol, side, amount, price)
+            order = await self.client.create_limit_order(symbol, side, amount, price)
         log.info(f"Ordre {side} {amount} {symbol} @ {price or 'market'}")
         return order
 
-    def cancel_order(self, order_id: str, symbol: str) -> dict:
-        result = self.client.cancel_order(order_id, symbol)
+    async def cancel_order(self, order_id: str, symbol: str) -> dict:
+        result = await self.client.cancel_order(order_id, symbol)
         log.info(f"Ordre {order_id} annulé")
         return result
 
-    def fetch_balance(self) -> dict:
-        return self.client.fetch_balance()
+    async def fetch_balance(self) -> dict:
+        return await self.client.fetch_balance()
 
-    def close(self):
-        if hasattr(self.client, 'close'):
-            self.client.close()
+    async def close(self):
+        await self.client.close()
+        if not self.session.closed:
+            await self.session.close()
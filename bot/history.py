@@ -0,0 +1,257 @@
+import asyncio
+import time
+from pathlib import Path
+import numpy as np
+from utils.logger import log
+
+# Timeframes natifs Binance (secondes) — utilisés si candle_seconds tombe pile dessus
+_NATIVE_TIMEFRAMES = {
+    1: "1s", 60: "1m", 180: "3m", 300: "5m", 900: "15m", 1800: "30m",
+    3600: "1h", 7200: "2h", 14400: "4h", 21600: "6h", 28800: "8h",
+    43200: "12h", 86400: "1d",
+}
+_COLS = 6   # ts, open, high, low, close, volume
+# Marqueur de début d'enregistrement (volume < 0) : un trou qui en contient un est une
+# interruption de l'enregistrement, pas une suite de bougies sans trade
+_SESSION = -1.0
+
+
+def _file_name(symbol: str, suffix: str) -> str:
+    return symbol.replace("/", "_") + suffix
+
+
+def aggregate(bars: np.ndarray, seconds: int) -> np.ndarray:
+    """Regroupe des barres OHLCV (ts en secondes) en bougies de `seconds` secondes.
+
+    Les intervalles sans barre n'ont pas de bougie (comme `LiveFeed`).
+    """
+    if not len(bars):
+        return np.empty((0, _COLS))
+    buckets = bars[:, 0].astype(np.int64) // seconds
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    ends = np.append(starts[1:], len(bars)) - 1
+    out = np.empty((len(starts), _COLS))
+    out[:, 0] = buckets[starts] * seconds
+    out[:, 1] = bars[starts, 1]
+    out[:, 2] = np.maximum.reduceat(bars[:, 2], starts)
+    out[:, 3] = np.minimum.reduceat(bars[:, 3], starts)
+    out[:, 4] = bars[ends, 4]
+    out[:, 5] = np.add.reduceat(bars[:, 5], starts)
+    return out
+
+
+class TradeRecorder:
+    """Enregistre les trades live agrégés en barres 1s sur disque (float64 brut).
+
+    Une barre 1s (ts, open, high, low, close, volume) par seconde active :
+    de quoi reconstruire exactement des bougies de n'importe quel
+    `candle_seconds` entier au redémarrage, pour ~4 Mo / jour / paire au pire.
+    `on_trade` ne fait que des opérations en mémoire ; `flush()` ajoute les
+    barres terminées en fin de fichier. Le premier trade d'une paire écrit
+    d'abord un marqueur de session (volume négatif) pour que `candles()`
+    distingue un arrêt du bot d'une période sans trade.
+    """
+    def __init__(self, directory: str | Path, retention_hours: float = 24):
+        self.dir = Path(directory)
+        self.retention = retention_hours * 3600
+        self._bars: dict[str, list] = {}        # symbol → barre 1s en cours
+        self._pending: dict[str, list] = {}     # symbol → barres terminées à écrire
+        self._started: set[str] = set()         # paires dont la session est marquée
+
+    def _path(self, symbol: str) -> Path:
+        return self.dir / _file_name(symbol, "-1s.bin")
+
+    def on_trade(self, symbol: str, price: float, amount: float, timestamp_ms: int):
+        sec = timestamp_ms // 1000
+        if symbol not in self._started:
+            self._started.add(symbol)
+            self._pending.setdefault(symbol, []).append(
+                [sec, np.nan, np.nan, np.nan, np.nan, _SESSION])
+        bar = self._bars.get(symbol)
+        if bar is None or sec > bar[0]:
+            if bar is not None:
+                self._pending.setdefault(symbol, []).append(bar)
+            self._bars[symbol] = [sec, price, price, price, price, amount]
+        else:
+            if price > bar[2]:
+                bar[2] = price
+            if price < bar[3]:
+                bar[3] = price
+            bar[4] = price
+            bar[5] += amount
+
+    def forget(self, symbol: str):
+        """Paire dont le feed s'arrête (rechargement de la config) : barre en cours
+        terminée, nouvelle session si elle revient."""
+        bar = self._bars.pop(symbol, None)
+        if bar is not None:
+            self._pending.setdefault(symbol, []).append(bar)
+        self._started.discard(symbol)
+
+    def flush(self, include_current: bool = False):
+        if include_current:
+            for symbol, bar in self._bars.items():
+                self._pending.setdefault(symbol, []).append(bar)
+            self._bars.clear()
+        if not any(self._pending.values()):
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for symbol, rows in self._pending.items():
+            if rows:
+                with open(self._path(symbol), "ab") as f:
+                    np.asarray(rows, dtype=np.float64).tofile(f)
+        self._pending.clear()
+
+    async def run(self, interval: float = 5.0):
+        """Tâche de fond : écrit les barres terminées toutes les `interval` secondes."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                self.flush()
+        finally:
+            self.flush(include_current=True)
+
+    def load(self, symbol: str) -> np.ndarray:
+        """Barres 1s enregistrées dans la fenêtre de rétention (compacte le fichier si besoin),
+        marqueurs de session compris."""
+        path = self._path(symbol)
+        try:
+            bars = np.fromfile(path, dtype=np.float64)
+        except (OSError, ValueError):
+            return np.empty((0, _COLS))
+        bars = bars[: len(bars) - len(bars) % _COLS].reshape(-1, _COLS)
+        keep = bars[:, 0] >= time.time() - self.retention
+        if not keep.all():
+            bars = bars[keep]
+            tmp = path.with_suffix(".tmp")
+            bars.tofile(tmp)
+            tmp.replace(path)
+        return bars
+
+    def candles(self, symbol: str, candle_seconds: int, limit: int) -> list[tuple] | None:
+        """(close, volume) des `limit` dernières bougies fermées, ou None si l'enregistrement
+        ne couvre pas la période (trou à la fin ou au milieu, pas assez de bougies)."""
+        bars = self.load(symbol)
+        sessions = bars[bars[:, 5] == _SESSION, 0].astype(np.int64) // candle_seconds
+        bars = bars[bars[:, 5] >= 0]
+        now_bucket = int(time.time()) // candle_seconds
+        bars = bars[bars[:, 0].astype(np.int64) // candle_seconds < now_bucket]   # bougies fermées
+        candles = aggregate(bars, candle_seconds)
+        # L'enregistrement doit aller jusqu'à la bougie précédente (pas d'arrêt entre-temps)
+        if len(candles) < limit or candles[-1, 0] // candle_seconds < now_bucket - 1:
+            return None
+        candles = candles[-limit:]
+        # Continuité : un écart de plus d'une bougie n'est admis que s'il ne contient aucun
+        # redémarrage de l'enregistrement (bougies sans trade, bot resté en marche)
+        buckets = candles[:, 0].astype(np.int64) // candle_seconds
+        for i in np.flatnonzero(np.diff(buckets) > 1):
+            if ((sessions > buckets[i]) & (sessions <= buckets[i + 1])).any():
+                return None
+        return list(zip(candles[:, 4].tolist(), candles[:, 5].tolist()))
+
+
+class OhlcvCache:
+    """Cache disque incrémental des bougies REST (fichier .npy par paire et timeframe).
+
+    Chaque lancement ne télécharge que les bougies plus récentes que le cache
+    (la dernière, potentiellement incomplète, est re-téléchargée).
+    """
+    def __init__(self, directory: str | Path, max_bars: int = 1000):
+        self.dir = Path(directory)
+        self.max_bars = max_bars
+
+    def _path(self, symbol: str, timeframe: str) -> Path:
+        return self.dir / _file_name(symbol, f"-{timeframe}.npy")
+
+    def load(self, symbol: str, timeframe: str) -> np.ndarray:
+        try:
+            return np.load(self._path(symbol, timeframe))
+        except (OSError, ValueError):
+            return np.empty((0, _COLS))
+
+    def save(self, symbol: str, timeframe: str, bars: np.ndarray):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(symbol, timeframe)
+        tmp = path.with_suffix(".tmp.npy")
+        np.save(tmp, bars)
+        tmp.replace(path)
+
+    async def fetch(self, client, symbol: str, timeframe: str, limit: int) -> np.ndarray:
+        """Les `limit` dernières bougies : cache disque + complément réseau."""
+        cached = self.load(symbol, timeframe)
+        tf_ms = client.parse_timeframe(timeframe) * 1000
+        since = None
+        if len(cached):
+            since = int(cached[-1, 0])
+            # Trop de retard pour une seule requête → cache abandonné
+            if (time.time() * 1000 - since) / tf_ms > 1000 - 1:
+                since, cached = None, cached[:0]
+        page = min(max(limit, 1), 1000)
+        ohlcv = await client.fetch_ohlcv(symbol, timeframe, since=since, limit=1000 if since else page)
+        fresh = np.asarray(ohlcv, dtype=np.float64).reshape(-1, _COLS)
+        if len(fresh):
+            cached = cached[cached[:, 0] < fresh[0, 0]]
+        bars = np.concatenate([cached, fresh])[-max(limit, self.max_bars):]
+        self.save(symbol, timeframe, bars)
+        return bars[-limit:]
+
+    async def fetch_range(self, client, symbol: str, timeframe: str, since_ms: int) -> np.ndarray:
+        """Toutes les bougies depuis `since_ms` (backtests) : seules les pages absentes du
+        cache sont téléchargées, de 1000 en 1000. Le cache n'est pas tronqué à `max_bars`."""
+        cached = self.load(symbol, timeframe)
+        tf_ms = client.parse_timeframe(timeframe) * 1000
+        if len(cached) and cached[0, 0] > since_ms:
+            cached = cached[:0]          # trou avant le cache → on repart de since_ms
+        cursor = int(cached[-1, 0]) if len(cached) else since_ms
+        pages = [cached]
+        while True:
+            ohlcv = await client.fetch_ohlcv(symbol, timeframe, since=cursor, limit=1000)
+            page = np.asarray(ohlcv, dtype=np.float64).reshape(-1, _COLS)
+            page = page[page[:, 0] >= cursor]
+            if not len(page):
+                break
+            pages[-1] = pages[-1][pages[-1][:, 0] < page[0, 0]]
+            pages.append(page)
+            if page[-1, 0] + tf_ms > time.time() * 1000 or len(page) < 2:
+                break
+            cursor = int(page[-1, 0])
+        bars = np.concatenate(pages)
+        self.save(symbol, timeframe, bars)
+        return bars[bars[:, 0] >= since_ms]
+
+
+async def warmup(client, symbols: list[str], candle_seconds: int, limit: int = 200,
+                 cache: OhlcvCache | None = None, recorder: TradeRecorder | None = None,
+                 concurrency: int = 8) -> dict[str, list]:
+    """Historique de warmup des indicateurs, toutes les paires en parallèle.
+
+    Source par paire : trades enregistrés (bougies exactes de `candle_seconds`)
+    si disponibles, sinon bougies REST (timeframe natif si `candle_seconds` en
+    est un, sinon 1m) via le cache incrémental.
+    Retourne {symbol: [(close, volume), ...]}.
+    """
+    timeframe = _NATIVE_TIMEFRAMES.get(candle_seconds, "1m")
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(symbol: str) -> list:
+        if recorder:
+            recorded = await asyncio.to_thread(recorder.candles, symbol, candle_seconds, limit)
+            if recorded:
+                log.info(f"[{symbol}] {len(recorded)} bougies {candle_seconds}s "
+                         f"reconstruites depuis les trades enregistrés (warmup indicateurs)")
+                return recorded
+        try:
+            async with sem:
+                if cache:
+                    bars = await cache.fetch(client, symbol, timeframe, limit)
+                    rows = bars[:, 4:6].tolist()
+                else:
+                    rows = [(c[4], c[5]) for c in await client.fetch_ohlcv(symbol, timeframe, limit=limit)]
+        except Exception as e:
+            log.warning(f"[{symbol}] Historique indisponible: {e}")
+            return []
+        log.info(f"[{symbol}] {len(rows)} bougies {timeframe} chargées (warmup indicateurs)")
+        return [tuple(r) for r in rows]
+
+    results = await asyncio.gather(*(one(s) for s in symbols))
+    return dict(zip(symbols, results))
@@ -2,7 +2,12 @@
 import numpy as np
 from scipy.special import eval_hermite
 from scipy.signal import hilbert as _hilbert
+from scipy.signal import lfilter as _lfilter
 from math import lgamma, log, pi, sqrt, exp
+from utils.profiling import Section
+
+# numpy >= 2 : trapz renommé trapezoid
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
 
 
 class QuantumIndicator:
@@ -99,6 +104,7 @@ class QuantumIndicator:
         log_f = log_an2 - xi**2 + 2.0 * np.log(abs_hn) - log(sigma_sqrt2)
         return log_f
 
+    @Section("quantum_fit")
     def _fit_eigenstate(self, returns: np.ndarray):
         """Teste chaque eigenstate n=0..max_n, sélectionne celui qui maximise
         la log-vraisemblance des returns observés."""
@@ -184,7 +190,7 @@ class QuantumIndicator:
         psi = hn * np.exp(-xi**2 / 2)
 
         # Normalisation
-        norm = np.sqrt(np.trapz(psi**2, xi))
+        norm = np.sqrt(_trapezoid(psi**2, xi))
         if norm > 0:
             psi /= norm
 
@@ -391,3 +397,67 @@ class MACD:
             
         hist_next = macd_next - signal_next
         return macd_next, signal_next, hist_next
+
+
+# ── Séries vectorisées (backtest) ──
+# Mêmes valeurs que les calculateurs ci-dessus appliqués bougie par bougie
+# (NaN tant que l'indicateur n'est pas initialisé), mais calculées d'un bloc
+# avec `lfilter` : les récurrences EMA / Wilder sont des filtres IIR d'ordre 1.
+
+def ema_series(close: np.ndarray, period: int) -> np.ndarray:
+    """Série EMA : SMA des `period` premières clôtures puis lissage exponentiel."""
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) < period:
+        return out
+    k = 2 / (period + 1)
+    seed = close[:period].sum() / period
+    out[period - 1] = seed
+    if len(close) > period:
+        out[period:] = _lfilter([k], [1.0, -(1 - k)], close[period:], zi=[(1 - k) * seed])[0]
+    return out
+
+
+def rsi_series(close: np.ndarray, period: int) -> np.ndarray:
+    """Série RSI (lissage de Wilder), initialisée après `period + 1` clôtures."""
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) < period + 1:
+        return out
+    delta = np.diff(close)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    a = 1 / period
+    avg_gain = np.empty(len(delta) - period + 1)
+    avg_loss = np.empty_like(avg_gain)
+    avg_gain[0] = gains[:period].sum() / period
+    avg_loss[0] = losses[:period].sum() / period
+    if len(avg_gain) > 1:
+        avg_gain[1:] = _lfilter([a], [1.0, -(1 - a)], gains[period:], zi=[(1 - a) * avg_gain[0]])[0]
+        avg_loss[1:] = _lfilter([a], [1.0, -(1 - a)], losses[period:], zi=[(1 - a) * avg_loss[0]])[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out[period:] = np.where(avg_loss == 0, 100.0, rsi)
+    return out
+
+
+def macd_series(close: np.ndarray, fast_period: int = 12, slow_period: int = 26,
+                signal_period: int = 9) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Séries (MACD, Signal, Histogramme) ; le Signal démarre au premier MACD défini."""
+    macd = ema_series(close, fast_period) - ema_series(close, slow_period)
+    signal = np.full(len(macd), np.nan)
+    start = max(fast_period, slow_period) - 1
+    if start < len(macd):
+        signal[start:] = ema_series(macd[start:], signal_period)
+    return macd, signal, macd - signal
+
+
+def quantum_series(close: np.ndarray, volume: np.ndarray, *args) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Séries (Ω, σ, fit_quality) — pas de forme close : `QuantumIndicator` bougie par bougie."""
+    ind = QuantumIndicator(*args)
+    out = np.full((3, len(close)), np.nan)
+    for i, (c, v) in enumerate(zip(np.asarray(close).tolist(), np.asarray(volume).tolist())):
+        ind.update(c, v)
+        if ind.initialized:
+            out[:, i] = (ind.omega, ind.sigma, ind.fit_quality)
+    return out[0], out[1], out[2]
@@ -0,0 +1,162 @@
+import asyncio
+import math
+import os
+import time
+from pathlib import Path
+from utils import speedups
+from utils.logger import log
+
+# ccxt precisionMode
+_DECIMAL_PLACES = 2
+_TICK_SIZE = 4
+
+
+class SymbolConstraints:
+    """Contraintes d'ordre précalculées pour une paire (lecture O(1))."""
+    __slots__ = ("symbol", "min_notional", "min_amount", "amount_step", "tick_size")
+
+    def __init__(self, symbol: str, min_notional: float, min_amount: float,
+                 amount_step: float | None, tick_size: float | None):
+        self.symbol = symbol
+        self.min_notional = min_notional
+        self.min_amount = min_amount
+        self.amount_step = amount_step
+        self.tick_size = tick_size
+
+    @classmethod
+    def from_market(cls, market: dict, precision_mode: int = _TICK_SIZE) -> "SymbolConstraints":
+        limits = market.get("limits", {})
+        precision = market.get("precision", {})
+
+        def step(p):
+            if p is None:
+                return None
+            # DECIMAL_PLACES : p = nombre de décimales ; TICK_SIZE : p = le pas lui-même
+            return 10 ** -p if precision_mode == _DECIMAL_PLACES else float(p)
+
+        return cls(
+            market["symbol"],
+            (limits.get("cost") or {}).get("min") or 5.0,
+            (limits.get("amount") or {}).get("min") or 0.001,
+            step(precision.get("amount")),
+            step(precision.get("price")),
+        )
+
+    def min_amount_at(self, price: float) -> float:
+        """Plus petite quantité valide au prix donné (LOT_SIZE et NOTIONAL)."""
+        if price <= 0:
+            return self.min_amount
+        return max(self.min_amount, self.min_notional / price)
+
+    def round_amount(self, amount: float) -> float:
+        """Arrondi vers le bas au pas de quantité (LOT_SIZE stepSize)."""
+        if not self.amount_step:
+            return amount
+        return round(math.floor(amount / self.amount_step + 1e-9) * self.amount_step, 12)
+
+    def round_price(self, price: float) -> float:
+        """Arrondi au tick de prix le plus proche (PRICE_FILTER tickSize)."""
+        if not self.tick_size:
+            return price
+        return round(round(price / self.tick_size) * self.tick_size, 12)
+
+
+class MarketCache:
+    """Métadonnées de marchés (exchangeInfo) en cache disque, partagées entre clients ccxt.
+
+    Au démarrage, le cache disque est injecté dans chaque client via
+    `set_markets()` → aucun `load_markets()` réseau (ni par client REST, ni
+    par feed websocket). Le rafraîchissement (TTL dépassé) se fait en tâche
+    de fond et est ré-appliqué à tous les clients attachés.
+    """
+    def __init__(self, path: str | Path, ttl: float = 86400):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.markets: dict | None = None
+        self.currencies: dict | None = None
+        self.fetched_at = 0.0
+        self.constraints: dict[str, SymbolConstraints] = {}
+        self._precision_mode = _TICK_SIZE
+        self._clients: list = []
+
+    @property
+    def stale(self) -> bool:
+        return self.markets is None or time.time() - self.fetched_at > self.ttl
+
+    def load(self) -> bool:
+        """Charge le cache disque (même périmé). True si des marchés sont disponibles."""
+        try:
+            with open(self.path, "rb") as f:
+                data = speedups.loads(f.read())
+        except (OSError, ValueError):
+            return False
+        self.markets = data["markets"]
+        self.currencies = data.get("currencies")
+        self.fetched_at = data.get("fetched_at", 0.0)
+        self._precision_mode = data.get("precision_mode", _TICK_SIZE)
+        self._build_constraints()
+        return True
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(speedups.dumpb({
+                "fetched_at": self.fetched_at,
+                "precision_mode": self._precision_mode,
+                "markets": self.markets,
+                "currencies": self.currencies,
+            }))
+        os.replace(tmp, self.path)   # écriture atomique
+
+    def _build_constraints(self):
+        self.constraints = {
+            sym: SymbolConstraints.from_market(m, self._precision_mode)
+            for sym, m in self.markets.items()
+        }
+
+    def constraint(self, symbol: str) -> SymbolConstraints | None:
+        return self.constraints.get(symbol)
+
+    def attach(self, client):
+        """Injecte les marchés en cache dans un client ccxt et l'inscrit aux rafraîchissements."""
+        if client not in self._clients:
+            self._clients.append(client)
+        if self.markets is not None and hasattr(client, "set_markets"):
+            client.set_markets(self.markets, self.currencies)
+
+    async def refresh(self, client):
+        """Recharge depuis l'exchange via `client`, sauvegarde et ré-applique partout."""
+        result = client.load_markets(True)
+        if asyncio.iscoroutine(result):      # client async (REST/pro) ou sync (historique)
+            await result
+        self.markets = client.markets
+        self.currencies = client.currencies
+        self.fetched_at = time.time()
+        self._precision_mode = getattr(client, "precisionMode", _TICK_SIZE)
+        self._build_constraints()
+        self.save()
+        for other in self._clients:
+            if other is not client:
+                self.attach(other)
+        log.info(f"[MARKETS] {len(self.markets)} marchés rafraîchis ({self.path.name})")
+
+    async def bootstrap(self, client):
+        """Démarrage : cache disque si présent (même périmé, le rafraîchissement
+        se fait ensuite en fond), réseau seulement au tout premier lancement."""
+        loaded = self.load()
+        self.attach(client)
+        if not loaded:
+            await self.refresh(client)
+
+    async def run(self, client):
+        """Tâche de fond : rafraîchit dès que le TTL est dépassé."""
+        while True:
+            if self.stale:
+                try:
+                    await self.refresh(client)
+                except Exception as e:
+                    log.warning(f"[MARKETS] Rafraîchissement échoué: {e}")
+                    await asyncio.sleep(60)
+                    continue
+            await asyncio.sleep(max(1.0, self.fetched_at + self.ttl - time.time()))
@@ -1,45 +1,52 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+import ccxt
+from bot.bus import Fill
 from bot.exchange import Exchange
-from db.models import Order
+from bot.pnl import PnlEngine
+from db.models import Order, Trade
+from db.queries import apply_fill_stats, history_page
+from db.writer import DbWriter
 from ui.chart import add_order_line
 from utils.logger import log
+from utils.profiling import Section
 
 
-class _PairPNL:
-    """PNL tracker pour une paire donnée."""
-    def __init__(self, symbol: str):
-        self.symbol = symbol
-        base, quote = symbol.split("/")
-        self.base = base
-        self.quote = quote
-        self.position = 0.0
-        self.cash_flow = 0.0
-        self.total_trades = 0
-        self.total_buys = 0
-        self.total_sells = 0
+_ORDER_SUBMIT = Section("order_submit")
+
+# Statuts ccxt → statuts Order
+_STATUS_MAP = {
+    "open": "pending",
+    "closed": "filled",
+    "canceled": "cancelled",
+    "cancelled": "cancelled",
+    "expired": "cancelled",
+    "rejected": "cancelled",
+}
 
 
 class OrderManager:
-    def __init__(self, exchange: Exchange, charts: dict | None = None):
+    MAX_TRACKED = 5000   # ordres / trades récents suivis pour le flux user-data
+
+    def __init__(self, exchange: Exchange, charts: dict | None = None,
+                 pnl: PnlEngine | None = None, writer: DbWriter | None = None, bus=None):
         self.exchange = exchange
         self.charts = charts or {}       # symbol → Chart
-        self._pnl: dict[str, _PairPNL] = {}
-
-    def _get_pnl(self, symbol: str) -> _PairPNL:
-        if symbol not in self._pnl:
-            self._pnl[symbol] = _PairPNL(symbol)
-        return self._pnl[symbol]
+        self.pnl = pnl or PnlEngine()
+        self.writer = writer             # None → écriture DB synchrone
+        self.bus = bus                   # EventBus : topic `fill` publié à chaque exécution
+        # Flux user-data : exchange_id → [Order, quantité déjà comptée à ignorer]
+        self._live: OrderedDict[str, list] = OrderedDict()
+        self._early: OrderedDict[str, list] = OrderedDict()
+        self._seen_trades: OrderedDict[str, None] = OrderedDict()
+        self.balance_cache: dict | None = None
+        # Ventes de clôture dont la réponse REST a dépassé le délai : symbole → requête
+        self._closing: dict[str, asyncio.Future] = {}
 
     def _log_pnl(self, symbol: str, side: str, fill_price: float, amount: float):
-        p = self._get_pnl(symbol)
-        if side == "buy":
-            p.position += amount
-            p.cash_flow -= fill_price * amount
-            p.total_buys += 1
-        else:
-            p.position -= amount
-            p.cash_flow += fill_price * amount
-            p.total_sells += 1
-        p.total_trades += 1
+        p = self.pnl.on_fill(symbol, side, fill_price, amount)
 
         unrealized = p.position * fill_price
         total_pnl = p.cash_flow + unrealized
@@ -51,70 +58,278 @@ class OrderManager:
             f"Trades: {p.total_trades} ({p.total_buys}B/{p.total_sells}S)"
         )
 
-    def get_total_pnl(self, prices: dict) -> float:
-        """PNL total toutes paires confondues (USDT)."""
-        total = 0.0
-        for sym, p in self._pnl.items():
-            price = prices.get(sym, 0.0)
-            total += p.cash_flow + p.position * price
-        return total
+    def get_total_pnl(self) -> float:
+        """PNL total toutes paires confondues, converti en USDT."""
+        return self.pnl.total()
 
     def _chart_for(self, symbol: str):
         return self.charts.get(symbol)
 
-    def buy(self, symbol: str, amount: float, price: float | None = None) -> Order:
-        result = self.exchange.create_order(symbol, "buy", amount, price)
-        fill_price = price or result.get("average") or result.get("price")
-        order = Order.create(
-            symbol=symbol,
-            side="buy",
-            order_type="limit" if price else "market",
-            price=fill_price,
-            amount=amount,
-            status="filled" if result["status"] == "closed" else "pending",
-            exchange_id=result["id"],
-        )
-        if fill_price:
-            self._log_pnl(symbol, "buy", fill_price, amount)
-            chart = self._chart_for(symbol)
-            if chart:
-                add_order_line(chart, "buy", fill_price, amount)
-        return order
+    def _apply_fill(self, order: Order, price: float, amount: float, fee: float = 0.0):
+        """Comptabilise une exécution : Trade en DB, PNL, événement `fill`, ligne sur le chart."""
+        if self.writer:
+            self.writer.add_fill(order, price, amount, fee)
+        else:
+            Trade.create(order=order, price=price, amount=amount, fee=fee)
+            apply_fill_stats(order.symbol, order.side, price, amount, fee, datetime.now())
+        self._log_pnl(order.symbol, order.side, price, amount)
+        if self.bus is not None:
+            self.bus.publish(Fill(order.symbol, order.side, price, amount, fee))
+        chart = self._chart_for(order.symbol)
+        if chart:
+            add_order_line(chart, order.side, price, amount)
+
+    def _set_status(self, order: Order, **fields):
+        if self.writer:
+            self.writer.update_order(order, **fields)
+        else:
+            for name, value in fields.items():
+                setattr(order, name, value)
+            order.save()
+
+    def _record(self, symbol: str, side: str, amount: float,
+                price: float | None, result: dict) -> Order:
+        """Crée l'Order depuis la réponse REST et comptabilise la quantité déjà remplie.
 
-    def sell(self, symbol: str, amount: float, price: float | None = None) -> Order:
-        result = self.exchange.create_order(symbol, "sell", amount, price)
-        fill_price = price or result.get("average") or result.get("price")
-        order = Order.create(
+        Le reste (ordres limit au repos, fills partiels) arrive par le flux
+        user-data (`on_exchange_trade` / `on_exchange_order`).
+        """
+        closed = result["status"] == "closed"
+        fill_price = result.get("average") or result.get("price") or price
+        filled = result.get("filled")
+        if filled is None:
+            filled = amount if closed else 0.0
+        order = Order(
             symbol=symbol,
-            side="sell",
+            side=side,
             order_type="limit" if price else "market",
             price=fill_price,
             amount=amount,
-            status="filled" if result["status"] == "closed" else "pending",
+            status="filled" if closed else "pending",
             exchange_id=result["id"],
         )
-        if fill_price:
-            self._log_pnl(symbol, "sell", fill_price, amount)
-            chart = self._chart_for(symbol)
-            if chart:
-                add_order_line(chart, "sell", fill_price, amount)
+        if self.writer:
+            self.writer.add_order(order)
+        else:
+            order.save()
+
+        if filled and fill_price:
+            fee = (result.get("fee") or {}).get("cost") or 0.0
+            self._apply_fill(order, fill_price, filled, fee)
+
+        # Suivi pour le flux user-data : les trades déjà comptés via REST seront ignorés
+        self._live[order.exchange_id] = [order, filled]
+        if len(self._live) > self.MAX_TRACKED:
+            self._live.popitem(last=False)
+        for kind, event in self._early.pop(order.exchange_id, []):
+            if kind == "trade":
+                self.on_exchange_trade(event)
+            else:
+                self.on_exchange_order(event)
         return order
 
-    def close_all_positions(self):
-        """Ferme toutes les positions ouvertes (vend tout pour revenir en quote)."""
-        for sym, p in self._pnl.items():
-            if p.position <= 0:
+    # ── Flux user-data (AccountStream) ──
+
+    def _buffer_early(self, order_id: str, kind: str, event: dict):
+        """Événement reçu avant la réponse REST de l'ordre (ou ordre externe)."""
+        self._early.setdefault(order_id, []).append((kind, event))
+        if len(self._early) > self.MAX_TRACKED:
+            self._early.popitem(last=False)
+
+    def on_exchange_trade(self, trade: dict):
+        """Fill poussé par l'exchange (watch_my_trades)."""
+        trade_id = trade.get("id")
+        if trade_id is not None and trade_id in self._seen_trades:
+            return
+        order_id = trade.get("order")
+        state = self._live.get(order_id)
+        if state is None:
+            self._buffer_early(order_id, "trade", trade)
+            return
+        if trade_id is not None:
+            self._seen_trades[trade_id] = None
+            if len(self._seen_trades) > self.MAX_TRACKED:
+                self._seen_trades.popitem(last=False)
+
+        order, skip = state
+        amount = trade["amount"]
+        if skip >= amount - 1e-12:
+            state[1] = skip - amount     # déjà compté via la réponse REST
+            return
+        qty = amount - skip
+        state[1] = 0.0
+        fee = (trade.get("fee") or {}).get("cost") or 0.0
+        self._apply_fill(order, trade["price"], qty, fee * qty / amount)
+
+    def on_exchange_order(self, update: dict):
+        """Changement d'état poussé par l'exchange (watch_orders)."""
+        state = self._live.get(update.get("id"))
+        if state is None:
+            self._buffer_early(update.get("id"), "order", update)
+            return
+        order = state[0]
+        status = _STATUS_MAP.get(update.get("status"), order.status)
+        fields = {}
+        if status != order.status:
+            fields["status"] = status
+        if update.get("average") and update["average"] != order.price:
+            fields["price"] = update["average"]
+        if fields:
+            self._set_status(order, **fields)
+
+    async def get_balance(self) -> dict:
+        """Soldes : cache tenu à jour par le flux user-data, sinon appel REST."""
+        if self.balance_cache is not None:
+            return self.balance_cache
+        return await self.exchange.fetch_balance()
+
+    @_ORDER_SUBMIT
+    async def buy(self, symbol: str, amount: float, price: float | None = None) -> Order:
+        result = await self.exchange.create_order(symbol, "buy", amount, price)
+        return self._record(symbol, "buy", amount, price, result)
+
+    @_ORDER_SUBMIT
+    async def sell(self, symbol: str, amount: float, price: float | None = None) -> Order:
+        result = await self.exchange.create_order(symbol, "sell", amount, price)
+        return self._record(symbol, "sell", amount, price, result)
+
+    def _late_close(self, symbol: str, amount: float, submit: asyncio.Future):
+        """Réponse REST arrivée après le délai de clôture : l'ordre est comptabilisé."""
+        if self._closing.get(symbol) is submit:
+            del self._closing[symbol]
+        if submit.cancelled() or submit.exception() is not None:
+            return
+        result = submit.result()
+        if result["id"] in self._live:
+            return     # déjà adopté depuis le flux user-data
+        self._record(symbol, "sell", amount, None, result)
+        log.warning(f"[CLOSE] {symbol} — réponse tardive, ordre {result['id']} comptabilisé")
+
+    def _adopt_from_stream(self, symbol: str, amount: float) -> bool:
+        """Ordre de clôture vu par le flux user-data avant la réponse REST :
+        l'Order est créé depuis le flux et les événements en attente rejoués."""
+        for order_id, events in list(self._early.items()):
+            if order_id is None or order_id in self._live:
                 continue
+            if any(e.get("symbol") == symbol and e.get("side") == "sell" for _, e in events):
+                self._record(symbol, "sell", amount, None,
+                             {"id": order_id, "status": "open", "filled": 0.0})
+                log.info(f"[CLOSE] {symbol} — ordre {order_id} repris du flux user-data")
+                return True
+        return False
+
+    async def _reconcile(self, symbol: str, amount: float, submit: asyncio.Future,
+                         timeout: float) -> bool:
+        """Après un délai dépassé : attend la réponse REST ou le flux user-data.
+
+        True si la position a été soldée (réponse tardive ou fills du flux).
+        """
+        p = self.pnl.pairs[symbol]
+        adopted = False
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            if p.position <= 1e-12:
+                return True
+            if submit.done():
+                # `_late_close` a déjà comptabilisé (ou écarté) la réponse
+                return p.position <= 1e-12
+            if not adopted:
+                adopted = self._adopt_from_stream(symbol, amount)
+            await asyncio.sleep(0.05)
+        return p.position <= 1e-12
+
+    async def _close_position(self, symbol: str, deadline: float, retries: int,
+                              backoff: float, reconcile: float = 5.0) -> dict:
+        """Vend la position d'une paire, ré-essais sur erreurs réseau, borné par `deadline`.
+
+        La requête n'est jamais annulée : passé le délai, l'ordre a pu partir et
+        s'exécuter. Il est alors rapproché (réponse tardive ou flux user-data,
+        `reconcile` secondes) avant le rapport ; une réponse encore plus tardive
+        est comptabilisée en tâche de fond.
+        """
+        p = self.pnl.pairs[symbol]
+        start = time.monotonic()
+        report = {"symbol": symbol, "amount": p.position, "status": "failed",
+                  "attempts": 0, "elapsed": 0.0, "error": None}
+        for attempt in range(retries + 1):
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0 or p.position <= 0:
+                break
+            report["attempts"] += 1
+            amount = p.position
+            submit = asyncio.ensure_future(self.exchange.create_order(symbol, "sell", amount))
+            done, _ = await asyncio.wait({submit}, timeout=remaining)
+            if not done:
+                # Statut inconnu (l'ordre a pu partir) → pas de ré-essai, risque de double vente
+                self._closing[symbol] = submit
+                submit.add_done_callback(lambda f, s=symbol, a=amount: self._late_close(s, a, f))
+                if await self._reconcile(symbol, amount, submit, reconcile):
+                    report["status"] = "closed"
+                else:
+                    report["status"] = "unknown" if symbol in self._closing else "timeout"
+                    report["error"] = f"délai {deadline:.1f}s dépassé"
+                    if submit.done() and not submit.cancelled() and submit.exception():
+                        report["error"] = str(submit.exception())
+                break
             try:
-                self.sell(sym, p.position)
-                log.info(f"[CLOSE] {sym} — vendu {p.position:.6f} {p.base}")
+                self._record(symbol, "sell", amount, None, submit.result())
+            except ccxt.NetworkError as e:
+                # Requête non aboutie (hors timeout) → ré-essai avec backoff
+                report["error"] = str(e)
+                if isinstance(e, ccxt.RequestTimeout):
+                    report["status"] = "timeout"
+                    break
+                await asyncio.sleep(min(backoff * 2 ** attempt, max(0.0, remaining)))
             except Exception as e:
-                log.error(f"[CLOSE] {sym} — échec: {e}")
+                report["error"] = str(e)    # rejet exchange (solde, filtres) : définitif
+                break
+            else:
+                report["status"] = "closed"
+                report["error"] = None
+                break
+        report["elapsed"] = time.monotonic() - start
+        if report["status"] == "closed":
+            log.info(f"[CLOSE] {symbol} — vendu {report['amount']:.6f} {p.base} "
+                     f"en {report['elapsed'] * 1000:.0f}ms")
+        elif report["status"] == "unknown":
+            log.error(f"[CLOSE] {symbol} — statut inconnu ({report['error']}) : ordre peut-être "
+                      f"exécuté, comptabilisé dès réception de la réponse")
+        else:
+            log.error(f"[CLOSE] {symbol} — échec ({report['status']}): {report['error']}")
+        return report
+
+    async def close_all_positions(self, deadline: float = 5.0, retries: int = 2,
+                                  backoff: float = 0.25, reconcile: float = 5.0) -> list[dict]:
+        """Ferme toutes les positions ouvertes (vend tout pour revenir en quote).
+
+        Les ventes partent en parallèle ; chacune a `deadline` secondes (ré-essais
+        inclus), plus `reconcile` secondes de rapprochement si le délai est dépassé.
+        Retourne un rapport par paire (status closed / failed / timeout / unknown).
+        """
+        symbols = [sym for sym, p in self.pnl.pairs.items() if p.position > 0]
+        return list(await asyncio.gather(*(
+            self._close_position(sym, deadline, retries, backoff, reconcile) for sym in symbols
+        )))
+
+    def pending_closes(self) -> list[str]:
+        """Paires dont la vente de clôture attend encore sa réponse (statut inconnu)."""
+        return list(self._closing)
+
+    def residual_positions(self) -> dict[str, float]:
+        """Positions encore ouvertes (après clôture : ce qui n'a pas pu être vendu).
+
+        Même filtre que `close_all_positions()` : une position négative (vente d'un
+        solde détenu avant le lancement) n'est jamais clôturée, donc pas résiduelle.
+        """
+        return {sym: p.position for sym, p in self.pnl.pairs.items() if p.position > 1e-12}
+
+    async def cancel(self, order: Order):
+        await self.exchange.cancel_order(order.exchange_id, order.symbol)
+        self._set_status(order, status="cancelled")
 
-    def cancel(self, order: Order):
-        self.exchange.cancel_order(order.exchange_id, order.symbol)
-        order.status = "cancelled"
-        order.save()
+    def get_history(self, limit: int = 100, cursor: str | None = None, **filters) -> tuple[list[Order], str | None]:
+        """Page d'historique (plus récent d'abord). Filtres : symbol, side, status, start, end.
 
-    def get_history(self) -> list:
-        return list(Order.select().order_by(Order.created_at.desc()))
+        Retourne (ordres, cursor) — repasser le cursor pour la page suivante (None = fin).
+        """
+        return history_page(limit, cursor, **filters)
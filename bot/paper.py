@@ -0,0 +1,322 @@
+import asyncio
+import heapq
+import random
+import time
+from collections import deque
+from ccxt.base.errors import InsufficientFunds, InvalidOrder, OrderNotFound, ExchangeError
+from utils.logger import log
+
+
+class _PaperOrder:
+    __slots__ = ("id", "seq", "symbol", "side", "type", "price", "amount",
+                 "filled", "cost", "fee", "status", "timestamp")
+
+    def __init__(self, oid, seq, symbol, side, otype, price, amount, timestamp):
+        self.id = oid
+        self.seq = seq
+        self.symbol = symbol
+        self.side = side
+        self.type = otype
+        self.price = price
+        self.amount = amount
+        self.filled = 0.0
+        self.cost = 0.0
+        self.fee = 0.0
+        self.status = "open"
+        self.timestamp = timestamp
+
+    def to_ccxt(self, fee_currency: str) -> dict:
+        """Format d'ordre ccxt (sous-ensemble utilisé par OrderManager)."""
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "type": self.type,
+            "price": self.price,
+            "average": self.cost / self.filled if self.filled else None,
+            "amount": self.amount,
+            "filled": self.filled,
+            "remaining": self.amount - self.filled,
+            "cost": self.cost,
+            "status": self.status,
+            "timestamp": self.timestamp,
+            "fee": {"cost": self.fee, "currency": fee_currency},
+        }
+
+
+class _Book:
+    """Carnet d'ordres limites d'une paire — priorité prix puis temps (seq)."""
+    def __init__(self):
+        self.bids: list = []   # heap (-prix, seq, ordre)
+        self.asks: list = []   # heap (prix, seq, ordre)
+
+    def add(self, order: _PaperOrder):
+        if order.side == "buy":
+            heapq.heappush(self.bids, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(self.asks, (order.price, order.seq, order))
+
+    @staticmethod
+    def _top(heap):
+        # Suppression paresseuse des ordres annulés / remplis
+        while heap and heap[0][2].status != "open":
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def best_bid(self):
+        return self._top(self.bids)
+
+    def best_ask(self):
+        return self._top(self.asks)
+
+
+class _PaperClient:
+    """Imite `ccxt.binance` pour ce que le reste du code lit (`markets`)."""
+    def __init__(self, markets: dict):
+        self.markets = markets
+
+
+class PaperExchange:
+    """Exchange simulé en process — même interface que `Exchange`.
+
+    Les ordres market sont remplis au dernier prix du feed (live ou rejoué),
+    les ordres limit reposent dans un carnet par paire (priorité prix-temps)
+    et sont remplis quand un trade du feed croise leur prix. Fees maker/taker
+    et latence simulée configurables ; tout est déterministe (ids séquentiels,
+    jitter tiré d'un RNG seedé), sans réseau.
+    """
+
+    DEFAULT_LIMITS = {"cost": {"min": 5.0}, "amount": {"min": 0.00001}}
+
+    def __init__(self, paper: dict, symbols: list[str] | None = None,
+                 markets: dict | None = None):
+        self.maker_fee = paper.get("maker_fee", 0.001)
+        self.taker_fee = paper.get("taker_fee", 0.001)
+        self.latency = paper.get("latency_ms", 0) / 1000
+        self.jitter = paper.get("jitter_ms", 0) / 1000
+        self._rng = random.Random(paper.get("seed", 0))
+
+        balances = paper.get("balances", {"USDT": 10_000.0})
+        self._free: dict[str, float] = {k: float(v) for k, v in balances.items()}
+        self._used: dict[str, float] = {k: 0.0 for k in balances}
+
+        self.client = _PaperClient(markets or {
+            sym: {"symbol": sym, "base": sym.split("/")[0], "quote": sym.split("/")[1],
+                  "limits": self.DEFAULT_LIMITS}
+            for sym in (symbols or [])
+        })
+        self._books: dict[str, _Book] = {}
+        self._orders: dict[str, _PaperOrder] = {}
+        self._last_price: dict[str, float] = {}
+        self._last_ts: dict[str, int] = {}
+        self._seq = 0
+        self._trade_seq = 0
+        self._streams: dict[str, asyncio.Queue] = {}   # flux watch_* ouverts
+        self.fills: deque[dict] = deque(maxlen=100_000)   # journal des exécutions récentes
+        log.info("Exchange PAPER initialisé (simulation locale)")
+
+    # ── Prix du feed ──
+
+    def on_trade(self, symbol: str, price: float, amount: float | None = None,
+                 timestamp_ms: int | None = None):
+        """Trade du feed : met à jour le dernier prix et matche le carnet.
+
+        `amount` limite la liquidité disponible pour les ordres au repos
+        (None = liquidité illimitée).
+        """
+        self._last_price[symbol] = price
+        if timestamp_ms is not None:
+            self._last_ts[symbol] = timestamp_ms
+        book = self._books.get(symbol)
+        if book is None:
+            return
+        liquidity = amount if amount is not None else float("inf")
+        while liquidity > 0:
+            bid = book.best_bid()
+            if bid is not None and bid.price >= price:
+                liquidity -= self._fill(bid, bid.price, liquidity, maker=True)
+                continue
+            ask = book.best_ask()
+            if ask is not None and ask.price <= price:
+                liquidity -= self._fill(ask, ask.price, liquidity, maker=True)
+                continue
+            break
+
+    # ── Helpers ──
+
+    def _split(self, symbol: str) -> tuple[str, str]:
+        base, quote = symbol.split("/")
+        self._free.setdefault(base, 0.0)
+        self._free.setdefault(quote, 0.0)
+        self._used.setdefault(base, 0.0)
+        self._used.setdefault(quote, 0.0)
+        return base, quote
+
+    def _now_ms(self, symbol: str) -> int:
+        return self._last_ts.get(symbol) or int(time.time() * 1000)
+
+    async def _simulate_latency(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+
+    def _fill(self, order: _PaperOrder, price: float, max_amount: float, maker: bool) -> float:
+        """Remplit (partiellement) un ordre. Retourne la quantité exécutée."""
+        base, quote = self._split(order.symbol)
+        qty = min(order.amount - order.filled, max_amount)
+        if qty <= 0:
+            return 0.0
+        cost = qty * price
+        fee = cost * (self.maker_fee if maker else self.taker_fee)
+        resting = order.type == "limit"
+        if order.side == "buy":
+            if resting:
+                # Libère la réservation au prix limite, puis paie au prix d'exécution
+                self._used[quote] -= qty * order.price
+                self._free[quote] += qty * order.price
+            self._free[quote] -= cost + fee
+            self._free[base] += qty
+        else:
+            if resting:
+                self._used[base] -= qty
+            else:
+                self._free[base] -= qty
+            self._free[quote] += cost - fee
+        order.filled += qty
+        order.cost += cost
+        order.fee += fee
+        if order.filled >= order.amount - 1e-12:
+            order.status = "closed"
+        self._trade_seq += 1
+        trade = {
+            "id": f"paper-t{self._trade_seq}", "order": order.id,
+            "symbol": order.symbol, "side": order.side, "price": price,
+            "amount": qty, "cost": cost, "fee": {"cost": fee, "currency": quote},
+            "takerOrMaker": "maker" if maker else "taker",
+            "timestamp": self._now_ms(order.symbol),
+        }
+        self.fills.append(trade)
+        self._push("trades", trade)
+        self._push("orders", order.to_ccxt(quote))
+        self._push("balance", None)
+        return qty
+
+    def add_market(self, symbol: str, market: dict | None = None):
+        """Paire ajoutée en cours de run (rechargement de la config)."""
+        self.client.markets.setdefault(symbol, market or {
+            "symbol": symbol, "base": symbol.split("/")[0], "quote": symbol.split("/")[1],
+            "limits": self.DEFAULT_LIMITS})
+
+    # ── Interface Exchange ──
+
+    async def load_markets(self) -> dict:
+        return self.client.markets
+
+    async def create_order(self, symbol: str, side: str, amount: float, price: float | None = None) -> dict:
+        await self._simulate_latency()
+        base, quote = self._split(symbol)
+        last = self._last_price.get(symbol)
+        if amount <= 0:
+            raise InvalidOrder(f"Quantité invalide: {amount}")
+
+        self._seq += 1
+        otype = "market" if price is None else "limit"
+        order = _PaperOrder(f"paper-{self._seq}", self._seq, symbol, side, otype,
+                            price, amount, self._now_ms(symbol))
+
+        if otype == "market":
+            if last is None:
+                raise ExchangeError(f"Pas de prix pour {symbol} (feed pas encore reçu)")
+            if side == "buy" and self._free[quote] < amount * last * (1 + self.taker_fee):
+                raise InsufficientFunds(f"Solde {quote} insuffisant")
+            if side == "sell" and self._free[base] < amount:
+                raise InsufficientFunds(f"Solde {base} insuffisant")
+            self._fill(order, last, amount, maker=False)
+        else:
+            # Réserver les fonds de l'ordre au repos
+            if side == "buy":
+                need = amount * price
+                if self._free[quote] < need * (1 + self.taker_fee):
+                    raise InsufficientFunds(f"Solde {quote} insuffisant")
+                self._free[quote] -= need
+                self._used[quote] += need
+            else:
+                if self._free[base] < amount:
+                    raise InsufficientFunds(f"Solde {base} insuffisant")
+                self._free[base] -= amount
+                self._used[base] += amount
+            # Ordre limite marketable → exécuté immédiatement (taker) au dernier prix
+            if last is not None and ((side == "buy" and price >= last) or
+                                     (side == "sell" and price <= last)):
+                self._fill(order, last, amount, maker=False)
+            if order.status == "open":
+                self._books.setdefault(symbol, _Book()).add(order)
+
+        self._orders[order.id] = order
+        if order.status == "open":
+            self._push("orders", order.to_ccxt(quote))
+            self._push("balance", None)
+        log.debug(f"[PAPER] Ordre {side} {amount} {symbol} @ {price or 'market'}")
+        return order.to_ccxt(quote)
+
+    async def cancel_order(self, order_id: str, symbol: str) -> dict:
+        await self._simulate_latency()
+        order = self._orders.get(order_id)
+        if order is None or order.symbol != symbol:
+            raise OrderNotFound(f"Ordre {order_id} inconnu")
+        base, quote = self._split(symbol)
+        if order.status == "open":
+            remaining = order.amount - order.filled
+            if order.side == "buy":
+                self._used[quote] -= remaining * order.price
+                self._free[quote] += remaining * order.price
+            else:
+                self._used[base] -= remaining
+                self._free[base] += remaining
+            order.status = "canceled"
+            self._push("orders", order.to_ccxt(quote))
+            self._push("balance", None)
+        log.debug(f"[PAPER] Ordre {order_id} annulé")
+        return order.to_ccxt(quote)
+
+    async def fetch_order(self, order_id: str, symbol: str) -> dict:
+        order = self._orders.get(order_id)
+        if order is None:
+            raise OrderNotFound(f"Ordre {order_id} inconnu")
+        return order.to_ccxt(symbol.split("/")[1])
+
+    async def fetch_balance(self) -> dict:
+        balance = {"free": {}, "used": {}, "total": {}}
+        for cur in self._free:
+            free, used = self._free[cur], self._used.get(cur, 0.0)
+            balance["free"][cur] = free
+            balance["used"][cur] = used
+            balance["total"][cur] = free + used
+            balance[cur] = {"free": free, "used": used, "total": free + used}
+        return balance
+
+    # ── Flux user-data (même API que ccxt.pro) ──
+
+    def _push(self, kind: str, event):
+        q = self._streams.get(kind)
+        if q is not None:   # Rien n'est accumulé tant que personne n'écoute
+            q.put_nowait(event)
+
+    async def _watch(self, kind: str) -> list:
+        q = self._streams.setdefault(kind, asyncio.Queue())
+        events = [await q.get()]
+        while not q.empty():
+            events.append(q.get_nowait())
+        return events
+
+    async def watch_orders(self, symbol=None, since=None, limit=None, params={}) -> list[dict]:
+        return await self._watch("orders")
+
+    async def watch_my_trades(self, symbol=None, since=None, limit=None, params={}) -> list[dict]:
+        return await self._watch("trades")
+
+    async def watch_balance(self, params={}) -> dict:
+        await self._watch("balance")
+        return await self.fetch_balance()
+
+    async def close(self):
+        pass
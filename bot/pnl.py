@@ -0,0 +1,105 @@
+from utils.logger import log
+
+
+class _PairPNL:
+    """PNL tracker pour une paire donnée (valeurs en devise quote)."""
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        base, quote = symbol.split("/")
+        self.base = base
+        self.quote = quote
+        self.position = 0.0
+        self.cash_flow = 0.0
+        self.total_trades = 0
+        self.total_buys = 0
+        self.total_sells = 0
+        # Mark-to-market : dernier prix connu et valeur (cash_flow + position × prix)
+        self.price = 0.0
+        self.value = 0.0
+
+
+class PnlEngine:
+    """PNL mark-to-market incrémental, agrégé par devise quote puis converti en USDT.
+
+    Chaque changement de prix ou fill ne touche qu'une paire et le total de sa
+    devise quote (O(1)). Les taux de conversion quote → USDT viennent des feeds
+    live `{quote}/USDT` (paires tradées ou feeds de conversion dédiés).
+    """
+    def __init__(self, home: str = "USDT"):
+        self.home = home
+        self.pairs: dict[str, _PairPNL] = {}
+        self._by_quote: dict[str, float] = {}       # quote → somme des valeurs
+        self._rates: dict[str, float] = {home: 1.0}  # quote → prix en home
+        self._missing_rates: set[str] = set()
+
+    def pair(self, symbol: str) -> _PairPNL:
+        p = self.pairs.get(symbol)
+        if p is None:
+            p = _PairPNL(symbol)
+            self.pairs[symbol] = p
+            self._by_quote.setdefault(p.quote, 0.0)
+        return p
+
+    def conversion_symbols(self, symbols: list[str]) -> list[str]:
+        """Paires `{quote}/home` nécessaires à la conversion et absentes de `symbols`."""
+        needed = []
+        for sym in symbols:
+            quote = sym.split("/")[1]
+            conv = f"{quote}/{self.home}"
+            if quote != self.home and conv not in symbols and conv not in needed:
+                needed.append(conv)
+        return needed
+
+    def _revalue(self, p: _PairPNL):
+        value = p.cash_flow + p.position * p.price
+        self._by_quote[p.quote] += value - p.value
+        p.value = value
+
+    def on_price(self, symbol: str, price: float):
+        """Nouveau prix live : met à jour le taux de conversion et/ou le mark de la paire."""
+        base, quote = symbol.split("/")
+        if quote == self.home:
+            self._rates[base] = price
+        p = self.pairs.get(symbol)
+        if p is not None:
+            p.price = price
+            self._revalue(p)
+
+    def set_rate(self, quote: str, rate: float):
+        """Force un taux de conversion (ex: valeur REST au démarrage)."""
+        self._rates[quote] = rate
+
+    def on_fill(self, symbol: str, side: str, price: float, amount: float) -> _PairPNL:
+        p = self.pair(symbol)
+        if side == "buy":
+            p.position += amount
+            p.cash_flow -= price * amount
+            p.total_buys += 1
+        else:
+            p.position -= amount
+            p.cash_flow += price * amount
+            p.total_sells += 1
+        p.total_trades += 1
+        if p.price == 0.0:
+            p.price = price
+        self._revalue(p)
+        return p
+
+    def total_by_quote(self) -> dict[str, float]:
+        return dict(self._by_quote)
+
+    def total(self) -> float:
+        """PNL total converti en devise home (USDT).
+
+        Les devises quote sans taux connu sont ignorées (warning une seule fois).
+        """
+        total = 0.0
+        for quote, value in self._by_quote.items():
+            rate = self._rates.get(quote)
+            if rate is None:
+                if quote not in self._missing_rates:
+                    self._missing_rates.add(quote)
+                    log.warning(f"[PNL] Pas de taux {quote}/{self.home} — PNL {quote} ignoré")
+                continue
+            total += value * rate
+        return total
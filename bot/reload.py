@@ -0,0 +1,199 @@
+"""Rechargement à chaud de `config.yaml` (section `reload:`).
+
+`ConfigWatcher` relit le fichier quand sa date de modification change
+(scrutée toutes les `interval` s) ou sur SIGHUP, et compare avec la version
+précédente : `diff()` ne retient que ce qui s'applique sans redémarrer.
+
+- `trading.symbols` : paires ajoutées (feed, fenêtre, ordres random) ou
+  retirées ; les autres paires gardent leur websocket.
+- Flags d'indicateurs d'une paire, sections `ema` / `rsi` / `macd` /
+  `quantum` / `chart` : seules les fenêtres dont l'affichage change sont
+  relancées, indicateurs réchauffés sur l'historique + les bougies du feed.
+
+Tout autre changement (exchange, `candle_seconds`, stratégies, shards, ...)
+est signalé et pris en compte au prochain démarrage.
+"""
+import asyncio
+import signal
+import time
+import yaml
+from pathlib import Path
+from utils.logger import log
+
+# Sections appliquées à chaud (fenêtres des paires)
+CHART_SECTIONS = ("ema", "rsi", "macd", "quantum", "chart")
+
+
+def parse_symbols(raw: list) -> tuple[list[str], dict]:
+    """`trading.symbols` → (paires, flags d'affichage par paire).
+
+    Supporte l'ancien format (`- BTC/USDT`, EMA/RSI/MACD activés) et le
+    nouveau (`- symbol: BTC/USDT` + flags).
+    """
+    symbols = []
+    flags = {}
+    for entry in raw:
+        if isinstance(entry, str):
+            symbols.append(entry)
+            flags[entry] = {"ema": True, "rsi": True, "macd": True}
+        else:
+            sym = entry["symbol"]
+            symbols.append(sym)
+            flags[sym] = {
+                "ema": entry.get("ema", True),
+                "rsi": entry.get("rsi", True),
+                "macd": entry.get("macd", True),
+                "quantum_line": entry.get("quantum_line", False),
+                "quantum_window": entry.get("quantum_window", False),
+                "lin_compass": entry.get("lin_compass", False),
+            }
+    return symbols, flags
+
+
+def chart_spec(flags: dict, config: dict) -> tuple:
+    """Ce que la fenêtre d'une paire affiche (mêmes filtres que `create_chart`)."""
+    quantum = None
+    shown = (flags.get("quantum_line", False), flags.get("quantum_window", False),
+             flags.get("lin_compass", False))
+    if config.get("quantum") and any(shown):
+        quantum = (config["quantum"], shown)
+    chart = {k: v for k, v in (config.get("chart") or {}).items() if k != "pnl_interval"}
+    return (chart,
+            config.get("ema", []) if flags["ema"] else [],
+            config.get("rsi", []) if flags["rsi"] else [],
+            config.get("macd") if flags["macd"] else None,
+            quantum)
+
+
+def warm_history(history: list, feed, limit: int) -> list:
+    """Historique de warmup complété par les bougies fermées du feed (close, volume)."""
+    closed = [(c["close"], c["volume"]) for c in feed.candles[-limit:]] if feed is not None else []
+    return (list(history) + closed)[-limit:]
+
+
+class ReloadDiff:
+    """Changements applicables à chaud entre deux versions de la config."""
+    __slots__ = ("symbols", "flags", "added", "removed", "charts", "restart")
+
+    def __init__(self, symbols: list[str], flags: dict):
+        self.symbols = symbols              # paires de la nouvelle config, dans l'ordre
+        self.flags = flags
+        self.added: list[str] = []
+        self.removed: list[str] = []
+        self.charts: list[str] = []         # paires conservées dont la fenêtre change
+        self.restart: list[str] = []        # sections modifiées non rechargeables
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.charts)
+
+    def describe(self) -> str:
+        parts = []
+        if self.added:
+            parts.append(f"+{len(self.added)} paire(s) ({', '.join(self.added)})")
+        if self.removed:
+            parts.append(f"-{len(self.removed)} paire(s) ({', '.join(self.removed)})")
+        if self.charts:
+            parts.append(f"{len(self.charts)} fenêtre(s) à relancer ({', '.join(self.charts)})")
+        return ", ".join(parts) or "aucun changement applicable"
+
+
+def diff(old: dict, new: dict) -> ReloadDiff:
+    old_symbols, old_flags = parse_symbols(old["trading"]["symbols"])
+    new_symbols, new_flags = parse_symbols(new["trading"]["symbols"])
+    result = ReloadDiff(new_symbols, new_flags)
+    result.added = [s for s in new_symbols if s not in old_flags]
+    result.removed = [s for s in old_symbols if s not in new_flags]
+    result.charts = [s for s in new_symbols if s in old_flags
+                     and chart_spec(old_flags[s], old) != chart_spec(new_flags[s], new)]
+
+    for key in sorted(set(old) | set(new)):
+        if key == "trading":
+            result.restart += [f"trading.{k}" for k in sorted(set(old[key]) | set(new[key]))
+                               if k != "symbols" and old[key].get(k) != new[key].get(k)]
+        elif key == "chart":
+            if (old.get(key) or {}).get("pnl_interval") != (new.get(key) or {}).get("pnl_interval"):
+                result.restart.append("chart.pnl_interval")
+        elif key not in CHART_SECTIONS and old.get(key) != new.get(key):
+            result.restart.append(key)
+    return result
+
+
+def load(path: Path) -> dict:
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+class ConfigWatcher:
+    """Relit `config.yaml` à chaque modification (ou SIGHUP) et appelle `apply(config, diff)`.
+
+    Les diffs se font entre versions du fichier : les options forcées en
+    ligne de commande (`--shards`, `--memory`, ...) n'apparaissent jamais
+    comme des changements. Fichier illisible ou invalide → ignoré, la
+    version précédente reste la référence.
+    """
+    def __init__(self, path: Path, interval: float = 2.0, watch: bool = True):
+        self.path = Path(path)
+        self.interval = interval
+        self.watch = watch                  # False : SIGHUP seulement
+        self.config = load(self.path)
+        self._mtime = self._stat()
+        self.reloads = 0
+
+    @classmethod
+    def from_config(cls, path: Path, config: dict) -> "ConfigWatcher":
+        """`config` : section `reload:`."""
+        return cls(path, config.get("interval", 2.0), config.get("watch", True))
+
+    def _stat(self) -> float | None:
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    async def _reload(self, apply):
+        try:
+            new = await asyncio.to_thread(load, self.path)
+            changes = diff(self.config, new)
+        except (OSError, yaml.YAMLError, KeyError, TypeError) as e:
+            log.warning(f"[RELOAD] {self.path.name} ignoré ({type(e).__name__}: {e})")
+            return
+        self.config = new
+        if changes.restart:
+            log.warning(f"[RELOAD] {', '.join(changes.restart)} modifié(s) : "
+                        f"pris en compte au prochain démarrage")
+        if not changes:
+            log.info("[RELOAD] aucun changement applicable à chaud")
+            return
+        start = time.monotonic()
+        log.info(f"[RELOAD] {changes.describe()}")
+        try:
+            await apply(new, changes)
+        except Exception as e:
+            log.error(f"[RELOAD] application incomplète : {e}")
+            return
+        self.reloads += 1
+        log.info(f"[RELOAD] appliqué en {(time.monotonic() - start) * 1000:.0f}ms")
+
+    async def run(self, apply):
+        loop = asyncio.get_running_loop()
+        signaled = asyncio.Event()
+        loop.add_signal_handler(signal.SIGHUP, signaled.set)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(signaled.wait(), self.interval if self.watch else None)
+                except asyncio.TimeoutError:
+                    pass
+                forced = signaled.is_set()
+                signaled.clear()
+                mtime = self._stat()
+                if not forced and mtime == self._mtime:
+                    continue
+                if not forced:
+                    # Écriture en plusieurs fois (éditeurs) : attendre un fichier stable
+                    await asyncio.sleep(0.2)
+                    mtime = self._stat()
+                self._mtime = mtime
+                await self._reload(apply)
+        finally:
+            loop.remove_signal_handler(signal.SIGHUP)
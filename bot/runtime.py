@@ -0,0 +1,266 @@
+import asyncio
+import importlib
+import time
+import numpy as np
+import pandas as pd
+from bot.indicators import EMA, RSI, MACD, QuantumIndicator
+from utils.logger import log
+from utils.metrics import LatencyStats
+from utils.profiling import Section
+
+
+class RollingWindow:
+    """Bougies fermées sur tampon numpy circulaire, lues en vues sans copie.
+
+    Chaque bougie est écrite deux fois (`i` et `i + capacity`) : les N
+    dernières sont toujours contiguës en mémoire → `window.close` est une
+    simple vue (lecture seule), pas de reconstruction de DataFrame.
+    """
+    FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = capacity
+        self._buf = np.zeros((len(self.FIELDS), 2 * capacity))
+        self._pos = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, time_s: float, open_: float, high: float, low: float,
+               close: float, volume: float):
+        row = (time_s, open_, high, low, close, volume)
+        self._buf[:, self._pos] = row
+        self._buf[:, self._pos + self.capacity] = row
+        self._pos = (self._pos + 1) % self.capacity
+        if self._len < self.capacity:
+            self._len += 1
+
+    def column(self, field: str, n: int | None = None) -> np.ndarray:
+        """Les `n` dernières valeurs de `field` (toutes par défaut), plus ancienne d'abord."""
+        n = self._len if n is None else min(n, self._len)
+        end = self._pos + self.capacity
+        view = self._buf[self.FIELDS.index(field), end - n:end]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.column("time")
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.column("open")
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.column("high")
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.column("low")
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.column("close")
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.column("volume")
+
+    def to_frame(self) -> pd.DataFrame:
+        """Copie en DataFrame (outils, debug) — pas pour le chemin chaud."""
+        return pd.DataFrame({f: self.column(f) for f in self.FIELDS})
+
+
+_INDICATOR_UPDATE = Section("indicator_update")
+
+_FACTORIES = {"ema": EMA, "rsi": RSI, "macd": MACD, "quantum": QuantumIndicator}
+
+
+def _indicator_value(ind):
+    if isinstance(ind, MACD):
+        return (ind.macd, ind.signal, ind.histogram) if ind.initialized else None
+    if isinstance(ind, QuantumIndicator):
+        return (ind.omega, ind.sigma, ind.fit_quality) if ind.initialized else None
+    return ind.value
+
+
+class IndicatorSet:
+    """Indicateurs d'une paire, dédupliqués par spec et mis à jour une fois par bougie."""
+    def __init__(self):
+        self._by_spec: dict[tuple, object] = {}
+        self.values: dict[tuple, object] = {}      # spec → valeur courante
+
+    def add(self, spec: tuple) -> tuple:
+        spec = tuple(spec)
+        if spec not in self._by_spec:
+            kind, *args = spec
+            self._by_spec[spec] = _FACTORIES[kind](*args)
+            self.values[spec] = _indicator_value(self._by_spec[spec])
+        return spec
+
+    @_INDICATOR_UPDATE
+    def update(self, close: float, volume: float):
+        for spec, ind in self._by_spec.items():
+            if isinstance(ind, QuantumIndicator):
+                ind.update(close, volume)
+            else:
+                ind.update(close)
+            self.values[spec] = _indicator_value(ind)
+
+    def snapshot(self, names: dict[str, tuple]) -> dict:
+        """{nom: valeur} pour les noms déclarés par une stratégie."""
+        return {name: self.values[spec] for name, spec in names.items()}
+
+
+class _Slot:
+    __slots__ = ("strategy", "names", "candle_latency", "tick_latency", "overruns",
+                 "suspended", "errors")
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.names = {name: tuple(spec) for name, spec in strategy.indicators.items()}
+        self.candle_latency = LatencyStats()
+        self.tick_latency = LatencyStats()
+        self.overruns = 0          # dépassements consécutifs du budget (on_tick)
+        self.suspended = False
+        self.errors = 0
+
+
+class StrategyRuntime:
+    """Répartit trades et bougies fermées vers les stratégies enregistrées par paire.
+
+    - Par paire : une `RollingWindow` et un `IndicatorSet` communs à toutes
+      ses stratégies (indicateurs calculés une seule fois par bougie).
+    - Budget par callback (`budget_ms`) : un callback synchrone ne peut pas
+      être interrompu, donc chaque dépassement est mesuré et loggé ; après
+      `max_overruns` dépassements consécutifs sur `on_tick`, la stratégie ne
+      reçoit plus les ticks (les bougies continuent).
+    - Latence p50/p99/max par stratégie et par callback, loggée `[STRAT]`.
+    """
+    def __init__(self, budget_ms: float = 5.0, window: int = 500,
+                 max_overruns: int = 10, report_every: float = 60.0):
+        self.budget = budget_ms / 1000
+        self.window_size = window
+        self.max_overruns = max_overruns
+        self.report_every = report_every
+        self.windows: dict[str, RollingWindow] = {}
+        self.indicators: dict[str, IndicatorSet] = {}
+        self._slots: dict[str, list[_Slot]] = {}
+        self._all: list[_Slot] = []
+        self.closed = False
+
+    @classmethod
+    def from_config(cls, config: dict, order_manager) -> "StrategyRuntime":
+        """`config` : section `strategies:` — runtime + liste {class, symbols, params}."""
+        runtime = cls(config.get("budget_ms", 5.0), config.get("window", 500),
+                      config.get("max_overruns", 10), config.get("report_every", 60.0))
+        for entry in config.get("instances", []):
+            module, _, name = entry["class"].partition(":")
+            strategy_cls = getattr(importlib.import_module(module), name)
+            runtime.register(strategy_cls(order_manager, **entry.get("params", {})),
+                             entry["symbols"])
+        return runtime
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._slots)
+
+    def register(self, strategy, symbols: list[str]):
+        slot = _Slot(strategy)
+        self._all.append(slot)
+        for symbol in symbols:
+            self._slots.setdefault(symbol, []).append(slot)
+            self.windows.setdefault(symbol, RollingWindow(self.window_size))
+            ind = self.indicators.setdefault(symbol, IndicatorSet())
+            for spec in slot.names.values():
+                ind.add(spec)
+        log.info(f"[STRAT {strategy.name}] enregistrée sur {', '.join(symbols)}")
+
+    def warmup(self, symbol: str, history: list, candle_seconds: int):
+        """Pré-remplit fenêtre et indicateurs avec l'historique (close, volume)."""
+        window = self.windows.get(symbol)
+        if window is None:
+            return
+        t = time.time() - len(history) * candle_seconds
+        for close, volume in history:
+            window.append(t, close, close, close, close, volume)
+            self.indicators[symbol].update(close, volume)
+            t += candle_seconds
+
+    def _call(self, slot: _Slot, stats: LatencyStats, fn, *args) -> float:
+        start = time.perf_counter()
+        try:
+            fn(*args)
+        except Exception as e:
+            slot.errors += 1
+            log.error(f"[STRAT {slot.strategy.name}] {fn.__name__} : {e}")
+        elapsed = time.perf_counter() - start
+        stats.add(elapsed)
+        return elapsed
+
+    def on_event(self, e):
+        """Abonné du bus : `Trade` et `CandleClose` dans une même file (ordre de publication)."""
+        if e.TOPIC == "trade":
+            self.on_trade(e.symbol, e.price, e.amount, e.ts)
+        else:
+            self.on_candle(e.symbol, e.candle)
+
+    def on_trade(self, symbol: str, price: float, amount: float, timestamp_ms: int):
+        slots = self._slots.get(symbol)
+        if not slots or self.closed:
+            return
+        tick = {"symbol": symbol, "price": price, "amount": amount, "timestamp": timestamp_ms}
+        for slot in slots:
+            if slot.suspended:
+                continue
+            elapsed = self._call(slot, slot.tick_latency, slot.strategy.on_tick, tick)
+            if elapsed <= self.budget:
+                slot.overruns = 0
+                continue
+            slot.overruns += 1
+            if slot.overruns >= self.max_overruns:
+                slot.suspended = True
+                log.error(f"[STRAT {slot.strategy.name}] on_tick au-delà du budget "
+                          f"({self.budget * 1000:.1f}ms) {slot.overruns} fois de suite — ticks suspendus")
+
+    def on_candle(self, symbol: str, candle: dict):
+        slots = self._slots.get(symbol)
+        if not slots or self.closed:
+            return
+        self.windows[symbol].append(candle["_ms"] / 1000, candle["open"], candle["high"],
+                                    candle["low"], candle["close"], candle["volume"])
+        ind = self.indicators[symbol]
+        ind.update(candle["close"], candle["volume"])
+        window = self.windows[symbol]
+        for slot in slots:
+            elapsed = self._call(slot, slot.candle_latency, slot.strategy.on_candle,
+                                 symbol, window, ind.snapshot(slot.names))
+            if elapsed > self.budget:
+                log.warning(f"[STRAT {slot.strategy.name}] on_candle {symbol} : "
+                            f"{elapsed * 1000:.1f}ms > budget {self.budget * 1000:.1f}ms")
+
+    def _report(self):
+        for slot in self._all:
+            parts = []
+            for kind, stats in (("candle", slot.candle_latency), ("tick", slot.tick_latency)):
+                st = stats.summary()
+                if st["count"]:
+                    parts.append(f"{kind} p50={st['p50_ms']:.2f}ms p99={st['p99_ms']:.2f}ms "
+                                 f"max={st['max_ms']:.2f}ms ({st['count']})")
+                stats.reset()
+            if parts:
+                state = " — ticks suspendus" if slot.suspended else ""
+                log.info(f"[STRAT {slot.strategy.name}] {' | '.join(parts)} — "
+                         f"erreurs: {slot.errors}{state}")
+
+    async def run(self):
+        """Tâche de fond : rapport de latence périodique."""
+        while True:
+            await asyncio.sleep(self.report_every)
+            self._report()
+
+    async def close(self):
+        """Plus aucun callback de stratégie (clôture des positions en cours)."""
+        self.closed = True
@@ -0,0 +1,308 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+import ccxt
+from utils.logger import log
+from utils.metrics import LatencyStats
+
+# Priorités (plus petit = servi d'abord) : une annulation réduit le risque,
+# elle passe avant un nouvel ordre ; les lectures passent en dernier.
+PRIO_CANCEL = 0
+PRIO_ORDER = 1
+PRIO_READ = 2
+_PRIO_NAMES = {PRIO_CANCEL: "cancel", PRIO_ORDER: "order", PRIO_READ: "read"}
+
+# Poids REQUEST_WEIGHT Binance Spot par endpoint
+WEIGHTS = {
+    "create_order": 1,
+    "cancel_order": 1,
+    "fetch_order": 4,
+    "fetch_balance": 20,
+    "load_markets": 20,
+}
+
+
+class _Window:
+    """Compteur sur fenêtre glissante (`seconds`) avec plafond `limit`."""
+    def __init__(self, seconds: float, limit: float):
+        self.seconds = seconds
+        self.limit = limit
+        self._events: deque = deque()   # (t, poids)
+        self.used = 0.0
+
+    def _expire(self, now: float):
+        while self._events and self._events[0][0] <= now - self.seconds:
+            self.used -= self._events.popleft()[1]
+
+    def wait_for(self, weight: float, now: float) -> float:
+        """0 si `weight` tient dans la fenêtre, sinon secondes avant que ce soit le cas."""
+        self._expire(now)
+        if self.used + weight <= self.limit:
+            return 0.0
+        excess = self.used + weight - self.limit
+        for t, w in self._events:
+            excess -= w
+            if excess <= 0:
+                return t + self.seconds - now
+        return self.seconds
+
+    def add(self, weight: float, now: float):
+        self._events.append((now, weight))
+        self.used += weight
+
+
+class _Request:
+    __slots__ = ("prio", "symbol", "weight", "is_order", "call", "future",
+                 "submitted", "key", "retries")
+
+    def __init__(self, prio, symbol, weight, is_order, call, future, key):
+        self.prio = prio
+        self.symbol = symbol
+        self.weight = weight
+        self.is_order = is_order
+        self.call = call
+        self.future = future
+        self.submitted = time.monotonic()
+        self.key = key
+        self.retries = 0
+
+
+class RequestScheduler:
+    """Ordonnanceur central devant `Exchange` (ou `PaperExchange`), même interface.
+
+    - Respecte les limites Binance sur fenêtres glissantes : poids REST par
+      minute, nombre d'ordres par 10s et par jour (avec marge `safety`).
+      Le poids renvoyé par le serveur (`x-mbx-used-weight-1m`) recale le
+      compteur local s'il est plus élevé.
+    - Priorités : cancel > nouvel ordre > lecture. Dans une priorité, file
+      round-robin par symbole (une paire bavarde ne monopolise pas le débit).
+    - Coalescing : `fetch_balance` et `cancel_order` identiques en attente
+      partagent la même requête.
+    - 429/418 : pause globale (Retry-After) puis ré-essai en tête de file.
+    - Métriques : latence d'attente en file par priorité, profondeur de file.
+    """
+    def __init__(self, exchange, limits: dict | None = None):
+        limits = limits or {}
+        safety = limits.get("safety", 0.9)
+        self.exchange = exchange
+        self._weight = _Window(60, limits.get("weight_per_minute", 6000) * safety)
+        self._orders_10s = _Window(10, limits.get("orders_per_10s", 100) * safety)
+        self._orders_day = _Window(86400, limits.get("orders_per_day", 200_000) * safety)
+        self._max_retries = limits.get("max_retries", 3)
+        self.report_every = limits.get("report_every", 60.0)
+
+        self._queues: dict[int, OrderedDict] = {p: OrderedDict() for p in _PRIO_NAMES}
+        self._pending: dict = {}              # clé de coalescing → future
+        self._wake = asyncio.Event()
+        self._blocked_until = 0.0
+        self.queue_latency = {p: LatencyStats() for p in _PRIO_NAMES}
+        self.dispatched = 0
+        self.rate_limited = 0
+        self._task: asyncio.Task | None = None
+        self._inflight: dict[asyncio.Task, _Request] = {}
+        self._closed = False
+
+        # Le throttle interne de ccxt (1 requête / rateLimit ms) est remplacé par ce scheduler
+        if hasattr(exchange.client, "enableRateLimit"):
+            exchange.client.enableRateLimit = False
+
+    @property
+    def client(self):
+        return self.exchange.client
+
+    def __getattr__(self, name):
+        # Méthodes spécifiques au backend (ex: PaperExchange.on_trade)
+        return getattr(self.exchange, name)
+
+    # ── Interface Exchange ──
+
+    async def create_order(self, symbol: str, side: str, amount: float, price: float | None = None) -> dict:
+        fut = self._submit(PRIO_ORDER, symbol, WEIGHTS["create_order"], True,
+                           lambda: self.exchange.create_order(symbol, side, amount, price))
+        return await asyncio.shield(fut)
+
+    async def cancel_order(self, order_id: str, symbol: str) -> dict:
+        fut = self._submit(PRIO_CANCEL, symbol, WEIGHTS["cancel_order"], False,
+                           lambda: self.exchange.cancel_order(order_id, symbol),
+                           key=("cancel", order_id))
+        return await asyncio.shield(fut)
+
+    async def fetch_balance(self) -> dict:
+        fut = self._submit(PRIO_READ, None, WEIGHTS["fetch_balance"], False,
+                           self.exchange.fetch_balance, key=("balance",))
+        return await asyncio.shield(fut)
+
+    async def load_markets(self) -> dict:
+        fut = self._submit(PRIO_READ, None, WEIGHTS["load_markets"], False,
+                           self.exchange.load_markets, key=("markets",))
+        return await asyncio.shield(fut)
+
+    def start(self):
+        """Lance le dispatcher (tâche propre, indépendante des feeds : il doit
+        survivre à leur annulation pour servir la clôture des positions)."""
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def close(self, drain: float = 2.0):
+        """Arrête le dispatcher puis ferme l'exchange.
+
+        Aucun appelant ne reste bloqué : les requêtes en file (et celles soumises
+        après coup) échouent avec `ExchangeNotAvailable`. Les requêtes en vol ont
+        `drain` secondes pour aboutir (un ordre parti doit rapporter son résultat),
+        les autres sont annulées avant la fermeture du client.
+        """
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        closed = ccxt.ExchangeNotAvailable("Scheduler fermé")
+        for q in self._queues.values():
+            for reqs in q.values():
+                for req in reqs:
+                    self._finish(req, exc=closed)
+            q.clear()
+        self._pending.clear()
+        if self._inflight:
+            _, late = await asyncio.wait(list(self._inflight), timeout=drain)
+            reqs = [self._inflight[task] for task in late if task in self._inflight]
+            for task in late:
+                task.cancel()
+            await asyncio.gather(*late, return_exceptions=True)
+            for req in reqs:
+                self._finish(req, exc=closed)
+        await self.exchange.close()
+
+    # ── File d'attente ──
+
+    def _submit(self, prio, symbol, weight, is_order, call, key=None) -> asyncio.Future:
+        # shield() côté appelant : annuler un appelant n'annule pas une requête partagée
+        if key is not None and key in self._pending:
+            return self._pending[key]
+        future = asyncio.get_running_loop().create_future()
+        if self._closed:
+            future.set_exception(ccxt.ExchangeNotAvailable("Scheduler fermé"))
+            return future
+        req = _Request(prio, symbol, weight, is_order, call, future, key)
+        if key is not None:
+            self._pending[key] = future
+        self._queues[prio].setdefault(symbol, deque()).append(req)
+        self._wake.set()
+        return future
+
+    def _requeue_front(self, req: _Request):
+        q = self._queues[req.prio]
+        q.setdefault(req.symbol, deque()).appendleft(req)
+        q.move_to_end(req.symbol, last=False)
+        self._wake.set()
+
+    def depth(self) -> int:
+        return sum(len(d) for q in self._queues.values() for d in q.values())
+
+    def _budget_wait(self, req: _Request, now: float) -> float:
+        wait = max(self._blocked_until - now, self._weight.wait_for(req.weight, now))
+        if req.is_order:
+            wait = max(wait, self._orders_10s.wait_for(1, now), self._orders_day.wait_for(1, now))
+        return wait
+
+    def _next(self, now: float) -> tuple[_Request | None, float]:
+        """Prochaine requête servable (priorité puis round-robin), ou délai d'attente min."""
+        min_wait = None
+        for prio in sorted(self._queues):
+            q = self._queues[prio]
+            if not q:
+                continue
+            # Tête de la file du prochain symbole dans le tour
+            symbol = next(iter(q))
+            req = q[symbol][0]
+            wait = self._budget_wait(req, now)
+            if wait <= 0:
+                q[symbol].popleft()
+                if q[symbol]:
+                    q.move_to_end(symbol)
+                else:
+                    del q[symbol]
+                return req, 0.0
+            # Priorité bloquée (ex: quota d'ordres) → une priorité inférieure peut passer
+            min_wait = wait if min_wait is None else min(min_wait, wait)
+        return None, min_wait if min_wait is not None else -1.0
+
+    # ── Dispatcher ──
+
+    def _sync_server_weight(self, now: float):
+        headers = getattr(self.exchange.client, "last_response_headers", None) or {}
+        used = headers.get("x-mbx-used-weight-1m") or headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is None:
+            return
+        extra = float(used) - self._weight.used
+        if extra > 0:
+            self._weight.add(extra, now)
+
+    async def _execute(self, req: _Request):
+        try:
+            result = await req.call()
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+            self.rate_limited += 1
+            headers = getattr(self.exchange.client, "last_response_headers", None) or {}
+            retry_after = float(headers.get("Retry-After") or headers.get("retry-after") or 60)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            log.warning(f"[SCHED] Limite Binance atteinte — pause {retry_after:.0f}s")
+            if req.retries < self._max_retries:
+                req.retries += 1
+                self._requeue_front(req)
+                return
+            self._finish(req, exc=e)
+        except Exception as e:
+            self._finish(req, exc=e)
+        else:
+            self._sync_server_weight(time.monotonic())
+            self._finish(req, result=result)
+
+    def _finish(self, req: _Request, result=None, exc=None):
+        if req.key is not None:
+            self._pending.pop(req.key, None)
+        if req.future.done():
+            return
+        if exc is not None:
+            req.future.set_exception(exc)
+        else:
+            req.future.set_result(result)
+
+    def _report(self):
+        parts = []
+        for prio, stats in self.queue_latency.items():
+            st = stats.summary()
+            if st["count"]:
+                parts.append(f"{_PRIO_NAMES[prio]} p50={st['p50_ms']:.0f}ms "
+                             f"p99={st['p99_ms']:.0f}ms max={st['max_ms']:.0f}ms")
+            stats.reset()
+        if parts:
+            log.info(f"[SCHED] attente file : {' | '.join(parts)} — "
+                     f"poids {self._weight.used:.0f}/{self._weight.limit:.0f} — "
+                     f"file {self.depth()} — 429: {self.rate_limited}")
+
+    async def run(self):
+        last_report = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now - last_report >= self.report_every:
+                self._report()
+                last_report = now
+            req, wait = self._next(now)
+            if req is None:
+                self._wake.clear()
+                try:
+                    # wait < 0 : file vide → attendre une soumission
+                    timeout = self.report_every if wait < 0 else wait
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._weight.add(req.weight, now)
+            if req.is_order:
+                self._orders_10s.add(1, now)
+                self._orders_day.add(1, now)
+            self.queue_latency[req.prio].add(now - req.submitted)
+            self.dispatched += 1
+            task = asyncio.create_task(self._execute(req))
+            self._inflight[task] = req
+            task.add_done_callback(lambda t: self._inflight.pop(t, None))
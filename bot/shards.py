@@ -0,0 +1,644 @@
+"""Mode shardé (section `shards:`) : les feeds répartis sur N process.
+
+Le process principal (coordinateur) garde ce qui est unique : exchange REST
+et scheduler, OrderManager, PNL, flux user-data, DB, fenêtre PNL, ordres
+random. Chaque shard possède ses feeds websocket, la construction des
+bougies, les fenêtres de ses paires (process fils du shard), l'enregistrement
+des trades, les indicateurs et les stratégies de ses paires.
+
+Shard → coordinateur, par lots toutes les `batch_ms` : dernier prix par paire
+(PNL, ordres random) et, en paper seulement, les trades (matching des ordres
+limit). Les ordres des stratégies remontent comme intentions, exécutées par
+l'OrderManager du coordinateur ; les fills redescendent au shard de la paire
+(lignes d'ordre du chart). Les paires d'une même instance de stratégie
+restent sur le même shard.
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing as mp
+import os
+import signal
+import time
+from pathlib import Path
+from bot.bus import EventBus, Trade, CandleUpdate, CandleClose
+from bot.data import LiveFeed
+from bot.history import TradeRecorder
+from bot.markets import MarketCache
+from bot.reload import warm_history
+from bot.runtime import StrategyRuntime
+from bot.workers import StrategySupervisor
+from utils import loop_monitor, profiling, speedups
+from utils.logger import log
+from utils.loop_monitor import LoopLagMonitor
+from utils.memory import memory_monitor
+from utils.metrics import LatencyStats
+from utils.trace import tracer
+
+
+def assign(groups: list[list[str]], count: int) -> list[list[str]]:
+    """Groupes de paires (instance de stratégie ou paire seule) → paires par shard.
+
+    Plus gros groupes d'abord, chacun sur le shard le moins chargé (à égalité,
+    le premier) : répartition déterministe pour une même config.
+    """
+    shards: list[list[str]] = [[] for _ in range(count)]
+    for group in sorted(groups, key=len, reverse=True):
+        min(shards, key=len).extend(group)
+    return shards
+
+
+def _groups(symbols: list[str], instances: list[dict]) -> list[list[str]]:
+    """Fusionne les paires liées par une même instance de stratégie (composantes connexes)."""
+    parent = {sym: sym for sym in symbols}
+
+    def root(sym):
+        while parent[sym] != sym:
+            parent[sym] = parent[parent[sym]]
+            sym = parent[sym]
+        return sym
+
+    for entry in instances:
+        linked = [sym for sym in entry["symbols"] if sym in parent]
+        for sym in linked[1:]:
+            parent[root(sym)] = root(linked[0])
+    groups: dict[str, list[str]] = {}
+    for sym in symbols:
+        groups.setdefault(root(sym), []).append(sym)
+    return list(groups.values())
+
+
+# ── Process shard ──
+
+class _RoutedOrderManager:
+    """`OrderManager` vu depuis un shard : `buy` / `sell` deviennent des intentions
+    exécutées par le coordinateur (comme `_IntentOrderManager` des workers)."""
+    def __init__(self, shard: "_Shard"):
+        self._shard = shard
+
+    async def buy(self, symbol: str, amount: float, price: float | None = None):
+        self._shard.send(("order", "buy", symbol, amount, price, time.monotonic()))
+
+    async def sell(self, symbol: str, amount: float, price: float | None = None):
+        self._shard.send(("order", "sell", symbol, amount, price, time.monotonic()))
+
+
+class _Shard:
+    """Feeds, bus local, charts, recorder et stratégies d'un sous-ensemble de paires."""
+    def __init__(self, spec: dict, conn):
+        self.conn = conn
+        self.index = spec["index"]
+        self.role = f"shard-{self.index}"
+        self.batch = spec["batch_ms"] / 1000
+        self.forward_trades = spec["forward_trades"]
+        self.use_chart = spec["use_chart"]
+        self.config = config = spec["config"]
+        self.candle_sec = candle_sec = config["trading"]["candle_seconds"]
+        cache_dir = Path(spec["cache_dir"])
+        self.history = history = dict(spec["history"])
+        history_cfg = config.get("history", {})
+        self.warmup_bars = history_cfg.get("warmup_bars", 200)
+
+        # Marchés : cache disque écrit par le coordinateur (aucun load_markets réseau)
+        self.markets = MarketCache(cache_dir / "markets-binance.json")
+        self.markets.load()
+        self.bus = EventBus.from_config(config.get("bus") or {})
+        self.feeds: dict[str, LiveFeed] = {}
+        self._feed_tasks: dict[str, asyncio.Task] = {}
+        for symbol in spec["symbols"] + spec["feeds"]:
+            self._add_feed(symbol)
+
+        self.charts = {}
+        if self.use_chart:
+            from ui.chart import create_chart
+            for symbol in spec["symbols"]:
+                self._track_chart(symbol, create_chart(symbol, spec["flags"][symbol], config,
+                                                       candle_sec, history.get(symbol, [])))
+
+        self.recorder = None
+        if history_cfg.get("record_trades", True):
+            self.recorder = TradeRecorder(cache_dir / "trades", history_cfg.get("retention_hours", 24))
+
+        strategies_cfg = spec["strategies"]
+        self.runtime = None
+        if strategies_cfg.get("instances"):
+            om = _RoutedOrderManager(self)
+            if strategies_cfg.get("isolation", "inline") == "process":
+                self.runtime = StrategySupervisor.from_config(strategies_cfg, om)
+            else:
+                self.runtime = StrategyRuntime.from_config(strategies_cfg, om)
+            for symbol in self.runtime.symbols:
+                self.runtime.warmup(symbol, history.get(symbol, []), candle_sec)
+
+        self.trades = 0
+        self._closes: list[float] = []     # retards de clôture depuis le dernier envoi de stats (s)
+        self._trades: list[tuple] = []
+        self._prices: dict[str, float] = {}
+        self._stop = asyncio.Event()
+        self._subscribe()
+
+    def _track_chart(self, symbol: str, chart):
+        self.charts[symbol] = chart
+        memory_monitor.track(f"chart {symbol} queue", lambda c: c._q.qsize(), chart)
+
+    def _add_feed(self, symbol: str) -> LiveFeed:
+        feed = LiveFeed(self.config["exchange"], symbol, self.candle_sec)
+        self.markets.attach(feed.exchange)
+        feed.bus = self.bus
+        self.feeds[symbol] = feed
+        memory_monitor.track(f"feed {symbol} candles", lambda f: len(f.candles), feed)
+        return feed
+
+    def _subscribe(self):
+        bus = self.bus
+        # Trades (matching paper du coordinateur) et stratégies : rien n'est perdu
+        bus.subscribe(Trade, self._on_trade, name="uplink", priority=100, max_queue=None)
+        if self.runtime is not None:
+            bus.subscribe((Trade, CandleClose), self.runtime.on_event, name="strategies",
+                          priority=90, max_queue=None)
+        bus.subscribe(CandleClose, self._on_close, name="uplink", priority=100, max_queue=None)
+        bus.subscribe(CandleUpdate, self._on_price, name="uplink", priority=50,
+                      coalesce=lambda e: e.symbol)
+        if self.use_chart:
+            from ui.chart import update_candle
+            charts = self.charts
+
+            def _chart_candle(e):
+                if e.symbol in charts:
+                    update_candle(charts[e.symbol], e.candle)
+
+            bus.subscribe(CandleUpdate, _chart_candle, name="charts", priority=10,
+                          coalesce=lambda e: (e.symbol, e.candle["_ms"]))
+        if self.recorder:
+            recorder = self.recorder
+            bus.subscribe(Trade, lambda e: recorder.on_trade(e.symbol, e.price, e.amount, e.ts),
+                          name="recorder", priority=0)
+
+    def _on_close(self, e: CandleClose):
+        # Clôture = premier trade de la bougie suivante : retard (à la publication) sur la fin théorique
+        published = time.time() - (time.perf_counter() - e.stamp)
+        self._closes.append(max(0.0, published - e.candle["_ms"] / 1000 - self.candle_sec))
+
+    def _on_trade(self, e: Trade):
+        self.trades += 1
+        if self.forward_trades:
+            self._trades.append((e.symbol, e.price, e.amount, e.ts))
+
+    def _on_price(self, e: CandleUpdate):
+        self._prices[e.symbol] = e.candle["close"]
+
+    def send(self, msg: tuple):
+        try:
+            self.conn.send(msg)
+        except (BrokenPipeError, OSError):
+            self._stop.set()             # coordinateur disparu
+
+    def _on_readable(self):
+        try:
+            while self.conn.poll():
+                msg = self.conn.recv()
+                if msg[0] == "line":
+                    chart = self.charts.get(msg[1])
+                    if chart is not None:
+                        from ui.chart import add_order_line
+                        add_order_line(chart, *msg[2:])
+                elif msg[0] == "reload":
+                    asyncio.create_task(self._reload(*msg[1:]))
+                elif msg[0] == "stop":
+                    self._stop.set()
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            self._stop.set()
+
+    async def _reload(self, config: dict, symbols: list[str], feeds: list[str], flags: dict,
+                      history: dict, respawn: list[str]):
+        """Nouvelle répartition envoyée par le coordinateur : feeds ouverts / fermés
+        pour les paires ajoutées / retirées, fenêtres relancées réchauffées."""
+        self.config = config
+        self.history.update(history)
+        wanted = symbols + feeds
+        for symbol in [s for s in self.feeds if s not in wanted]:
+            self.feeds.pop(symbol)
+            task = self._feed_tasks.pop(symbol, None)
+            if task is not None:
+                task.cancel()            # websocket fermé dans stream()
+            self.history.pop(symbol, None)
+            self._prices.pop(symbol, None)
+            memory_monitor.untrack(f"feed {symbol} ")
+            if self.recorder:
+                self.recorder.forget(symbol)
+        for symbol in wanted:
+            if symbol not in self.feeds:
+                self._feed_tasks[symbol] = asyncio.create_task(self._add_feed(symbol).stream())
+        if self.use_chart:
+            from ui.chart import create_chart
+            for symbol in [s for s in self.charts if s not in symbols or s in respawn]:
+                await asyncio.to_thread(self.charts.pop(symbol).terminate)
+                memory_monitor.untrack(f"chart {symbol} ")
+            for symbol in symbols:
+                if symbol not in self.charts:
+                    self._track_chart(symbol, create_chart(
+                        symbol, flags[symbol], config, self.candle_sec,
+                        warm_history(self.history.get(symbol, []), self.feeds.get(symbol),
+                                     self.warmup_bars)))
+            self.send(("hello", [chart._proc.pid for chart in self.charts.values()]))
+        log.info(f"[SHARD {self.index}] rechargé : {len(self.feeds)} feed(s), "
+                 f"{len(self.charts)} chart(s)")
+
+    async def _uplink(self, stats_every: float = 1.0):
+        """Lots vers le coordinateur : trades (paper) et derniers prix, puis stats."""
+        last_stats = time.monotonic()
+        while True:
+            await asyncio.sleep(self.batch)
+            if self._trades or self._prices:
+                self.send(("batch", self._trades or None, self._prices))
+                self._trades, self._prices = [], {}
+            now = time.monotonic()
+            if now - last_stats >= stats_every:
+                queues = []
+                for chart in self.charts.values():
+                    try:
+                        queues.append(chart._q.qsize())
+                    except (NotImplementedError, OSError):
+                        pass
+                self.send(("stats", {"trades": self.trades,
+                                     "candles": sum(len(f.candles) for f in self.feeds.values()),
+                                     "chart_queue_max": max(queues, default=0),
+                                     "close_latency": self._closes}))
+                self._closes = []
+                last_stats = now
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.conn.fileno(), self._on_readable)
+        # SIGUSR2 : fenêtres (forkées depuis un process spawn, hors `pkill -f main.py`) et workers
+        profiling.relay(lambda: [chart._proc.pid for chart in self.charts.values()
+                                 if chart._proc.is_alive()])
+        if isinstance(self.runtime, StrategySupervisor):
+            profiling.relay(self.runtime.pids)
+        self.send(("hello", [chart._proc.pid for chart in self.charts.values()]))
+        for symbol, feed in self.feeds.items():
+            self._feed_tasks[symbol] = asyncio.create_task(feed.stream())
+        tasks = [self.bus.run(), self._uplink(), LoopLagMonitor(self.role).run(), profiling.run()]
+        if self.runtime is not None:
+            tasks.append(self.runtime.run())
+        if self.recorder:
+            tasks.append(self.recorder.run())
+        if tracer.enabled:
+            tasks.append(tracer.run())
+        if memory_monitor.enabled:
+            # Feeds et charts : suivis à leur création (`_add_feed`, `_track_chart`, rechargement)
+            for sub in self.bus.subscriptions():
+                memory_monitor.track(f"bus {sub.name} {sub.topic}", len, sub)
+            tasks.append(memory_monitor.run())
+        log.info(f"[SHARD {self.index}] {len(self.feeds)} feed(s), {len(self.charts)} chart(s)"
+                 + (f", stratégies sur {', '.join(self.runtime.symbols)}" if self.runtime else ""))
+
+        running = [asyncio.create_task(t) for t in tasks]
+        try:
+            await self._stop.wait()
+        finally:
+            if self.runtime is not None:
+                await self.runtime.close()
+            running += self._feed_tasks.values()
+            for t in running:
+                t.cancel()            # feeds : websocket fermé dans stream(), recorder : flush final
+            await asyncio.gather(*running, return_exceptions=True)
+            self.bus.close()
+            if self.charts:
+                from ui.chart import terminate_all
+                await asyncio.to_thread(terminate_all)
+
+
+def _shard_main(spec: dict, conn):
+    # Ctrl+C : l'arrêt passe par le coordinateur (clôture des positions d'abord)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    role = f"shard-{spec['index']}"
+    logging.getLogger("tb").setLevel(spec.get("log_level", logging.INFO))
+    loop_monitor.configure(spec.get("loop_monitor"))
+    speedups.configure(spec.get("speedups"))
+    profiling.configure(spec.get("profiling"))
+    memory_monitor.configure(role, spec.get("memory"))
+    tracer.configure(role, spec["config"].get("trace", {}))
+    if spec.get("setup"):
+        module, _, name = spec["setup"].partition(":")
+        getattr(importlib.import_module(module), name)(spec["config"])
+    # Avant les fenêtres : elles (et leurs compass / webview) héritent du handler SIGUSR2
+    profiling.install_signal()
+    shard = _Shard(spec, conn)
+    # Après la création des fenêtres : elles ne doivent pas hériter d'un profileur actif
+    profiling.start(role)
+    try:
+        speedups.run(shard.run())
+    finally:
+        profiling.stop()
+
+
+# ── Coordinateur (process principal) ──
+
+class _ShardSlot:
+    __slots__ = ("index", "spec", "symbols", "proc", "conn", "charts", "stats", "rate",
+                 "latency", "close_latency", "intents", "restarts", "restart_times", "given_up", "_last")
+
+    def __init__(self, index: int, spec: dict):
+        self.index = index
+        self.spec = spec
+        self.symbols = spec["symbols"] + spec["feeds"]
+        self.proc = None
+        self.conn = None
+        self.charts: list[int] = []         # pids des fenêtres (groupes à tuer si le shard meurt)
+        self.stats: dict = {}
+        self.rate = 0.0                     # trades/s sur la dernière période de rapport
+        self.latency = LatencyStats()       # intention shard → soumission coordinateur (s)
+        self.close_latency = LatencyStats() # retard de clôture des bougies du shard (s)
+        self.intents = 0
+        self.restarts = 0
+        self.restart_times: list[float] = []
+        self.given_up = False
+        self._last = (time.monotonic(), 0)
+
+
+class ShardCoordinator:
+    """Démarre les shards, fusionne leurs prix dans le PNL et exécute leurs ordres.
+
+    Même cycle de vie que `StrategySupervisor` : `run()` démarre et relance
+    (backoff, plafond de relances par minute), `close()` n'accepte plus
+    d'ordres, `stop()` arrête les shards. Un shard relancé repart de
+    l'historique de warmup et ferme d'abord les fenêtres orphelines.
+    """
+    def __init__(self, order_manager, count: int, batch_ms: float = 20.0, max_restarts: int = 5,
+                 report_every: float = 60.0, setup: str | None = None):
+        self.om = order_manager
+        self.count = count
+        self.batch_ms = batch_ms
+        self.max_restarts = max_restarts
+        self.report_every = report_every
+        self.setup = setup                  # "module:fonction" appelée au démarrage de chaque shard
+        self._ctx = mp.get_context("spawn")   # pas de fork depuis une boucle asyncio active
+        self._slots: list[_ShardSlot] = []
+        self._owner: dict[str, _ShardSlot] = {}
+        self.prices: dict[str, float] = {}
+        self.on_price = None                # (symbol, prix) → PnlEngine.on_price
+        self.bus = None                     # trades des shards republiés (matching paper)
+        self._orders: set[asyncio.Task] = set()
+        self.closed = False
+
+    @classmethod
+    def from_config(cls, config: dict, order_manager) -> "ShardCoordinator":
+        """`config` : section `shards:`."""
+        return cls(order_manager, config.get("count", 0), config.get("batch_ms", 20.0),
+                   config.get("max_restarts", 5), config.get("report_every", 60.0),
+                   config.get("setup"))
+
+    def plan(self, config: dict, symbols: list[str], flags: dict, extra_feeds: list[str],
+             history: dict, use_chart: bool, forward_trades: bool, cache_dir: Path):
+        """Répartit les paires (et les feeds de conversion PNL) et prépare la spec de chaque shard."""
+        strategies_cfg = config.get("strategies") or {}
+        instances = strategies_cfg.get("instances", [])
+        extra = set(extra_feeds)
+        for index, shard_symbols in enumerate(assign(_groups(symbols + extra_feeds, instances),
+                                                     self.count)):
+            if not shard_symbols:
+                continue
+            owned = set(shard_symbols)
+            spec = {"index": index, "config": config,
+                    "symbols": [s for s in shard_symbols if s not in extra],
+                    "feeds": [s for s in shard_symbols if s in extra],
+                    "flags": {s: flags[s] for s in shard_symbols if s in flags},
+                    "history": {s: history[s] for s in shard_symbols if s in history},
+                    "strategies": {**strategies_cfg, "instances": [
+                        e for e in instances if owned.intersection(e["symbols"])]},
+                    "use_chart": use_chart, "forward_trades": forward_trades,
+                    "batch_ms": self.batch_ms, "cache_dir": str(cache_dir), "setup": self.setup,
+                    "log_level": log.getEffectiveLevel(),
+                    "loop_monitor": loop_monitor.settings(), "profiling": profiling.settings(),
+                    "memory": memory_monitor.settings(), "speedups": speedups.settings()}
+            slot = _ShardSlot(index, spec)
+            self._slots.append(slot)
+            for symbol in slot.symbols:
+                self._owner[symbol] = slot
+            log.info(f"[SHARD {index}] {len(slot.symbols)} paire(s) : {', '.join(slot.symbols)}")
+
+    def reload(self, config: dict, symbols: list[str], flags: dict, extra_feeds: list[str],
+               history: dict, respawn: list[str]):
+        """Config rechargée : paires retirées de leur shard, nouvelles paires sur le shard
+        le moins chargé (groupées par instance de stratégie), fenêtres `respawn` relancées.
+
+        Les paires conservées ne changent pas de shard ; chaque shard concerné
+        reçoit sa nouvelle liste et n'ouvre / ferme que la différence. La spec
+        est mise à jour aussi : un shard relancé repart de la nouvelle répartition.
+        """
+        wanted = symbols + [s for s in extra_feeds if s not in symbols]
+        touched = set()
+        for symbol in [s for s in self._owner if s not in wanted]:
+            touched.add(self._owner.pop(symbol).index)
+            self.prices.pop(symbol, None)
+        live = [slot for slot in self._slots if not slot.given_up]
+        instances = (config.get("strategies") or {}).get("instances", [])
+        for group in _groups([s for s in wanted if s not in self._owner], instances):
+            if not live:
+                log.warning(f"[SHARD] aucun shard actif pour {', '.join(group)}")
+                continue
+            slot = min(live, key=lambda s: sum(1 for o in self._owner.values() if o is s))
+            for symbol in group:
+                self._owner[symbol] = slot
+            touched.add(slot.index)
+        touched.update(self._owner[s].index for s in respawn if s in self._owner)
+
+        for slot in self._slots:
+            owned = [s for s in wanted if self._owner.get(s) is slot]
+            spec = slot.spec
+            previous = (set(spec["symbols"]), set(spec["feeds"]))
+            spec["config"] = config
+            spec["symbols"] = [s for s in owned if s in flags]
+            spec["feeds"] = [s for s in owned if s not in flags]
+            spec["flags"] = {s: flags[s] for s in spec["symbols"]}
+            spec["history"] = {s: history[s] if s in history else spec["history"][s]
+                               for s in owned if s in history or s in spec["history"]}
+            if (set(spec["symbols"]), set(spec["feeds"])) != previous:
+                touched.add(slot.index)     # paires ajoutées, retirées ou changées de rôle
+            slot.symbols = owned
+            if slot.index not in touched or slot.conn is None:
+                continue
+            try:
+                slot.conn.send(("reload", config, spec["symbols"], spec["feeds"], spec["flags"],
+                                {s: history[s] for s in owned if s in history},
+                                [s for s in respawn if s in spec["flags"]]))
+            except OSError:
+                pass                 # shard mort : relancé avec la nouvelle spec
+            log.info(f"[SHARD {slot.index}] {len(owned)} paire(s) : {', '.join(owned)}")
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._owner)
+
+    def pids(self) -> list[int]:
+        """Shards vivants (relais SIGUSR2, `profiling.relay`)."""
+        return [slot.proc.pid for slot in self._slots if slot.proc is not None and slot.proc.is_alive()]
+
+    def price(self, symbol: str) -> float | None:
+        return self.prices.get(symbol)
+
+    def order_line(self, fill):
+        """Abonné `fill` : ligne d'ordre sur le chart de la paire, dans son shard."""
+        slot = self._owner.get(fill.symbol)
+        if slot is not None and slot.conn is not None:
+            try:
+                slot.conn.send(("line", fill.symbol, fill.side, fill.price, fill.amount))
+            except OSError:
+                pass
+
+    # ── Shards ──
+
+    def _start(self, slot: _ShardSlot):
+        conn, child = self._ctx.Pipe()
+        # Non démon : un shard lance ses fenêtres et ses workers stratégie
+        slot.proc = self._ctx.Process(target=_shard_main, args=(slot.spec, child),
+                                      name=f"shard-{slot.index}")
+        slot.proc.start()
+        child.close()
+        slot.conn = conn
+        slot._last = (time.monotonic(), 0)     # compteurs du nouveau process
+        slot.stats = {}
+        asyncio.get_running_loop().add_reader(conn.fileno(), self._on_readable, slot)
+        log.info(f"[SHARD {slot.index}] démarré (pid {slot.proc.pid})")
+
+    def _detach(self, slot: _ShardSlot):
+        if slot.conn is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(slot.conn.fileno())
+            except (ValueError, OSError):
+                pass
+            slot.conn.close()
+            slot.conn = None
+
+    def _on_readable(self, slot: _ShardSlot):
+        try:
+            while slot.conn is not None and slot.conn.poll():
+                msg = slot.conn.recv()
+                kind = msg[0]
+                if kind == "batch":
+                    self._on_batch(msg[1], msg[2])
+                elif kind == "order":
+                    self._on_intent(slot, *msg[1:])
+                elif kind == "stats":
+                    slot.stats = msg[1]
+                    for seconds in slot.stats.pop("close_latency", ()):
+                        slot.close_latency.add(seconds)
+                elif kind == "hello":
+                    slot.charts = msg[1]
+        except (EOFError, OSError):
+            self._detach(slot)       # shard mort : relancé par run()
+
+    def _on_batch(self, trades: list | None, prices: dict):
+        self.prices.update(prices)
+        if self.on_price is not None:
+            for symbol, price in prices.items():
+                self.on_price(symbol, price)
+        if trades and self.bus is not None:
+            publish = self.bus.publish
+            for symbol, price, amount, ts in trades:
+                publish(Trade(symbol, price, amount, ts))
+
+    def _on_intent(self, slot: _ShardSlot, side: str, symbol: str, amount: float,
+                   price: float | None, origin: float):
+        slot.latency.add(time.monotonic() - origin)
+        slot.intents += 1
+        if self.closed:
+            return
+        order = self.om.buy if side == "buy" else self.om.sell
+        task = asyncio.create_task(order(symbol, amount, price))
+        self._orders.add(task)
+        task.add_done_callback(lambda t, index=slot.index: self._order_done(index, t))
+
+    def _order_done(self, index: int, task: asyncio.Task):
+        self._orders.discard(task)
+        if not task.cancelled() and task.exception():
+            log.error(f"[SHARD {index}] Ordre échoué: {task.exception()}")
+
+    @staticmethod
+    def _kill_charts(slot: _ShardSlot):
+        """Fenêtres d'un shard mort (groupes de process à part, elles lui survivent)."""
+        for pid in slot.charts:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        slot.charts = []
+
+    def _check(self, slot: _ShardSlot):
+        if slot.given_up or slot.proc is None or slot.proc.is_alive():
+            return
+        self._on_readable(slot)          # lots et intentions encore dans le pipe
+        self._detach(slot)
+        self._kill_charts(slot)
+        now = time.monotonic()
+        slot.restart_times = [t for t in slot.restart_times if now - t < 60] + [now]
+        if len(slot.restart_times) > self.max_restarts:
+            slot.given_up = True
+            log.error(f"[SHARD {slot.index}] mort (code {slot.proc.exitcode}) — "
+                      f"{self.max_restarts} relances/min dépassées, abandon "
+                      f"({', '.join(slot.symbols)} sans données)")
+            return
+        slot.restarts += 1
+        log.warning(f"[SHARD {slot.index}] mort (code {slot.proc.exitcode}) — relance")
+        self._start(slot)
+
+    def _report(self):
+        now = time.monotonic()
+        for slot in self._slots:
+            trades = slot.stats.get("trades", 0)
+            t0, n0 = slot._last
+            slot.rate = (trades - n0) / (now - t0) if now > t0 and trades >= n0 else 0.0
+            slot._last = (now, trades)
+            st = slot.latency.summary()
+            close = slot.close_latency.summary()
+            state = "abandonné" if slot.given_up else f"pid {slot.proc.pid if slot.proc else '-'}"
+            log.info(f"[SHARD {slot.index}] {len(slot.symbols)} paire(s), {slot.rate:.0f} trades/s, "
+                     f"{slot.stats.get('candles', 0)} bougies"
+                     + (f" (clôture p99={close['p99_ms']:.0f}ms)" if close["count"] else "")
+                     + f" — intentions: {slot.intents}"
+                     + (f" (routage p99={st['p99_ms']:.2f}ms)" if st["count"] else "")
+                     + f", relances: {slot.restarts} — {state}")
+            slot.latency.reset()
+            slot.close_latency.reset()
+
+    async def run(self):
+        """Démarre les shards (après le warmup), les surveille et les relance."""
+        for slot in self._slots:
+            self._start(slot)
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(0.5)
+            for slot in self._slots:
+                self._check(slot)
+            if time.monotonic() - last_report >= self.report_every:
+                self._report()
+                last_report = time.monotonic()
+
+    async def close(self):
+        """Plus aucun ordre de stratégie exécuté (clôture des positions en cours)."""
+        self.closed = True
+
+    async def stop(self, timeout: float = 3.0):
+        """Arrête les shards : feeds, stratégies et fenêtres fermés par chacun, puis SIGKILL."""
+        self.closed = True
+        for slot in self._slots:
+            if slot.conn is not None:
+                try:
+                    slot.conn.send(("stop",))
+                except OSError:
+                    pass
+
+        def _join():
+            deadline = time.monotonic() + timeout
+            for slot in self._slots:
+                if slot.proc is not None:
+                    slot.proc.join(max(0.0, deadline - time.monotonic()))
+                    if slot.proc.is_alive():
+                        slot.proc.kill()
+                        slot.proc.join(0.5)
+                        self._kill_charts(slot)
+        await asyncio.to_thread(_join)
+        for slot in self._slots:
+            self._detach(slot)
@@ -1,18 +1,68 @@
+import asyncio
 from abc import ABC, abstractmethod
-import pandas as pd
 from bot.orders import OrderManager
+from utils.logger import log
 
 
 class Strategy(ABC):
+    """Stratégie pilotée par `StrategyRuntime` (`bot/runtime.py`).
+
+    `indicators` déclare les indicateurs voulus, calculés une seule fois par
+    bougie et par paire (partagés entre stratégies) :
+        indicators = {"ema_fast": ("ema", 9), "rsi": ("rsi", 14), "macd": ("macd", 12, 26, 9)}
+    Les callbacks sont synchrones et doivent rester sous le budget de temps
+    du runtime : pour passer un ordre, utiliser `buy()` / `sell()` qui
+    lancent l'ordre en tâche de fond. En `isolation: process` (`bot/workers.py`),
+    la stratégie tourne dans son propre process et `self.om` n'expose que
+    `buy` / `sell` (intentions exécutées par le process principal).
+    """
+    indicators: dict[str, tuple] = {}
+
     def __init__(self, order_manager: OrderManager):
         self.om = order_manager
+        self._orders: set[asyncio.Task] = set()
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
 
     @abstractmethod
-    def on_candle(self, candles: pd.DataFrame):
-        """Appelé à chaque nouvelle bougie."""
+    def on_candle(self, symbol: str, window, indicators: dict):
+        """Appelé à chaque bougie fermée.
+
+        `window` : `RollingWindow` des bougies fermées (dernière = celle qui
+        vient de fermer), colonnes en vues numpy sans copie.
+        `indicators` : {nom: valeur} après mise à jour sur cette bougie.
+        """
         ...
 
     @abstractmethod
-    def on_tick(self, ticker: dict):
-        """Appelé à chaque mise à jour du prix."""
+    def on_tick(self, tick: dict):
+        """Appelé à chaque trade live : {"symbol", "price", "amount", "timestamp"}."""
         ...
+
+    def signals(self, bars, indicators: dict):
+        """Optionnel (backtest vectorisé) : position cible par bougie, sur tout l'historique.
+
+        `bars` : colonnes numpy (`bars.close`...) ; `indicators` : {nom: série numpy}
+        (tuple de séries pour MACD / Quantum). Retourne un tableau de la longueur
+        de `bars` (NaN = position inchangée), ou None → backtest bougie par bougie.
+        """
+        return None
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._orders.add(task)
+        task.add_done_callback(self._order_done)
+        return task
+
+    def _order_done(self, task: asyncio.Task):
+        self._orders.discard(task)
+        if not task.cancelled() and task.exception():
+            log.error(f"[STRAT {self.name}] Ordre échoué: {task.exception()}")
+
+    def buy(self, symbol: str, amount: float, price: float | None = None) -> asyncio.Task:
+        return self._spawn(self.om.buy(symbol, amount, price))
+
+    def sell(self, symbol: str, amount: float, price: float | None = None) -> asyncio.Task:
+        return self._spawn(self.om.sell(symbol, amount, price))
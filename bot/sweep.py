@@ -0,0 +1,202 @@
+"""Balayage de paramètres d'une `Strategy` : backtests en parallèle sur un pool de process.
+
+    python -m bot.sweep sweep.yaml --workers 8 --out sweep_results.csv
+
+Fichier d'espace de recherche (YAML) :
+
+    strategy: bot.my_strategy:MyStrategy
+    symbol: BTC/USDT
+    days: 365                 # ou data: .cache/backtest/BTC_USDT-1m.npy
+    candle_seconds: 60
+    mode: grid                # grid | random
+    samples: 200              # random : nombre de tirages
+    seed: 0
+    metric: sharpe            # clé de stats pour le classement (décroissant)
+    params:
+      fast: [5, 9, 12]                      # liste de valeurs
+      slow: {min: 20, max: 60, step: 5}     # plage discrète
+      threshold: {uniform: [0.1, 0.5]}      # continu (random uniquement)
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from multiprocessing import Pool, shared_memory
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import yaml
+from bot.backtest import Backtester, Bars, load_bars, load_strategy, _download
+from utils.logger import log
+
+
+def _values(name: str, spec) -> list:
+    if isinstance(spec, list):
+        return spec
+    if isinstance(spec, dict) and "min" in spec:
+        step = spec.get("step", 1)
+        count = int(math.floor((spec["max"] - spec["min"]) / step + 1e-9)) + 1
+        return [spec["min"] + i * step for i in range(count)]
+    if isinstance(spec, dict) and "uniform" in spec:
+        raise ValueError(f"{name} : `uniform` n'est utilisable qu'en mode random")
+    return [spec]
+
+
+def grid(space: dict) -> list[dict]:
+    names = list(space)
+    return [dict(zip(names, combo))
+            for combo in itertools.product(*(_values(n, space[n]) for n in names))]
+
+
+def sample(space: dict, count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    out, seen = [], set()
+    for _ in range(count * 10):
+        params = {}
+        for name, spec in space.items():
+            if isinstance(spec, dict) and "uniform" in spec:
+                params[name] = rng.uniform(*spec["uniform"])
+            else:
+                params[name] = rng.choice(_values(name, spec))
+        key = tuple(sorted(params.items()))
+        if key not in seen:        # pas deux fois le même jeu (espaces discrets)
+            seen.add(key)
+            out.append(params)
+            if len(out) == count:
+                break
+    return out
+
+
+class _SeriesCache(OrderedDict):
+    """LRU des séries d'indicateurs par spec (ex: ("ema", 21)), propre à chaque worker."""
+    def __init__(self, size: int):
+        super().__init__()
+        self.size = size
+        self.hits = self.misses = 0
+
+    def __contains__(self, spec):
+        found = super().__contains__(spec)
+        if found:
+            self.hits += 1
+            self.move_to_end(spec)
+        else:
+            self.misses += 1
+        return found
+
+    def __setitem__(self, spec, series):
+        super().__setitem__(spec, series)
+        if len(self) > self.size:
+            self.popitem(last=False)
+
+
+# État des workers (initialisé une fois par process)
+_worker: dict = {}
+
+
+def _init_worker(shm_name: str, shape: tuple, seconds: int, job: dict, cache_size: int):
+    logging.getLogger("tb").setLevel(logging.WARNING)
+    # Les bougies ne sont pas picklées : chaque worker mappe le même segment de mémoire partagée
+    shm = shared_memory.SharedMemory(name=shm_name)
+    array = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker.update(shm=shm, bars=Bars(array, seconds), job=job,
+                   strategy=load_strategy(job["strategy"]), cache=_SeriesCache(cache_size))
+
+
+def _run_one(params: dict) -> dict:
+    job = _worker["job"]
+    quote = job["symbol"].split("/")[1]
+    row = {"params": params}
+    try:
+        bt = Backtester(_worker["strategy"], job["symbol"], _worker["bars"], params,
+                        balances={quote: job.get("balance", 10_000.0)},
+                        fee=job.get("fee", 0.001), ticks=job.get("ticks", True),
+                        series_cache=_worker["cache"])
+        row.update(asyncio.run(bt.run())["stats"])
+    except Exception as e:
+        row["error"] = str(e)
+    cache = _worker["cache"]
+    row["cache_hits"], row["cache_misses"] = cache.hits, cache.misses
+    row["worker"] = os.getpid()
+    return row
+
+
+def run_sweep(job: dict, bars: Bars, workers: int | None = None, cache_size: int = 32) -> pd.DataFrame:
+    """Lance tous les backtests de `job` et retourne les résultats classés par `metric`."""
+    space = job["params"]
+    if job.get("mode", "grid") == "random":
+        combos = sample(space, job.get("samples", 100), job.get("seed", 0))
+    else:
+        combos = grid(space)
+    # Jeux voisins dans le même lot → mêmes specs d'indicateurs → hits du cache du worker
+    combos.sort(key=lambda p: tuple(str(v) for v in p.values()))
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, len(combos) // (workers * 4))
+
+    array = np.column_stack([bars.time, bars.open, bars.high, bars.low, bars.close, bars.volume])
+    shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    try:
+        np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf)[:] = array
+        del array
+        start = time.perf_counter()
+        log.info(f"[SWEEP] {len(combos)} backtests sur {workers} process "
+                 f"({len(bars)} bougies en mémoire partagée)")
+        rows = []
+        with Pool(workers, initializer=_init_worker,
+                  initargs=(shm.name, (len(bars), 6), bars.seconds, job, cache_size)) as pool:
+            for i, row in enumerate(pool.imap_unordered(_run_one, combos, chunksize=chunk), 1):
+                rows.append(row)
+                if i % max(1, len(combos) // 10) == 0:
+                    log.info(f"[SWEEP] {i}/{len(combos)} ({time.perf_counter() - start:.1f}s)")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    metric = job.get("metric", "sharpe")
+    df = pd.json_normalize(rows)
+    df.columns = [c.replace("params.", "p.") for c in df.columns]
+    df = df[[c for c in df.columns if c.startswith("p.")] +
+            [c for c in df.columns if not c.startswith("p.")]]
+    if metric in df:
+        df = df.sort_values(metric, ascending=False, na_position="last").reset_index(drop=True)
+    log.info(f"[SWEEP] terminé en {time.perf_counter() - start:.1f}s")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TB - Balayage de paramètres (backtests parallèles)")
+    parser.add_argument("space", help="Fichier YAML de l'espace de recherche")
+    parser.add_argument("--workers", type=int, default=None, help="Process (défaut : nb de CPU)")
+    parser.add_argument("--cache-size", type=int, default=32, help="Séries d'indicateurs gardées par worker")
+    parser.add_argument("--out", default="sweep_results.csv", help="Résultats classés (.csv ou .parquet)")
+    args = parser.parse_args()
+
+    with open(args.space) as f:
+        job = yaml.safe_load(f)
+    candle_seconds = job.get("candle_seconds", 60)
+    if job.get("data"):
+        bars = load_bars(job["data"], candle_seconds)
+    else:
+        cache_dir = Path(__file__).parent.parent / ".cache" / "backtest"
+        bars = asyncio.run(_download(job["symbol"], candle_seconds, job.get("days", 30), cache_dir))
+
+    df = run_sweep(job, bars, args.workers, args.cache_size)
+    out = Path(args.out)
+    if out.suffix == ".parquet":
+        df.to_parquet(out)
+    else:
+        df.to_csv(out, index=False)
+    metric = job.get("metric", "sharpe")
+    p_cols = [c for c in df.columns if c.startswith("p.")]
+    for _, row in df.head(5).iterrows():
+        params = ", ".join(f"{c[2:]}={row[c]}" for c in p_cols)
+        log.info(f"[SWEEP] {metric}={row.get(metric, float('nan')):.4f} — {params}")
+    log.info(f"[SWEEP] {len(df)} résultats → {out}")
+
+
+if __name__ == "__main__":
+    main()
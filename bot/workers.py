@@ -0,0 +1,485 @@
+import asyncio
+import importlib
+import logging
+import math
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from bot.runtime import IndicatorSet, RollingWindow
+from utils import loop_monitor, profiling, speedups
+from utils.logger import log
+from utils.memory import memory_monitor
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import LatencyStats
+
+# Taille des valeurs d'indicateur dans un enregistrement (MACD / Quantum = 3 valeurs)
+_SIZES = {"ema": 1, "rsi": 1, "macd": 3, "quantum": 3}
+# Enregistrements : [seq, stamp, ts_ms, ...]
+_TICK_WIDTH = 5          # + price, amount
+_CANDLE_BASE = 8         # + open, high, low, close, volume, puis indicateurs
+
+
+class ShmRing:
+    """Anneau d'enregistrements float64 de taille fixe en mémoire partagée.
+
+    Un seul écrivain (le process principal), N lecteurs. L'écrivain pose
+    `seq = -1` sur la case, écrit les valeurs, puis le numéro de séquence de
+    la case et enfin le compteur global. Le lecteur vérifie le `seq` attendu
+    dans sa copie puis le relit dans la case : s'il a changé entre-temps, la
+    case a été (ou est en train d'être) réécrite (retard > capacité).
+    """
+    def __init__(self, width: int, capacity: int, name: str | None = None):
+        self.width = width
+        self.capacity = capacity
+        size = 8 * (1 + capacity * width)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        buf = np.ndarray((1 + capacity * width,), dtype=np.float64, buffer=self.shm.buf)
+        self._head = buf[:1]
+        self._rows = buf[1:].reshape(capacity, width)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self._head[0])
+
+    def write(self, values):
+        seq = int(self._head[0]) + 1
+        row = self._rows[seq % self.capacity]
+        row[0] = -1.0
+        row[1:1 + len(values)] = values
+        row[0] = seq
+        self._head[0] = seq
+
+    def read(self, seq: int) -> np.ndarray | None:
+        slot = self._rows[seq % self.capacity]
+        row = slot.copy()
+        # seqlock : `seq` relu après la copie — une réécriture commencée pendant
+        # la copie (row[0] = -1 posé après notre lecture de row[0]) la rend invalide
+        if row[0] != seq or slot[0] != seq:
+            return None
+        return row
+
+    def close(self, unlink: bool = False):
+        self._head = self._rows = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class _Reader:
+    """Curseur d'un lecteur sur un `ShmRing` (rattrape les pertes si l'écrivain l'a doublé)."""
+    def __init__(self, ring: ShmRing, from_start: bool):
+        self.ring = ring
+        seq = ring.seq
+        self.next = max(1, seq - ring.capacity + 1) if from_start else seq + 1
+        self.lost = 0
+
+    def __iter__(self):
+        ring = self.ring
+        while self.next <= ring.seq:
+            row = ring.read(self.next)
+            if row is None:
+                # Case réécrite : on saute au plus ancien enregistrement encore présent
+                oldest = max(self.next + 1, ring.seq - ring.capacity + 1)
+                self.lost += oldest - self.next
+                self.next = oldest
+                continue
+            self.next += 1
+            yield row
+
+
+def _decode(row: np.ndarray, layout: list) -> dict:
+    """Valeurs d'indicateurs d'un enregistrement bougie → {spec: valeur} (None si NaN)."""
+    out = {}
+    for spec, offset, size in layout:
+        vals = row[offset:offset + size]
+        if size == 1:
+            out[spec] = None if math.isnan(vals[0]) else float(vals[0])
+        else:
+            out[spec] = None if np.isnan(vals).all() else tuple(vals.tolist())
+    return out
+
+
+class _IntentOrderManager:
+    """`OrderManager` vu depuis un worker : `buy` / `sell` deviennent des intentions
+    envoyées au process principal, qui les exécute via le vrai OrderManager."""
+    def __init__(self, worker: "_Worker"):
+        self._worker = worker
+
+    async def buy(self, symbol: str, amount: float, price: float | None = None):
+        self._worker.send_intent("buy", symbol, amount, price)
+
+    async def sell(self, symbol: str, amount: float, price: float | None = None):
+        self._worker.send_intent("sell", symbol, amount, price)
+
+
+class _Worker:
+    """Boucle d'un process stratégie : lit les anneaux, appelle la stratégie, renvoie les intentions."""
+    def __init__(self, spec: dict, conn, doorbell, waiting):
+        self.conn = conn
+        self.doorbell = doorbell
+        self.waiting = waiting
+        self.monitor = LoopLagMonitor(f"strategy-{spec['name']}")
+        self.name = spec["name"]
+        module, _, cls_name = spec["class"].partition(":")
+        strategy_cls = getattr(importlib.import_module(module), cls_name)
+        self.strategy = strategy_cls(_IntentOrderManager(self), **spec.get("params", {}))
+        names = {name: tuple(s) for name, s in self.strategy.indicators.items()}
+        self._origin = 0.0           # stamp de l'enregistrement en cours de traitement
+        self._feeds = []
+        for symbol, feed in spec["feeds"].items():
+            candles = ShmRing(feed["candle_width"], feed["candle_capacity"], feed["candle_ring"])
+            ticks = ShmRing(_TICK_WIDTH, feed["tick_capacity"], feed["tick_ring"])
+            layout = [(tuple(s), off, size) for s, off, size in feed["layout"]]
+            reader, window = _Reader(candles, True), RollingWindow(feed["candle_capacity"])
+            # Fenêtre reconstruite depuis l'anneau (warmup ou relance) sans rejouer les callbacks
+            for row in reader:
+                window.append(row[2] / 1000, *row[3:8])
+            self._feeds.append((symbol, reader, _Reader(ticks, False), layout, window, names))
+        self.errors = 0
+
+    def send_intent(self, side: str, symbol: str, amount: float, price: float | None):
+        self.conn.send(("intent", side, symbol, amount, price, self._origin))
+
+    def _call(self, fn, *args):
+        # Une exception de stratégie ne tue pas le worker (comme StrategyRuntime._call)
+        try:
+            fn(*args)
+        except Exception as e:
+            self.errors += 1
+            log.error(f"[WORKER {self.name}] {fn.__name__} : {e}")
+
+    def _dispatch(self) -> int:
+        n = 0
+        for symbol, candles, ticks, layout, window, names in self._feeds:
+            for row in candles:
+                n += 1
+                self._origin = float(row[1])
+                window.append(row[2] / 1000, *row[3:8])
+                values = _decode(row, layout)
+                self._call(self.strategy.on_candle, symbol, window,
+                           {name: values[s] for name, s in names.items()})
+            for row in ticks:
+                n += 1
+                self._origin = float(row[1])
+                self._call(self.strategy.on_tick, {"symbol": symbol, "price": float(row[3]),
+                                                   "amount": float(row[4]), "timestamp": int(row[2])})
+        return n
+
+    async def run(self, stats_every: float = 5.0):
+        last_stats = time.monotonic()
+        while True:
+            n = self._dispatch()
+            now = time.monotonic()
+            if now - last_stats >= stats_every:
+                lost = sum(c.lost + t.lost for _, c, t, *_ in self._feeds)
+                self.conn.send(("stats", lost, self.errors))
+                last_stats = now
+            if not n:
+                # Sonnette : on se déclare en attente, puis on revérifie avant de dormir
+                # (un enregistrement écrit entre-temps a forcément vu le drapeau)
+                self.waiting.value = 1
+                if not self._dispatch():
+                    with self.monitor.idle():
+                        self.doorbell.acquire(timeout=0.05)
+                self.waiting.value = 0
+            await asyncio.sleep(0)     # exécute les ordres lancés par la stratégie
+
+
+def _worker_main(spec: dict, conn, doorbell, waiting):
+    logging.getLogger("tb").setLevel(spec.get("log_level", logging.INFO))
+    loop_monitor.configure(spec.get("loop_monitor"))
+    speedups.configure(spec.get("speedups"))
+    profiling.configure(spec.get("profiling"))
+    profiling.start(f"strategy-{spec['name']}")
+    memory_monitor.configure(f"strategy-{spec['name']}", spec.get("memory"))
+
+    async def _main():
+        worker = _Worker(spec, conn, doorbell, waiting)
+        await asyncio.gather(worker.run(), worker.monitor.run(), profiling.run(),
+                             *([memory_monitor.run()] if memory_monitor.enabled else []))
+    try:
+        speedups.run(_main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        profiling.stop()
+
+
+class _WorkerSlot:
+    __slots__ = ("name", "spec", "proc", "conn", "latency", "intents", "lost", "errors",
+                 "restarts", "restart_times", "given_up", "doorbell", "waiting")
+
+    def __init__(self, name: str, spec: dict, ctx):
+        self.name = name
+        self.spec = spec
+        self.doorbell = ctx.Semaphore(0)        # réveille le worker quand il attend
+        self.waiting = ctx.RawValue("b", 0)
+        self.proc = None
+        self.conn = None
+        self.latency = LatencyStats()       # tick → intention (s)
+        self.intents = 0
+        self.lost = 0
+        self.errors = 0
+        self.restarts = 0
+        self.restart_times: list[float] = []
+        self.given_up = False
+
+
+class StrategySupervisor:
+    """Stratégies isolées chacune dans son process (`strategies.isolation: process`).
+
+    Même interface que `StrategyRuntime` côté main (`on_trade`, `on_candle`,
+    `warmup`, `run`, `close`). Le process principal écrit trades et bougies
+    fermées (avec les valeurs d'indicateurs, calculées une fois par paire)
+    dans des anneaux en mémoire partagée ; chaque worker les lit, appelle sa
+    stratégie et renvoie ses ordres comme intentions sur un pipe, exécutées
+    ici par l'OrderManager. Un worker mort est relancé (backoff, plafond de
+    relances par minute) et retrouve sa fenêtre de bougies dans l'anneau.
+    """
+    def __init__(self, order_manager, window: int = 500, tick_capacity: int = 8192,
+                 max_restarts: int = 5, report_every: float = 60.0):
+        self.om = order_manager
+        self.window = window
+        self.tick_capacity = tick_capacity
+        self.max_restarts = max_restarts
+        self.report_every = report_every
+        self._ctx = mp.get_context("spawn")   # pas de fork depuis une boucle asyncio active
+        self._slots: list[_WorkerSlot] = []
+        self._subscribers: dict[str, list[_WorkerSlot]] = {}
+        self.indicators: dict[str, IndicatorSet] = {}
+        self._layouts: dict[str, list] = {}
+        self._candle_rings: dict[str, ShmRing] = {}
+        self._tick_rings: dict[str, ShmRing] = {}
+        self._orders: set[asyncio.Task] = set()
+        self.closed = False
+
+    @classmethod
+    def from_config(cls, config: dict, order_manager) -> "StrategySupervisor":
+        sup = cls(order_manager, config.get("window", 500), config.get("tick_capacity", 8192),
+                  config.get("max_restarts", 5), config.get("report_every", 60.0))
+        entries = config.get("instances", [])
+        # Specs d'indicateurs par paire : instance jetable dans le main (lecture de `indicators`)
+        specs: dict[str, dict] = {}
+        for entry in entries:
+            module, _, name = entry["class"].partition(":")
+            strategy = getattr(importlib.import_module(module), name)(None, **entry.get("params", {}))
+            entry_specs = [tuple(s) for s in strategy.indicators.values()]
+            for symbol in entry["symbols"]:
+                for spec in entry_specs:
+                    specs.setdefault(symbol, {})[spec] = None
+        for symbol, sym_specs in specs.items():
+            sup._add_symbol(symbol, list(sym_specs))
+        for i, entry in enumerate(entries):
+            for symbol in entry["symbols"]:
+                if symbol not in sup._candle_rings:
+                    sup._add_symbol(symbol, [])
+            sup._add_worker(entry, i)
+        return sup
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._candle_rings)
+
+    def pids(self) -> list[int]:
+        """Workers vivants (relais SIGUSR2, `profiling.relay`)."""
+        return [slot.proc.pid for slot in self._slots if slot.proc is not None and slot.proc.is_alive()]
+
+    def _add_symbol(self, symbol: str, specs: list[tuple]):
+        ind = IndicatorSet()
+        layout, offset = [], _CANDLE_BASE
+        for spec in specs:
+            ind.add(spec)
+            size = _SIZES[spec[0]]
+            layout.append((spec, offset, size))
+            offset += size
+        self.indicators[symbol] = ind
+        self._layouts[symbol] = layout
+        self._candle_rings[symbol] = ShmRing(offset, self.window)
+        self._tick_rings[symbol] = ShmRing(_TICK_WIDTH, self.tick_capacity)
+
+    def _add_worker(self, entry: dict, index: int):
+        name = f"{entry['class'].partition(':')[2]}#{index}"
+        feeds = {
+            symbol: {
+                "candle_ring": self._candle_rings[symbol].name,
+                "candle_width": self._candle_rings[symbol].width,
+                "candle_capacity": self.window,
+                "tick_ring": self._tick_rings[symbol].name,
+                "tick_capacity": self.tick_capacity,
+                "layout": self._layouts[symbol],
+            } for symbol in entry["symbols"]
+        }
+        spec = {"name": name, "class": entry["class"], "params": entry.get("params", {}),
+                "feeds": feeds, "log_level": log.getEffectiveLevel(),
+                "loop_monitor": loop_monitor.settings(), "profiling": profiling.settings(),
+                "memory": memory_monitor.settings(), "speedups": speedups.settings()}
+        slot = _WorkerSlot(name, spec, self._ctx)
+        self._slots.append(slot)
+        for symbol in entry["symbols"]:
+            self._subscribers.setdefault(symbol, []).append(slot)
+
+    # ── Écriture (process principal) ──
+
+    def _ring(self, symbol: str):
+        for slot in self._subscribers.get(symbol, ()):
+            if slot.waiting.value:
+                slot.waiting.value = 0
+                slot.doorbell.release()
+
+    def _write_candle(self, symbol: str, ts_ms: float, o, h, l, c, v, stamp: float):
+        ind = self.indicators[symbol]
+        ind.update(c, v)
+        values = [stamp, ts_ms, o, h, l, c, v]
+        for spec, _, size in self._layouts[symbol]:
+            val = ind.values[spec]
+            if val is None:
+                values.extend([math.nan] * size)
+            elif size == 1:
+                values.append(val)
+            else:
+                values.extend(math.nan if x is None else x for x in val)
+        self._candle_rings[symbol].write(values)
+        self._ring(symbol)
+
+    def warmup(self, symbol: str, history: list, candle_seconds: int):
+        if symbol not in self._candle_rings:
+            return
+        t = (time.time() - len(history) * candle_seconds) * 1000
+        for close, volume in history:
+            self._write_candle(symbol, t, close, close, close, close, volume, 0.0)
+            t += candle_seconds * 1000
+
+    def on_event(self, e):
+        """Abonné du bus : `Trade` et `CandleClose` dans une même file (ordre de publication)."""
+        if e.TOPIC == "trade":
+            self.on_trade(e.symbol, e.price, e.amount, e.ts)
+        else:
+            self.on_candle(e.symbol, e.candle)
+
+    def on_trade(self, symbol: str, price: float, amount: float, timestamp_ms: int):
+        ring = self._tick_rings.get(symbol)
+        if ring is not None and not self.closed:
+            ring.write((time.monotonic(), timestamp_ms, price, amount))
+            self._ring(symbol)
+
+    def on_candle(self, symbol: str, candle: dict):
+        if symbol in self._candle_rings and not self.closed:
+            self._write_candle(symbol, candle["_ms"], candle["open"], candle["high"],
+                               candle["low"], candle["close"], candle["volume"], time.monotonic())
+
+    # ── Workers ──
+
+    def _start(self, slot: _WorkerSlot):
+        recv, send = self._ctx.Pipe(duplex=False)
+        slot.waiting.value = 0
+        slot.proc = self._ctx.Process(target=_worker_main,
+                                      args=(slot.spec, send, slot.doorbell, slot.waiting),
+                                      name=f"strategy-{slot.name}", daemon=True)
+        slot.proc.start()
+        send.close()
+        slot.conn = recv
+        asyncio.get_running_loop().add_reader(recv.fileno(), self._on_readable, slot)
+        log.info(f"[WORKER {slot.name}] démarré (pid {slot.proc.pid})")
+
+    def _detach(self, slot: _WorkerSlot):
+        if slot.conn is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(slot.conn.fileno())
+            except (ValueError, OSError):
+                pass
+            slot.conn.close()
+            slot.conn = None
+
+    def _on_readable(self, slot: _WorkerSlot):
+        try:
+            while slot.conn is not None and slot.conn.poll():
+                msg = slot.conn.recv()
+                if msg[0] == "intent":
+                    self._on_intent(slot, *msg[1:])
+                elif msg[0] == "stats":
+                    slot.lost, slot.errors = msg[1], msg[2]
+        except (EOFError, OSError):
+            self._detach(slot)       # worker mort : relancé par run()
+
+    def _on_intent(self, slot: _WorkerSlot, side: str, symbol: str, amount: float,
+                   price: float | None, origin: float):
+        if origin > 0:
+            slot.latency.add(time.monotonic() - origin)
+        slot.intents += 1
+        if self.closed:
+            return
+        order = self.om.buy if side == "buy" else self.om.sell
+        task = asyncio.create_task(order(symbol, amount, price))
+        self._orders.add(task)
+        task.add_done_callback(lambda t, name=slot.name: self._order_done(name, t))
+
+    def _order_done(self, name: str, task: asyncio.Task):
+        self._orders.discard(task)
+        if not task.cancelled() and task.exception():
+            log.error(f"[WORKER {name}] Ordre échoué: {task.exception()}")
+
+    def _check(self, slot: _WorkerSlot):
+        if slot.given_up or slot.proc is None or slot.proc.is_alive():
+            return
+        self._on_readable(slot)          # intentions encore dans le pipe
+        self._detach(slot)
+        now = time.monotonic()
+        slot.restart_times = [t for t in slot.restart_times if now - t < 60] + [now]
+        if len(slot.restart_times) > self.max_restarts:
+            slot.given_up = True
+            log.error(f"[WORKER {slot.name}] mort (code {slot.proc.exitcode}) — "
+                      f"{self.max_restarts} relances/min dépassées, abandon")
+            return
+        slot.restarts += 1
+        log.warning(f"[WORKER {slot.name}] mort (code {slot.proc.exitcode}) — relance")
+        self._start(slot)
+
+    def _report(self):
+        for slot in self._slots:
+            st = slot.latency.summary()
+            state = "abandonné" if slot.given_up else f"pid {slot.proc.pid if slot.proc else '-'}"
+            log.info(f"[WORKER {slot.name}] tick→intention p50={st['p50_ms']:.2f}ms "
+                     f"p99={st['p99_ms']:.2f}ms max={st['max_ms']:.2f}ms ({st['count']}) — "
+                     f"intentions: {slot.intents}, erreurs: {slot.errors}, relances: {slot.restarts}, "
+                     f"perdus: {slot.lost} — {state}")
+            slot.latency.reset()
+
+    async def run(self):
+        """Démarre les workers (après le warmup), les surveille et les relance."""
+        for slot in self._slots:
+            self._start(slot)
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(0.5)
+            for slot in self._slots:
+                self._check(slot)
+            if time.monotonic() - last_report >= self.report_every:
+                self._report()
+                last_report = time.monotonic()
+
+    async def close(self):
+        """Arrête les workers (plus aucune intention acceptée), libère la mémoire partagée."""
+        self.closed = True
+        for slot in self._slots:
+            self._detach(slot)
+            if slot.proc is not None and slot.proc.is_alive():
+                slot.proc.terminate()
+
+        def _join():
+            deadline = time.monotonic() + 1.0
+            for slot in self._slots:
+                if slot.proc is not None:
+                    slot.proc.join(max(0.0, deadline - time.monotonic()))
+                    if slot.proc.is_alive():
+                        slot.proc.kill()
+        await asyncio.to_thread(_join)
+        for ring in (*self._candle_rings.values(), *self._tick_rings.values()):
+            ring.close(unlink=True)
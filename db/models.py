@@ -19,6 +19,14 @@ class Order(BaseModel):
     exchange_id = pw.CharField(null=True)
     created_at = pw.DateTimeField(default=datetime.now)
 
+    class Meta:
+        # Historique paginé par (created_at, id) décroissants, filtrable par paire/statut
+        indexes = (
+            (("created_at", "id"), False),
+            (("symbol", "created_at", "id"), False),
+            (("status", "created_at", "id"), False),
+        )
+
 
 class Trade(BaseModel):
     order = pw.ForeignKeyField(Order, backref="trades")
@@ -28,7 +36,39 @@ class Trade(BaseModel):
     executed_at = pw.DateTimeField(default=datetime.now)
 
 
+class SymbolStats(BaseModel):
+    """Agrégats par paire, tenus à jour à chaque fill par le DbWriter."""
+    symbol = pw.CharField(unique=True)
+    trade_count = pw.IntegerField(default=0)
+    buy_count = pw.IntegerField(default=0)
+    sell_count = pw.IntegerField(default=0)
+    volume = pw.FloatField(default=0)      # en devise base
+    notional = pw.FloatField(default=0)    # en devise quote (Σ prix × quantité)
+    fees = pw.FloatField(default=0)
+    last_trade_at = pw.DateTimeField(null=True)
+
+    @property
+    def avg_price(self) -> float | None:
+        return self.notional / self.volume if self.volume else None
+
+
+# WAL : lectures concurrentes pendant les écritures du DbWriter,
+# synchronous=NORMAL suffit en WAL (pas de corruption possible, seul le
+# dernier commit peut être perdu en cas de coupure de courant)
+PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": 1,          # NORMAL
+    "cache_size": -64 * 1000,  # 64 Mo
+    "temp_store": "memory",
+    "foreign_keys": 1,
+}
+
+
 def init_db(path="tb.db"):
-    db.init(path)
+    db.init(path, pragmas=PRAGMAS)
     db.connect()
-    db.create_tables([Order, Trade])
+    db.create_tables([Order, Trade, SymbolStats])
+    # DB existante (antérieure aux agrégats) → reconstruire depuis Trade
+    if not SymbolStats.select().exists() and Trade.select().exists():
+        from db.queries import rebuild_symbol_stats
+        rebuild_symbol_stats()
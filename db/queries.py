@@ -0,0 +1,158 @@
+import csv
+from datetime import datetime
+from typing import Iterator
+import peewee as pw
+from db.models import db, Order, Trade, SymbolStats
+
+EXPORT_COLUMNS = ["id", "created_at", "symbol", "side", "order_type",
+                  "price", "amount", "status", "exchange_id"]
+
+
+# ── Historique paginé (keyset sur (created_at, id) décroissants) ──
+
+def _encode_cursor(created_at: datetime, order_id: int) -> str:
+    return f"{created_at.isoformat()}|{order_id}"
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    ts, order_id = cursor.rsplit("|", 1)
+    return datetime.fromisoformat(ts), int(order_id)
+
+
+def _filtered(query, symbol=None, side=None, status=None, start=None, end=None):
+    if symbol:
+        query = query.where(Order.symbol == symbol)
+    if side:
+        query = query.where(Order.side == side)
+    if status:
+        query = query.where(Order.status == status)
+    if start:
+        query = query.where(Order.created_at >= start)
+    if end:
+        query = query.where(Order.created_at < end)
+    return query
+
+
+def history_page(limit: int = 100, cursor: str | None = None, *,
+                 symbol: str | None = None, side: str | None = None,
+                 status: str | None = None, start: datetime | None = None,
+                 end: datetime | None = None) -> tuple[list[Order], str | None]:
+    """Une page d'ordres, du plus récent au plus ancien.
+
+    Retourne (ordres, cursor_suivant) ; cursor_suivant vaut None sur la
+    dernière page. Le cursor est opaque : le repasser tel quel pour la page
+    suivante. Coût O(limit) quelle que soit la profondeur (pas d'OFFSET).
+    """
+    query = _filtered(Order.select(), symbol, side, status, start, end)
+    if cursor:
+        c_ts, c_id = _decode_cursor(cursor)
+        query = query.where(
+            (Order.created_at < c_ts) | ((Order.created_at == c_ts) & (Order.id < c_id))
+        )
+    rows = list(query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def iter_history(*, symbol=None, side=None, status=None, start=None, end=None) -> Iterator[tuple]:
+    """Itère toutes les lignes (tuples EXPORT_COLUMNS) sans les charger en mémoire."""
+    query = _filtered(
+        Order.select(*[getattr(Order, c) for c in EXPORT_COLUMNS]),
+        symbol, side, status, start, end,
+    ).order_by(Order.created_at.desc(), Order.id.desc())
+    return query.tuples().iterator()
+
+
+# ── Export streaming (mémoire constante) ──
+
+def export_csv(path: str, **filters) -> int:
+    """Exporte l'historique filtré en CSV, ligne par ligne. Retourne le nombre de lignes."""
+    count = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in iter_history(**filters):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export_parquet(path: str, batch_size: int = 50_000, **filters) -> int:
+    """Exporte l'historique filtré en Parquet, par row groups de `batch_size` lignes."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("pyarrow requis pour l'export Parquet (pip install pyarrow)") from e
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("created_at", pa.timestamp("us")), ("symbol", pa.string()),
+        ("side", pa.string()), ("order_type", pa.string()), ("price", pa.float64()),
+        ("amount", pa.float64()), ("status", pa.string()), ("exchange_id", pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in iter_history(**filters):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write_table(pa.Table.from_pylist(
+                    [dict(zip(EXPORT_COLUMNS, r)) for r in batch], schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(
+                [dict(zip(EXPORT_COLUMNS, r)) for r in batch], schema=schema))
+            count += len(batch)
+    return count
+
+
+# ── Agrégats par paire ──
+
+def apply_fill_stats(symbol: str, side: str, price: float, amount: float,
+                     fee: float, executed_at: datetime):
+    """Ajoute un fill aux agrégats de la paire (upsert, appelé dans la transaction du DbWriter)."""
+    is_buy = 1 if side == "buy" else 0
+    SymbolStats.insert(
+        symbol=symbol, trade_count=1, buy_count=is_buy, sell_count=1 - is_buy,
+        volume=amount, notional=price * amount, fees=fee, last_trade_at=executed_at,
+    ).on_conflict(
+        conflict_target=[SymbolStats.symbol],
+        update={
+            SymbolStats.trade_count: SymbolStats.trade_count + 1,
+            SymbolStats.buy_count: SymbolStats.buy_count + is_buy,
+            SymbolStats.sell_count: SymbolStats.sell_count + (1 - is_buy),
+            SymbolStats.volume: SymbolStats.volume + amount,
+            SymbolStats.notional: SymbolStats.notional + price * amount,
+            SymbolStats.fees: SymbolStats.fees + fee,
+            SymbolStats.last_trade_at: executed_at,
+        },
+    ).execute()
+
+
+def rebuild_symbol_stats():
+    """Recalcule tous les agrégats depuis la table Trade (migration / réparation)."""
+    is_buy = pw.Case(None, [(Order.side == "buy", 1)], 0)
+    rows = (Trade
+            .select(Order.symbol,
+                    pw.fn.COUNT(Trade.id),
+                    pw.fn.SUM(is_buy),
+                    pw.fn.SUM(Trade.amount),
+                    pw.fn.SUM(Trade.price * Trade.amount),
+                    pw.fn.SUM(Trade.fee),
+                    pw.fn.MAX(Trade.executed_at))
+            .join(Order)
+            .group_by(Order.symbol)
+            .tuples())
+    with db.atomic():
+        SymbolStats.delete().execute()
+        for symbol, count, buys, volume, notional, fees, last in rows:
+            SymbolStats.create(symbol=symbol, trade_count=count, buy_count=buys,
+                               sell_count=count - buys, volume=volume, notional=notional,
+                               fees=fees, last_trade_at=last)
+
+
+def symbol_stats() -> dict[str, SymbolStats]:
+    return {s.symbol: s for s in SymbolStats.select()}
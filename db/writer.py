@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from db.models import db, Order, Trade
+from db.queries import apply_fill_stats
+from utils.logger import log
+
+_STOP = object()
+
+
+class DbWriter:
+    """Persistance write-behind : ordres et fills écrits par lots depuis un thread dédié.
+
+    Le trading ne fait que `put()` dans une queue mémoire (jamais d'attente
+    disque). Le thread regroupe les opérations en attente (jusqu'à `max_batch`
+    ou `flush_interval` secondes) et les écrit dans une seule transaction,
+    agrégats par paire (SymbolStats) compris.
+    L'ordre FIFO garantit qu'un Order est inséré avant ses Trades.
+    """
+    def __init__(self, max_batch: int = 500, flush_interval: float = 0.2):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.written = 0
+        self.batches = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    # ── API trading (non bloquante) ──
+
+    def add_order(self, order: Order):
+        """Insère un Order (instance non sauvegardée)."""
+        self._q.put(("order", order))
+
+    def add_fill(self, order: Order, price: float, amount: float, fee: float = 0.0):
+        """Enregistre un fill (ligne Trade) pour l'ordre."""
+        self._q.put(("fill", order, price, amount, fee, datetime.now()))
+
+    def update_order(self, order: Order, **fields):
+        """Met à jour des champs d'un Order déjà mis en queue."""
+        for name, value in fields.items():
+            setattr(order, name, value)
+        self._q.put(("update", order, fields))
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+    # ── Thread d'écriture ──
+
+    @staticmethod
+    def _apply(op: tuple, inserted: list):
+        """Une opération ; les Orders insérés sont ajoutés à `inserted`."""
+        kind = op[0]
+        if kind == "order":
+            op[1].save()
+            inserted.append(op[1])
+        elif kind == "fill":
+            _, order, price, amount, fee, ts = op
+            Trade.create(order=order, price=price, amount=amount,
+                         fee=fee, executed_at=ts)
+            apply_fill_stats(order.symbol, order.side, price, amount, fee, ts)
+        elif kind == "update":
+            _, order, fields = op
+            if order.id is None:
+                order.save()
+                inserted.append(order)
+            else:
+                Order.update(**fields).where(Order.id == order.id).execute()
+
+    @staticmethod
+    def _rolled_back(inserted: list):
+        # Peewee a déjà posé `id` sur les inserts annulés : sans remise à None,
+        # les updates suivants ne toucheraient aucune ligne et les Trades
+        # violeraient la clé étrangère
+        for order in inserted:
+            order.id = None
+
+    def _write_batch(self, batch: list):
+        """Lot en une transaction ; en cas d'échec, réécrit opération par opération
+        (seules les opérations fautives sont perdues)."""
+        inserted = []
+        try:
+            with db.atomic():
+                for op in batch:
+                    self._apply(op, inserted)
+        except Exception as e:
+            self._rolled_back(inserted)
+            log.warning(f"[DB] Lot de {len(batch)} opérations annulé ({e}) — "
+                        f"écriture opération par opération")
+            failed = 0
+            for op in batch:
+                inserted = []
+                try:
+                    with db.atomic():
+                        self._apply(op, inserted)
+                except Exception as e:
+                    self._rolled_back(inserted)
+                    failed += 1
+                    log.error(f"[DB] Opération {op[0]} perdue: {e}")
+            self.written += len(batch) - failed
+        else:
+            self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        db.connect(reuse_if_open=True)
+        stopping = False
+        while not stopping:
+            item = self._q.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                log.error(f"[DB] Écriture de {len(batch)} opérations échouée: {e}")
+        db.close()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush tout ce qui reste en queue puis arrête le thread."""
+        if not self._thread.is_alive():
+            return
+        self._q.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            log.warning(f"[DB] Flush incomplet ({self.pending()} opérations en attente)")
+        else:
+            log.info(f"[DB] {self.written} opérations écrites en {self.batches} lots")
@@ -2,7 +2,9 @@ import sys
 import argparse
 import asyncio
 import random
+import time
 import yaml
+import ccxt.async_support as ccxt_async
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -11,157 +13,469 @@ sys.path.insert(0, str(Path(__file__).parent))
 from bot.exchange import Exchange
 from bot.data import LiveFeed
 from bot.orders import OrderManager
+from bot.paper import PaperExchange
+from bot.account import AccountStream
+from bot.bus import EventBus, Trade, CandleUpdate, CandleClose, Fill, Pnl
+from bot.scheduler import RequestScheduler
+from bot.pnl import PnlEngine
+from bot.markets import MarketCache, SymbolConstraints
+from bot.history import OhlcvCache, TradeRecorder, warmup
+from bot.runtime import StrategyRuntime
+from bot.workers import StrategySupervisor
+from bot.shards import ShardCoordinator
+from bot.reload import CHART_SECTIONS, ConfigWatcher, parse_symbols, warm_history
 from db.models import init_db
+from db.writer import DbWriter
 from utils.logger import log
+from utils.memory import memory_monitor
+from utils import loop_monitor, profiling, speedups
+from utils.loop_monitor import LoopLagMonitor
+from utils.trace import tracer
+
+
+CONFIG_PATH = Path(__file__).parent / "config.yaml"
 
 
 def load_config() -> dict:
-    config_path = Path(__file__).parent / "config.yaml"
-    with open(config_path) as f:
+    with open(CONFIG_PATH) as f:
         return yaml.safe_load(f)
 
 
-def _random_amount(exchange, symbol, price):
+def _random_amount(markets, symbol, price):
     """Génère un montant random respectant le minimum notional de la paire."""
-    market = exchange.client.markets.get(symbol, {})
-    min_cost = market.get("limits", {}).get("cost", {}).get("min", 5.0)
-    min_amount = market.get("limits", {}).get("amount", {}).get("min", 0.001)
-    # Montant minimum pour respecter le notional
-    min_from_cost = min_cost / price if price > 0 else min_amount
-    floor = max(min_amount, min_from_cost)
+    c = markets.constraint(symbol) or SymbolConstraints(symbol, 5.0, 0.001, None, None)
+    floor = c.min_amount_at(price)
     # 5x à 10x le minimum (Binance calcule le notional sur un prix moyen 5min)
-    return round(random.uniform(floor * 5, floor * 10), 6)
+    return c.round_amount(random.uniform(floor * 5, floor * 10))
 
 
-async def random_orders(order_manager, exchange, symbol, feed):
-    """Toutes les 5 secondes, passe un vrai ordre sandbox random."""
+async def random_orders(order_manager, markets, symbol, last_price):
+    """Toutes les 5 secondes, passe un ordre random (sandbox ou paper).
+
+    `last_price()` : dernier prix de la paire (feed local ou shard), None avant le premier trade.
+    """
     await asyncio.sleep(10)
     while True:
-        if feed._current:
+        price = last_price()
+        if price:
             side = random.choice(["buy", "sell"])
-            price = feed._current["close"]
-            amount = _random_amount(exchange, symbol, price)
+            amount = _random_amount(markets, symbol, price)
             try:
                 if side == "buy":
-                    order_manager.buy(symbol, amount)
+                    await order_manager.buy(symbol, amount)
                 else:
-                    order_manager.sell(symbol, amount)
+                    await order_manager.sell(symbol, amount)
             except Exception as e:
                 log.error(f"[{symbol}] Ordre {side} échoué: {e}")
         await asyncio.sleep(5)
 
 
-async def main(use_chart: bool = True):
-    config = load_config()
-    log.info("Démarrage TB (sandbox)...")
+async def pnl_stream(pnl, bus, interval: float):
+    """Publie le PNL total (topic `pnl`) à cadence fixe (pas à chaque trade)."""
+    last = None
+    while True:
+        await asyncio.sleep(interval)
+        total = pnl.total()
+        if total != last:
+            bus.publish(Pnl(total, datetime.now(timezone.utc).replace(microsecond=0)))
+            last = total
+
+
+async def _timed(timings: dict, name: str, aw):
+    start = time.monotonic()
+    try:
+        return await aw
+    except Exception as e:
+        log.warning(f"[SHUTDOWN] {name}: {e}")
+    finally:
+        timings[name] = time.monotonic() - start
+
+
+async def shutdown(cfg: dict, om, account, writer, feeds: dict, clients: list, use_chart: bool,
+                   strategies=None, shards=None):
+    """Arrêt rapide : clôture des positions en parallèle, puis démontage en parallèle.
+
+    0. Stratégies arrêtées (plus aucun nouvel ordre pendant la clôture).
+    1. Ventes de clôture concurrentes (délai par ordre + ré-essais), REST et
+       flux user-data encore actifs ; un délai dépassé est rapproché (réponse
+       tardive ou flux) pendant `reconcile_timeout` avant le rapport.
+    2. Flux user-data, websockets (ou shards), clients REST et fenêtres
+       fermés simultanément, bornés par `teardown_timeout`.
+    3. Flush DB, hors de ce délai : le writer a sa propre attente (10s), un
+       démontage lent ne doit pas abandonner les dernières écritures.
+    4. Rapport : durée de chaque étape et positions résiduelles.
+    """
+    start = time.monotonic()
+    timings = {}
+    if strategies is not None:
+        await _timed(timings, "strategies", strategies.close())
+    log.info("Fermeture des positions ouvertes...")
+    results = await _timed(timings, "positions", om.close_all_positions(
+        deadline=cfg.get("order_deadline", 5.0),
+        retries=cfg.get("retries", 2),
+        backoff=cfg.get("retry_backoff", 0.25),
+        reconcile=cfg.get("reconcile_timeout", 5.0),
+    )) or []
+
+    steps = [_timed(timings, "account", account.close())] if account else []
+    steps += [_timed(timings, f"feed {sym}", feed.exchange.close()) for sym, feed in feeds.items()]
+    steps += [_timed(timings, f"client {i}", c.close()) for i, c in enumerate(clients)]
+    if shards is not None:
+        steps.append(_timed(timings, "shards", shards.stop()))
+    if use_chart:
+        from ui.chart import terminate_all
+        steps.append(_timed(timings, "charts", asyncio.to_thread(terminate_all)))
+    try:
+        await asyncio.wait_for(asyncio.gather(*steps, return_exceptions=True),
+                               cfg.get("teardown_timeout", 5.0))
+    except asyncio.TimeoutError:
+        log.warning("[SHUTDOWN] Démontage incomplet (teardown_timeout dépassé)")
+    # Le flux pouvait encore pousser des fills → flush DB seulement après sa fermeture
+    await _timed(timings, "db", asyncio.to_thread(writer.stop))
+
+    # Rapport d'arrêt
+    closed = sum(1 for r in results if r["status"] == "closed")
+    log.info(f"[SHUTDOWN] Positions : {closed}/{len(results)} clôturées en "
+             f"{timings.get('positions', 0.0) * 1000:.0f}ms")
+    feed_times = [t for name, t in timings.items() if name.startswith("feed ")]
+    if feed_times:
+        timings = {k: v for k, v in timings.items() if not k.startswith("feed ")}
+        timings[f"feeds ({len(feed_times)})"] = max(feed_times)
+    log.info("[SHUTDOWN] Étapes : " + " | ".join(
+        f"{name} {t * 1000:.0f}ms" for name, t in timings.items()))
+    residual = om.residual_positions()
+    pending = om.pending_closes()
+    for sym, qty in residual.items():
+        log.warning(f"[SHUTDOWN] Position résiduelle {sym} : {qty:.8f}"
+                    + (" (vente envoyée, statut inconnu)" if sym in pending else ""))
+    log.info(f"TB arrêté en {time.monotonic() - start:.2f}s"
+             + ("" if not residual else f" — {len(residual)} position(s) résiduelle(s)"))
+
+
+async def main(use_chart: bool = True, config: dict | None = None, config_path: Path | None = None):
+    """`config_path` : fichier surveillé pour le rechargement à chaud (section `reload:`),
+    None pour une config construite en mémoire (soak)."""
+    if config is None:
+        config, config_path = load_config(), CONFIG_PATH
+    mode_label = "paper" if config.get("paper", {}).get("enabled") else "sandbox"
+    log.info(f"Démarrage TB ({mode_label}) — {speedups.describe()}")
+    # Avant la création des charts : les workers forkés héritent de la config de trace
+    tracer.configure("main", config.get("trace", {}))
+    loop_monitor.configure(config.get("loop_monitor"))
+    memory_monitor.configure("main", config.get("memory") or {})
 
     # Init DB
-    init_db(str(Path(__file__).parent / "tb.db"))
+    init_db(str(Path(__file__).parent / config.get("db", {}).get("path", "tb.db")))
+    writer = DbWriter().start()
 
     # Parser les symboles (supporte ancien format string et nouveau format dict)
-    raw_symbols = config["trading"]["symbols"]
-    symbols = []
-    symbol_flags = {}  # {symbol: {"ema": bool, "rsi": bool, "macd": bool}}
-    for entry in raw_symbols:
-        if isinstance(entry, str):
-            symbols.append(entry)
-            symbol_flags[entry] = {"ema": True, "rsi": True, "macd": True}
-        else:
-            sym = entry["symbol"]
-            symbols.append(sym)
-            symbol_flags[sym] = {
-                "ema": entry.get("ema", True),
-                "rsi": entry.get("rsi", True),
-                "macd": entry.get("macd", True),
-                "quantum_line": entry.get("quantum_line", False),
-                "quantum_window": entry.get("quantum_window", False),
-                "lin_compass": entry.get("lin_compass", False),
-            }
+    symbols, symbol_flags = parse_symbols(config["trading"]["symbols"])
     candle_sec = config["trading"]["candle_seconds"]
+    # Mode shardé (section `shards:`) : feeds, charts et stratégies dans N process
+    shards_cfg = config.get("shards") or {}
+    sharded = shards_cfg.get("count", 0) > 0
+
+    # Métadonnées de marchés : cache disque partagé par tous les clients ccxt,
+    # rafraîchi en fond (pas de load_markets réseau au démarrage)
+    markets_cfg = config.get("markets", {})
+    cache_dir = Path(__file__).parent / markets_cfg.get("cache_dir", ".cache")
+    ttl = markets_cfg.get("ttl_hours", 24) * 3600
+    public_client = ccxt_async.binance()   # données publiques (marchés mainnet, historique)
+    public_markets = MarketCache(cache_dir / "markets-binance.json", ttl)
+    await public_markets.bootstrap(public_client)
 
-    # Exchange REST (partagé entre toutes les paires)
-    exchange = Exchange(config["exchange"])
-    exchange.client.load_markets()
+    # Exchange REST (partagé entre toutes les paires) ou simulation locale
+    paper_cfg = config.get("paper", {})
+    if paper_cfg.get("enabled"):
+        backend = PaperExchange(paper_cfg, symbols, markets={
+            s: public_markets.markets[s] for s in symbols if s in public_markets.markets
+        })
+        order_markets = public_markets
+    else:
+        backend = Exchange(config["exchange"])
+        if config["exchange"].get("sandbox"):
+            # Le testnet a ses propres paires et filtres
+            order_markets = MarketCache(cache_dir / "markets-binance-testnet.json", ttl)
+        else:
+            order_markets = public_markets
+        await order_markets.bootstrap(backend.client)
 
-    # Charts (1 fenêtre par paire + 1 fenêtre PNL) ou mode terminal seul
+    # Scheduler central : poids Binance, priorités cancel > ordre > lecture, fair queuing par paire
+    rate_cfg = config.get("rate_limits", {})
+    if rate_cfg.get("enabled", True):
+        exchange = RequestScheduler(backend, rate_cfg).start()
+    else:
+        exchange = backend
+
+    # Enregistrement des trades live (barres 1s sur disque) pour le warmup des prochains lancements
+    history_cfg = config.get("history", {})
+    recorder = None
+    if history_cfg.get("record_trades", True):
+        recorder = TradeRecorder(cache_dir / "trades", history_cfg.get("retention_hours", 24))
+
+    # Stratégies (section `strategies:`) : paires concernées, instanciées après l'OrderManager
+    strategies_cfg = config.get("strategies") or {}
+    strategy_refs = {sym for entry in strategies_cfg.get("instances", [])
+                     for sym in entry["symbols"]}
+    for sym in strategy_refs - set(symbols):
+        log.warning(f"[STRAT] {sym} n'est pas dans trading.symbols — aucun feed, ignorée")
+    strategy_symbols = strategy_refs & set(symbols)
+
+    # Historique pour warmup indicateurs (données publiques, toutes les paires en parallèle) :
+    # trades enregistrés si dispo (bougies candle_seconds exactes), sinon REST + cache disque
+    historical_data = {}
+    warmup_bars = history_cfg.get("warmup_bars", 200)
+    chart_indicators = use_chart and any(config.get(k) for k in ("ema", "rsi", "macd", "quantum"))
+    if chart_indicators or strategy_symbols:
+        historical_data = await warmup(
+            public_client, symbols if chart_indicators else sorted(strategy_symbols), candle_sec,
+            limit=warmup_bars,
+            cache=OhlcvCache(cache_dir / "ohlcv"),
+            recorder=recorder,
+        )
+
+    # Charts (1 fenêtre par paire + 1 fenêtre PNL) ou mode terminal seul ;
+    # en mode shardé, les fenêtres des paires sont lancées par leur shard
     charts = {}
     pnl_chart = None
 
     if use_chart:
-        from ui.chart import (_ChartProxy, update_candle, create_pnl_chart,
-                              update_pnl, _all_proxies)
-        ema_config = config.get("ema", [])
-        rsi_config = config.get("rsi", [])
-        macd_config = config.get("macd")
-        quantum_config = config.get("quantum")
-
-        # Charger l'historique pour warmup indicateurs (200 bougies 1m, données publiques)
-        historical_data = {}
-        if ema_config or rsi_config or macd_config or quantum_config:
-            import ccxt as _ccxt
-            _hist = _ccxt.binance()
-            for sym in symbols:
-                try:
-                    ohlcv = _hist.fetch_ohlcv(sym, '1m', limit=200)
-                    historical_data[sym] = [(c[4], c[5]) for c in ohlcv]  # (close, volume)
-                    log.info(f"[{sym}] {len(ohlcv)} bougies 1m chargées (warmup indicateurs)")
-                except Exception as e:
-                    log.warning(f"[{sym}] Historique indisponible: {e}")
-                    historical_data[sym] = []
+        from ui.chart import create_chart, update_candle, create_pnl_chart, update_pnl, add_order_line
 
         # Créer les charts par paire (EMA/RSI/MACD conditionnés par symbol_flags)
-        for sym in symbols:
-            flags = symbol_flags[sym]
-            
-            sym_ema = ema_config if flags["ema"] else []
-            sym_rsi = rsi_config if flags["rsi"] else []
-            sym_macd = macd_config if flags["macd"] else None
-            
-            # On combine la config quantum globale avec les flags locaux
-            sym_quantum = None
-            if quantum_config and (flags["quantum_line"] or flags["quantum_window"] or flags.get("lin_compass")):
-                sym_quantum = quantum_config.copy()
-                sym_quantum["show_line"] = flags["quantum_line"]
-                sym_quantum["show_window"] = flags["quantum_window"]
-                sym_quantum["show_lin_compass"] = flags.get("lin_compass", False)
-
-            history = historical_data.get(sym, [])
-            charts[sym] = _ChartProxy(sym, config["chart"], candle_sec, 
-                                      sym_ema, sym_rsi, sym_macd, sym_quantum, history)
-            
+        if not sharded:
+            for sym in symbols:
+                charts[sym] = create_chart(sym, symbol_flags[sym], config, candle_sec,
+                                           historical_data.get(sym, []))
+                memory_monitor.track(f"chart {sym} queue", lambda c: c._q.qsize(), charts[sym])
+
         pnl_chart = create_pnl_chart(config["chart"])
 
-    # OrderManager unique avec tous les charts
-    om = OrderManager(exchange, charts=charts)
+    # PNL incrémental (par devise quote, converti en USDT)
+    pnl = PnlEngine()
+
+    # Bus d'événements : les feeds publient, chaque consommateur a sa file (section `bus:`)
+    bus = EventBus.from_config(config.get("bus") or {})
+
+    # OrderManager unique : les lignes d'ordre passent par le topic `fill`
+    om = OrderManager(exchange, pnl=pnl, writer=writer, bus=bus)
+
+    # Runtime des stratégies : fenêtres + indicateurs partagés par paire, warmup sur l'historique
+    # (mode shardé : dans le shard de leurs paires, ordres routés vers cet OrderManager)
+    shards = None
+    if sharded:
+        shards = ShardCoordinator.from_config(shards_cfg, om)
+        shards.plan(config, symbols, symbol_flags, pnl.conversion_symbols(symbols), historical_data,
+                    use_chart, forward_trades=isinstance(backend, PaperExchange), cache_dir=cache_dir)
+        shards.on_price = pnl.on_price
+        shards.bus = bus
+        runtime = StrategyRuntime()
+    elif strategy_symbols and strategies_cfg.get("isolation", "inline") == "process":
+        runtime = StrategySupervisor.from_config(strategies_cfg, om)
+    else:
+        runtime = StrategyRuntime.from_config(strategies_cfg, om)
+    for sym in runtime.symbols:
+        runtime.warmup(sym, historical_data.get(sym, []), candle_sec)
+    # SIGUSR2 (sections chaudes) relayé aux process spawn, hors `pkill -f main.py`
+    if isinstance(runtime, StrategySupervisor):
+        profiling.relay(runtime.pids)
+    if shards is not None:
+        profiling.relay(shards.pids)
 
-    # Prix courants par paire (pour calcul PNL temps réel)
-    current_prices = {}
+    # Flux user-data : fills des ordres limit, statuts, soldes (paper ou clés API requises)
+    account = None
+    if isinstance(backend, PaperExchange):
+        account = AccountStream(backend, om, own_client=False).start()
+    elif config["exchange"].get("api_key") and config["exchange"].get("user_stream", True):
+        account = AccountStream(AccountStream.create_client(config["exchange"]), om).start()
 
-    # Un LiveFeed par symbole
+    # Un LiveFeed par symbole ; feeds et ordres random en tâches par paire,
+    # ouvertes / fermées individuellement au rechargement de la config
     feeds = {}
+    feed_tasks: dict[str, asyncio.Task] = {}
+    order_tasks: dict[str, asyncio.Task] = {}
     tasks = []
 
-    for symbol in symbols:
+    def start_feed(symbol: str):
         feed = LiveFeed(config["exchange"], symbol, candle_sec)
-        
-        if use_chart and symbol in charts:
-            chart = charts[symbol]
-            def _on_update(candle, c=chart, s=symbol):
-                update_candle(c, candle)
-                current_prices[s] = candle["close"]
-                if pnl_chart:
-                    now = datetime.now(timezone.utc).replace(microsecond=0)
-                    total = om.get_total_pnl(current_prices)
-                    update_pnl(pnl_chart, now, total)
-            feed.on_update = _on_update
-            
+        public_markets.attach(feed.exchange)
+        feed.bus = bus
         feeds[symbol] = feed
-        tasks.append(feed.stream())
+        feed_tasks[symbol] = asyncio.create_task(feed.stream())
+        # Ici et non au démarrage seulement : les paires ajoutées au rechargement sont suivies
+        memory_monitor.track(f"feed {symbol} candles", lambda f: len(f.candles), feed)
+
+    def start_orders(symbol: str):
+        if shards is not None:
+            last_price = lambda: shards.price(symbol)
+        else:
+            feed = feeds[symbol]
+            last_price = lambda: feed._current and feed._current["close"]
+        order_tasks[symbol] = asyncio.create_task(random_orders(om, order_markets, symbol, last_price))
+
+    # Abonnés, par priorité décroissante : matching paper, stratégies, prix PNL,
+    # charts, enregistrement disque. Matching paper et stratégies : files illimitées,
+    # un trade ou une clôture perdus fausseraient les ordres. Bougies en cours coalescées : seule la dernière
+    # version compte (par paire et par bougie pour les charts, qui détectent la clôture).
+    # Mode shardé : seuls les trades republiés par les shards (paper) et les fills passent ici
+    if isinstance(backend, PaperExchange):
+        bus.subscribe(Trade, lambda e: backend.on_trade(e.symbol, e.price, e.amount, e.ts),
+                      name="paper", priority=100, max_queue=None)
+    if shards is not None:
+        if use_chart:
+            bus.subscribe(Fill, shards.order_line, name="order lines", priority=10)
+    else:
+        if runtime.symbols:
+            # Une seule file trades + clôtures : `on_candle` après les trades de la bougie
+            bus.subscribe((Trade, CandleClose), runtime.on_event, name="strategies", priority=90,
+                          max_queue=None)
+        bus.subscribe(CandleUpdate, lambda e: pnl.on_price(e.symbol, e.candle["close"]),
+                      name="pnl", priority=50, coalesce=lambda e: e.symbol)
+    if use_chart and shards is None:
+        def _chart_candle(e):
+            if e.symbol in charts:
+                update_candle(charts[e.symbol], e.candle)
+
+        def _order_line(e):
+            if e.symbol in charts:
+                add_order_line(charts[e.symbol], e.side, e.price, e.amount)
+
+        bus.subscribe(CandleUpdate, _chart_candle, name="charts", priority=10,
+                      coalesce=lambda e: (e.symbol, e.candle["_ms"]))
+        bus.subscribe(Fill, _order_line, name="order lines", priority=10)
+    if pnl_chart:
+        bus.subscribe(Pnl, lambda e: update_pnl(pnl_chart, e.time, e.total),
+                      name="pnl chart", priority=10, coalesce="latest")
+    if recorder and shards is None:
+        bus.subscribe(Trade, lambda e: recorder.on_trade(e.symbol, e.price, e.amount, e.ts),
+                      name="recorder", priority=0)
+
+    if shards is None:
+        for symbol in symbols:
+            start_feed(symbol)
+
+    # Feeds de conversion (ex: BTC/USDT pour valoriser le PNL de ETH/BTC)
+    for conv in pnl.conversion_symbols(symbols):
+        if shards is None:
+            start_feed(conv)
+        log.info(f"Feed de conversion PNL : {conv}")
+    tasks.append(bus.run())
 
+    if pnl_chart:
+        pnl_interval = config["chart"].get("pnl_interval", 1.0)
+        tasks.append(pnl_stream(pnl, bus, pnl_interval))
 
-    # Ordres random par paire
+    # Ordres random par paire sans stratégie (async : les ordres des différentes paires partent en parallèle)
     for symbol in symbols:
-        tasks.append(random_orders(om, exchange, symbol, feeds[symbol]))
+        if symbol not in strategy_symbols:
+            start_orders(symbol)
+    if shards is not None:
+        tasks.append(shards.run())
+    elif runtime.symbols:
+        tasks.append(runtime.run())
+
+    if recorder and shards is None:
+        tasks.append(recorder.run())
+
+    # Rafraîchissement des marchés à expiration du TTL
+    tasks.append(public_markets.run(public_client))
+    if order_markets is not public_markets:
+        tasks.append(order_markets.run(backend.client))
+
+    # Comptabilité mémoire : structures qui grossissent avec la durée du run
+    if memory_monitor.enabled:
+        # Feeds et charts : suivis à leur création (`start_feed`, charts, rechargement)
+        if pnl_chart:
+            memory_monitor.track("chart pnl queue", lambda c: c._q.qsize(), pnl_chart)
+        memory_monitor.track("db queue", lambda w: w._q.qsize(), writer)
+        memory_monitor.track("orders live", lambda o: len(o._live) + len(o._early), om)
+        if isinstance(exchange, RequestScheduler):
+            memory_monitor.track("scheduler queue", lambda s: s.depth(), exchange)
+        for sub in bus.subscriptions():
+            memory_monitor.track(f"bus {sub.name} {sub.topic}", len, sub)
+        for sym, ind_set in runtime.indicators.items():
+            for spec, ind in ind_set._by_spec.items():
+                memory_monitor.track_indicator(f"strategy {sym} {'/'.join(map(str, spec))}", ind)
+        tasks.append(memory_monitor.run())
+
+    async def apply_reload(new: dict, changes):
+        """Config rechargée (`ReloadDiff`) : seules les paires ajoutées / retirées ouvrent ou
+        ferment leur websocket, seules les fenêtres dont l'affichage change sont relancées."""
+        old_feeds = set(symbols) | set(pnl.conversion_symbols(symbols))
+        for key in CHART_SECTIONS:
+            if key in new:
+                config[key] = new[key]
+            else:
+                config.pop(key, None)
+        config["trading"]["symbols"] = new["trading"]["symbols"]
+        symbols[:] = changes.symbols
+        symbol_flags.clear()
+        symbol_flags.update(changes.flags)
+        conversions = pnl.conversion_symbols(symbols)
+
+        # Historique des nouvelles paires, mêmes sources qu'au démarrage
+        indicators = use_chart and any(config.get(k) for k in ("ema", "rsi", "macd", "quantum"))
+        fetch = [s for s in changes.added if indicators or s in strategy_refs]
+        if fetch:
+            historical_data.update(await warmup(public_client, fetch, candle_sec, limit=warmup_bars,
+                                                cache=OhlcvCache(cache_dir / "ohlcv"),
+                                                recorder=recorder))
+        for sym in changes.added:
+            if isinstance(backend, PaperExchange):
+                backend.add_market(sym, public_markets.markets.get(sym))
+            if sym in strategy_refs:
+                if shards is None and sym in runtime.symbols:
+                    runtime.warmup(sym, historical_data.get(sym, []), candle_sec)
+                    strategy_symbols.add(sym)
+                else:
+                    log.warning(f"[RELOAD] {sym} : stratégie prise en compte au prochain démarrage")
+        for sym in changes.removed:
+            task = order_tasks.pop(sym, None)
+            if task is not None:
+                task.cancel()
+
+        if shards is not None:
+            shards.reload(config, symbols, symbol_flags, conversions,
+                          {s: historical_data[s] for s in changes.added if s in historical_data},
+                          changes.charts if use_chart else [])
+        else:
+            wanted = set(symbols) | set(conversions)
+            for sym in old_feeds - wanted:
+                feeds.pop(sym)
+                feed_tasks.pop(sym).cancel()     # websocket fermé dans stream()
+                memory_monitor.untrack(f"feed {sym} ")
+                if recorder:
+                    recorder.forget(sym)
+            for sym in symbols + conversions:
+                if sym not in feeds:
+                    start_feed(sym)
+            if use_chart:
+                for sym in [s for s in charts if s not in symbol_flags or s in changes.charts]:
+                    await asyncio.to_thread(charts.pop(sym).terminate)
+                    memory_monitor.untrack(f"chart {sym} ")
+                for sym in symbols:
+                    if sym not in charts:
+                        # Indicateurs réchauffés : historique de démarrage + bougies fermées du feed
+                        charts[sym] = create_chart(sym, symbol_flags[sym], config, candle_sec,
+                                                   warm_history(historical_data.get(sym, []),
+                                                                feeds.get(sym), warmup_bars))
+                        memory_monitor.track(f"chart {sym} queue", lambda c: c._q.qsize(),
+                                             charts[sym])
+        for sym in changes.added:
+            if sym not in strategy_symbols and sym not in order_tasks:
+                start_orders(sym)
+
+    # Rechargement à chaud de config.yaml (section `reload:`) : modification du fichier ou SIGHUP
+    reload_cfg = config.get("reload") or {}
+    if config_path is not None and reload_cfg.get("enabled", True):
+        tasks.append(ConfigWatcher.from_config(config_path, reload_cfg).run(apply_reload))
+
+    # Lag de la boucle asyncio (bloquages synchrones)
+    tasks.append(LoopLagMonitor("main").run())
+    # Dumps périodiques du profil, rapport des sections (SIGUSR2)
+    tasks.append(profiling.run())
+    if tracer.enabled:
+        tasks.append(tracer.run())
 
     mode = "charts" if use_chart else "terminal seul"
     for sym in symbols:
@@ -176,7 +490,7 @@ async def main(use_chart: bool = True):
         ind_str = "+".join(indicators) if indicators else "aucun indicateur"
         log.info(f"  {sym} — {ind_str}")
     log.info(f"Bougies {candle_sec}s ({mode})")
-    log.info("Ordres sandbox random toutes les 5s par paire")
+    log.info(f"Ordres {mode_label} random toutes les 5s par paire")
 
     # Supprimer le bruit aiohttp/ccxt (CancelledError dans les callbacks)
     loop = asyncio.get_event_loop()
@@ -192,31 +506,50 @@ async def main(use_chart: bool = True):
     try:
         await asyncio.gather(*running)
     except (asyncio.CancelledError, KeyboardInterrupt):
+        running += [*feed_tasks.values(), *order_tasks.values()]
         for t in running:
             t.cancel()
         await asyncio.gather(*running, return_exceptions=True)
     finally:
-        # Fermer toutes les positions avant de couper
-        log.info("Fermeture des positions ouvertes...")
-        om.close_all_positions()
-        for feed in feeds.values():
-            try:
-                await feed.exchange.close()
-            except Exception:
-                pass
-        exchange.close()
-        if use_chart:
-            from ui.chart import _all_proxies
-            for proxy in _all_proxies:
-                proxy.terminate()
-        log.info("TB arrêté.")
+        await shutdown(config.get("shutdown", {}), om, account, writer, feeds,
+                       [exchange, public_client], use_chart, shards or runtime, shards)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="TB - Trading Bot Crypto")
     parser.add_argument("--no-chart", action="store_true", help="Lancer sans graphiques (terminal seul)")
+    parser.add_argument("--memory", action="store_true",
+                        help="Comptabilité mémoire par process (force memory.enabled)")
+    parser.add_argument("--shards", type=int,
+                        help="Feeds, charts et stratégies répartis sur N process (force shards.count)")
+    parser.add_argument("--speedups", action="store_true",
+                        help="uvloop + orjson s'ils sont installés (force speedups.uvloop/orjson)")
+    parser.add_argument("--profile", choices=profiling.MODES,
+                        help="Profilage de chaque process : cpu (cProfile) ou sample (échantillonnage)")
+    parser.add_argument("--profile-dir", default="profiles", help="Dossier des profils (<rôle>-<pid>)")
+    parser.add_argument("--profile-hz", type=int, default=100, help="Fréquence d'échantillonnage (sample)")
+    parser.add_argument("--profile-interval", type=float, default=30.0,
+                        help="Réécriture des profils toutes les N secondes")
+    parser.add_argument("--profile-roles", default="",
+                        help="Process profilés, ex: main,chart (main, chart, compass, pnl, strategy, shard ; défaut : tous)")
     args = parser.parse_args()
+    # Avant tout fork : charts, compass et workers héritent des réglages
+    profiling.configure({"mode": args.profile, "dir": args.profile_dir, "hz": args.profile_hz,
+                         "interval": args.profile_interval,
+                         "roles": [r for r in args.profile_roles.split(",") if r]})
+    profiling.start("main")
     try:
-        asyncio.run(main(use_chart=not args.no_chart))
+        config = load_config()
+        if args.memory:
+            config["memory"] = {**(config.get("memory") or {}), "enabled": True}
+        if args.shards is not None:
+            config["shards"] = {**(config.get("shards") or {}), "count": args.shards}
+        if args.speedups:
+            config["speedups"] = {"uvloop": True, "orjson": True}
+        # Avant la création de la boucle et des process : charts et workers héritent du choix
+        speedups.configure(config.get("speedups"))
+        speedups.run(main(use_chart=not args.no_chart, config=config, config_path=CONFIG_PATH))
     except KeyboardInterrupt:
         pass
+    finally:
+        profiling.stop()
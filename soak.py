@@ -0,0 +1,480 @@
+"""Soak / montée en charge : pipeline complet de `main.py` contre un faux exchange.
+
+    python soak.py --symbols 10 --rate 20 --duration 600
+    python soak.py --symbols 500 --rate 5 --duration 14400 --renderers none
+
+Remplace `ccxt.pro.binance` et `ccxt.async_support.binance` par des doublures
+locales (N paires synthétiques `S000/USDT`..., marche aléatoire, trades à
+`--rate` par seconde et par paire, arrivées de Poisson), force le mode paper
+et lance `main.main()` tel quel : feeds, OrderManager, DB, stratégies, PNL.
+Renderers :
+  - `stub` (défaut) : un process par paire comme les vrais charts (même
+    `_ChartProxy`, même `mp.Queue`, mêmes calculs d'indicateurs à la clôture),
+    sans fenêtre
+  - `none` : `--no-chart`
+Toutes les `--sample` s, une ligne JSON dans `<out>/samples.jsonl` : RSS/PSS et
+CPU par process, profondeur des queues (charts, DB), bougies gardées en
+mémoire, latence de clôture de bougie, débit de trades. Traces (`trace-*`) et
+lag de boucle (`loop-*`) de chaque process dans le même dossier,
+`summary.json` à la fin.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+import yaml
+import ccxt
+import ccxt.async_support
+import ccxt.pro
+from utils import speedups
+from utils.logger import log
+from utils.metrics import LatencyStats
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ── Faux exchange ────────────────────────────────────────────────
+
+class _Market:
+    """Paire synthétique : marche aléatoire log-normale, trades de Poisson."""
+    __slots__ = ("symbol", "price", "rate", "rng", "next_ms")
+
+    def __init__(self, symbol: str, price: float, rate: float, seed: int):
+        self.symbol = symbol
+        self.price = price
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.next_ms = time.time() * 1000 + self.rng.expovariate(rate) * 1000
+
+    def step(self) -> float:
+        self.price *= math.exp(self.rng.gauss(0, 2e-4))
+        return self.price
+
+
+class _Simulation:
+    def __init__(self):
+        self.markets: dict[str, _Market] = {}
+        self.batch = 0.05          # au plus un lot de trades par paire toutes les 50ms
+
+    def setup(self, count: int, rate: float, seed: int = 0):
+        rng = random.Random(seed)
+        self.markets = {
+            f"S{i:03d}/USDT": _Market(f"S{i:03d}/USDT", 10 ** rng.uniform(-1, 4), rate, seed + i)
+            for i in range(count)
+        }
+
+    def ccxt_markets(self) -> dict:
+        out = {}
+        for sym, m in self.markets.items():
+            base, quote = sym.split("/")
+            tick = 10 ** (math.floor(math.log10(m.price)) - 4)
+            out[sym] = {
+                "id": sym.replace("/", ""), "symbol": sym, "base": base, "quote": quote,
+                "type": "spot", "spot": True, "active": True,
+                "precision": {"amount": 1e-5, "price": tick},
+                "limits": {"amount": {"min": 1e-5}, "cost": {"min": 5.0}},
+            }
+        return out
+
+
+_SIM = _Simulation()
+
+
+class FakeExchange:
+    """Doublure de `ccxt.async_support.binance` (REST public : marchés, bougies)."""
+    precisionMode = 4        # TICK_SIZE
+
+    def __init__(self, config: dict | None = None):
+        self.markets = None
+        self.currencies = None
+
+    async def load_markets(self, reload: bool = False, params=None):
+        self.markets, self.currencies = _SIM.ccxt_markets(), {}
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets, self.currencies = markets, currencies
+
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = "1m", since=None, limit=None, params=None):
+        tf_ms = self.parse_timeframe(timeframe) * 1000
+        limit = limit or 500
+        end = int(time.time() * 1000) // tf_ms * tf_ms
+        start = max(since or 0, end - (limit - 1) * tf_ms)
+        m = _SIM.markets[symbol]
+        rng = random.Random(hash((symbol, start)))
+        price, bars = m.price, []
+        for t in range(start, end + 1, tf_ms):
+            o = price
+            price *= math.exp(rng.gauss(0, 2e-3))
+            bars.append([t, o, max(o, price), min(o, price), price, rng.expovariate(1.0)])
+        return bars[:limit]
+
+    async def close(self):
+        pass
+
+
+class FakeProExchange(FakeExchange):
+    """Doublure de `ccxt.pro.binance` : `watch_trades` au débit simulé."""
+    async def watch_trades(self, symbol: str, since=None, limit=None, params=None):
+        m = _SIM.markets[symbol]
+        # Attente jusqu'au prochain trade (au moins `batch`), puis tous les trades échus
+        await asyncio.sleep(max(_SIM.batch, (m.next_ms - time.time() * 1000) / 1000))
+        now = time.time() * 1000
+        trades = []
+        while m.next_ms <= now:
+            trades.append({"symbol": symbol, "timestamp": int(m.next_ms), "price": m.step(),
+                           "amount": m.rng.expovariate(100.0), "side": "buy"})
+            m.next_ms += m.rng.expovariate(m.rate) * 1000
+        return trades
+
+
+# ── Renderers sans fenêtre (un process par paire, comme les vrais) ──
+
+def _stub_chart_worker(symbol: str, config: dict, candle_sec: int,
+                       ema_config: list, rsi_config: list, macd_config: dict,
+                       quantum_config: dict, data_q, history: list = None):
+    """Même contrat que `_chart_worker` : draine la queue toutes les 100ms,
+    met à jour les indicateurs à chaque changement de bougie, sans fenêtre."""
+    import queue as _queue
+    from bot.indicators import EMA, RSI, MACD, QuantumIndicator
+    from utils.loop_monitor import LoopLagMonitor
+    from utils.memory import memory_monitor
+    from utils.trace import tracer
+    os.setpgrp()                      # killpg() de terminate_all
+    tracer.configure(f"chart-{symbol}")
+    memory_monitor.configure(f"chart-{symbol}")
+    calcs = [EMA(e["period"]) for e in ema_config] + [RSI(r["period"]) for r in rsi_config]
+    if macd_config:
+        calcs.append(MACD(macd_config["fast_period"], macd_config["slow_period"],
+                          macd_config["signal_period"]))
+    quantum = QuantumIndicator(
+        lookback=quantum_config.get("lookback", 200), max_n=quantum_config.get("max_n", 4),
+        vol_window=quantum_config.get("vol_window", 50),
+        return_period=quantum_config.get("return_period", 1),
+    ) if quantum_config else None
+    for close, volume in history or []:
+        for c in calcs:
+            c.update(close)
+        if quantum:
+            quantum.update(close, volume)
+    for c in calcs:
+        memory_monitor.track_indicator(type(c).__name__.lower() + str(getattr(c, "period", "")), c)
+    if quantum:
+        memory_monitor.track_indicator("quantum", quantum)
+    memory_monitor.track("queue", lambda q: q.qsize(), data_q)
+    current, last = None, None
+
+    async def poll():
+        nonlocal current, last
+        while True:
+            try:
+                while True:
+                    msg = data_q.get_nowait()
+                    if msg[0] != "candle":
+                        continue
+                    dequeued = time.monotonic()
+                    candle = msg[1]
+                    if current is not None and candle["_ms"] != current:
+                        for c in calcs:
+                            c.update(last["close"])
+                        if quantum:
+                            quantum.update(last["close"], last["volume"])
+                    current, last = candle["_ms"], candle
+                    for c in calcs:
+                        c.compute_next(candle["close"])
+                    if "_trace" in candle:
+                        tracer.record_candle(candle["_trace"], dequeued, time.monotonic())
+            except _queue.Empty:
+                pass
+            await asyncio.sleep(0.1)
+
+    async def main():
+        await asyncio.gather(poll(), LoopLagMonitor(f"chart-{symbol}").run(),
+                             *([tracer.run()] if tracer.enabled else []),
+                             *([memory_monitor.run()] if memory_monitor.enabled else []))
+
+    speedups.run(main())
+
+
+def shard_setup(config: dict):
+    """`shards.setup` : doublures posées dans chaque shard (process spawn, rien n'est hérité)."""
+    sim = config["soak"]
+    _SIM.setup(sim["symbols"], sim["rate"], sim["seed"])
+    ccxt.pro.binance = FakeProExchange
+    if sim["renderers"] == "stub":
+        import ui.chart
+        ui.chart._chart_worker = _stub_chart_worker
+
+
+def _stub_pnl_worker(config: dict, data_q):
+    import queue as _queue
+    os.setpgrp()
+    while True:
+        try:
+            data_q.get(timeout=1.0)
+        except _queue.Empty:
+            pass
+
+
+# ── Mesures ──────────────────────────────────────────────────────
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _proc_stats(pid: int) -> dict | None:
+    """RSS / PSS (Mo) et temps CPU cumulé (s) d'un process (/proc sous Linux, sinon psutil)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        out = {"cpu_s": (int(fields[11]) + int(fields[12])) / _CLK_TCK}
+        # PSS : mémoire partagée (pages héritées du fork) répartie entre les process
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(("Rss:", "Pss:")):
+                    out[line[:3].lower() + "_mb"] = int(line.split()[1]) / 1024
+        return out
+    except FileNotFoundError:
+        if not os.path.exists("/proc") and psutil is not None:
+            try:
+                p = psutil.Process(pid)
+                cpu = p.cpu_times()
+                return {"rss_mb": p.memory_info().rss / 2**20, "cpu_s": cpu.user + cpu.system}
+            except psutil.Error:
+                pass
+        return None
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class _Probe:
+    """Points de mesure posés sur le pipeline (feeds, DB, charts) sans le modifier."""
+    def __init__(self):
+        self.feeds: list = []
+        self.writers: list = []
+        self.coordinators: list = []     # mode shardé : trades, bougies et fenêtres vus par les shards
+        self._shard_trades: dict[int, int] = {}
+        self.close_latency = LatencyStats(100_000)
+        self.trades = 0
+        self._cpu: dict[int, float] = {}
+
+    def install(self):
+        from bot.data import LiveFeed
+        import main as tb_main
+        probe = self
+        original = LiveFeed._process_trade
+
+        def _process_trade(feed, price, amount, timestamp_ms):
+            closed = len(feed.candles)
+            original(feed, price, amount, timestamp_ms)
+            probe.trades += 1
+            if len(feed.candles) > closed:
+                # Clôture = premier trade de la bougie suivante : retard sur la fin théorique
+                end = feed.candles[-1]["_ms"] / 1000 + feed.candle_seconds
+                probe.close_latency.add(max(0.0, time.time() - end))
+
+        def _create_exchange(feed, config):
+            probe.feeds.append(feed)
+            return FakeProExchange()
+
+        class _Writer(tb_main.DbWriter):
+            def start(self):
+                probe.writers.append(self)
+                return super().start()
+
+        class _Coordinator(tb_main.ShardCoordinator):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                probe.coordinators.append(self)
+
+            def _report(self):
+                # Retards de clôture mesurés dans les shards (feeds hors du process principal)
+                for slot in self._slots:
+                    for seconds in slot.close_latency._samples:
+                        probe.close_latency.add(seconds)
+                super()._report()
+
+        LiveFeed._process_trade = _process_trade
+        LiveFeed._create_exchange = _create_exchange
+        tb_main.DbWriter = _Writer
+        tb_main.ShardCoordinator = _Coordinator
+
+    def sample(self, interval: float) -> dict:
+        from ui.chart import _all_proxies
+        procs = {"main": os.getpid()}
+        queues = {}
+        for proxy in _all_proxies:
+            role = f"chart-{proxy.symbol}" if hasattr(proxy, "symbol") else "pnl"
+            procs[role] = proxy._proc.pid
+            try:
+                queues[role] = proxy._q.qsize()
+            except (NotImplementedError, OSError):
+                pass
+        trades, candles = 0, 0
+        for coord in self.coordinators:
+            for slot in coord._slots:
+                if slot.proc is None:
+                    continue
+                procs[f"shard-{slot.index}"] = slot.proc.pid
+                for symbol, pid in zip(slot.spec["symbols"], slot.charts):
+                    procs[f"chart-{symbol}"] = pid
+                queues[f"shard-{slot.index}"] = slot.stats.get("chart_queue_max", 0)
+                count = slot.stats.get("trades", 0)
+                prev = self._shard_trades.get(slot.proc.pid, 0)
+                trades += max(0, count - prev)
+                self._shard_trades[slot.proc.pid] = count
+                candles += slot.stats.get("candles", 0)
+        processes = {}
+        for role, pid in procs.items():
+            st = _proc_stats(pid)
+            if st is None:
+                continue
+            prev = self._cpu.get(pid)
+            self._cpu[pid] = st["cpu_s"]
+            st["cpu_pct"] = 100 * (st["cpu_s"] - prev) / interval if prev is not None else 0.0
+            processes[role] = st
+        charts = {k: v for k, v in queues.items() if k != "pnl"}
+        lat = self.close_latency.summary()
+        self.close_latency.reset()
+        trades, self.trades = trades + self.trades, 0
+        return {
+            "time": time.time(),
+            "processes": processes,
+            "total_rss_mb": sum(p.get("rss_mb", 0) for p in processes.values()),
+            "total_pss_mb": sum(p.get("pss_mb", 0) for p in processes.values()) or None,
+            "total_cpu_pct": sum(p["cpu_pct"] for p in processes.values()),
+            "chart_queue_max": max(charts.values(), default=0),
+            "chart_queue_sum": sum(charts.values()),
+            "db_queue": sum(w._q.qsize() for w in self.writers),
+            "candles_in_memory": candles + sum(len(f.candles) for f in self.feeds),
+            "trades_per_s": trades / interval,
+            "candle_close": lat,
+        }
+
+
+# ── Lancement ────────────────────────────────────────────────────
+
+def build_config(args, out: Path) -> dict:
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    symbols = list(_SIM.markets)
+    config["exchange"] = {"sandbox": False}
+    config["paper"] = {"enabled": True, "balances": {"USDT": 1e9, **{s.split("/")[0]: 1e6 for s in symbols}}}
+    config["trading"] = {"candle_seconds": args.candle_seconds, "symbols": [
+        {"symbol": s, "ema": True, "rsi": True, "macd": True,
+         "quantum_line": args.quantum, "quantum_window": False} for s in symbols]}
+    config["markets"] = {"cache_dir": str(out / "cache"), "ttl_hours": 24}
+    config["history"] = {"record_trades": False, "warmup_bars": 200}
+    config["db"] = {"path": str(out / "tb.db")}
+    config["trace"] = {"enabled": True, "dir": str(out), "interval": args.sample}
+    config["loop_monitor"] = {**(config.get("loop_monitor") or {}), "dir": str(out),
+                              "report_every": args.sample}
+    config["bus"] = {**(config.get("bus") or {}), "report_every": args.sample}
+    if args.shards:
+        config["shards"] = {**(config.get("shards") or {}), "count": args.shards,
+                            "setup": "soak:shard_setup", "report_every": args.sample}
+        config["soak"] = {"symbols": args.symbols, "rate": args.rate, "seed": args.seed,
+                          "renderers": args.renderers}
+    if args.memory:
+        config["memory"] = {**(config.get("memory") or {}), "enabled": True, "dir": str(out),
+                            "interval": args.sample}
+    config.setdefault("chart", {})
+    return config
+
+
+async def soak(args) -> dict:
+    out = Path(args.out or f"soak-{args.symbols}-{datetime.now():%Y%m%d-%H%M%S}")
+    out.mkdir(parents=True, exist_ok=True)
+    _SIM.setup(args.symbols, args.rate, args.seed)
+    ccxt.async_support.binance = FakeExchange
+    ccxt.pro.binance = FakeProExchange
+    if args.renderers == "stub":
+        import ui.chart
+        ui.chart._chart_worker = _stub_chart_worker
+        ui.chart._pnl_chart_worker = _stub_pnl_worker
+    probe = _Probe()
+    probe.install()
+    import main as tb_main
+
+    config = build_config(args, out)
+    log.info(f"[SOAK] {args.symbols} paires × {args.rate} trades/s, renderers {args.renderers}, "
+             f"{args.duration:.0f}s → {out}")
+    bot = asyncio.create_task(tb_main.main(use_chart=args.renderers == "stub", config=config))
+    peaks = {"total_rss_mb": 0.0, "total_pss_mb": 0.0, "chart_queue_max": 0, "db_queue": 0,
+             "close_p99_ms": 0.0}
+    samples = 0
+    start = time.monotonic()
+    try:
+        with open(out / "samples.jsonl", "a") as f:
+            while time.monotonic() - start < args.duration and not bot.done():
+                await asyncio.sleep(args.sample)
+                s = await asyncio.to_thread(probe.sample, args.sample)
+                f.write(json.dumps(s) + "\n")
+                f.flush()
+                samples += 1
+                for key in ("total_rss_mb", "total_pss_mb", "chart_queue_max", "db_queue"):
+                    peaks[key] = max(peaks[key], s[key] or 0)
+                peaks["close_p99_ms"] = max(peaks["close_p99_ms"], s["candle_close"]["p99_ms"])
+                log.info(f"[SOAK] {time.monotonic() - start:>7.0f}s — RSS {s['total_rss_mb']:.0f}Mo "
+                         f"(PSS {s['total_pss_mb'] or 0:.0f}Mo, "
+                         f"{len(s['processes'])} process), CPU {s['total_cpu_pct']:.0f}% "
+                         f"(main {s['processes'].get('main', {}).get('cpu_pct', 0):.0f}%), "
+                         f"queues chart max {s['chart_queue_max']} / DB {s['db_queue']}, "
+                         f"bougies {s['candles_in_memory']}, {s['trades_per_s']:.0f} trades/s, "
+                         f"clôture p99 {s['candle_close']['p99_ms']:.0f}ms")
+    finally:
+        bot.cancel()
+        await asyncio.gather(bot, return_exceptions=True)
+    summary = {"symbols": args.symbols, "rate": args.rate, "renderers": args.renderers,
+               "shards": args.shards,
+               "duration_s": time.monotonic() - start, "samples": samples, **peaks}
+    with open(out / "summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    log.info(f"[SOAK] terminé — pics : RSS {peaks['total_rss_mb']:.0f}Mo "
+             f"(PSS {peaks['total_pss_mb']:.0f}Mo), queue chart "
+             f"{peaks['chart_queue_max']}, queue DB {peaks['db_queue']}, "
+             f"clôture p99 {peaks['close_p99_ms']:.0f}ms → {out / 'summary.json'}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TB - Soak / montée en charge (faux exchange)")
+    parser.add_argument("--symbols", type=int, default=10, help="Nombre de paires synthétiques")
+    parser.add_argument("--rate", type=float, default=20.0, help="Trades/s par paire")
+    parser.add_argument("--duration", type=float, default=600.0, help="Durée (s)")
+    parser.add_argument("--sample", type=float, default=10.0, help="Période d'échantillonnage (s)")
+    parser.add_argument("--candle-seconds", type=int, default=5)
+    parser.add_argument("--renderers", choices=("stub", "none"), default="stub")
+    parser.add_argument("--quantum", action="store_true", help="QuantumIndicator dans les charts stub")
+    parser.add_argument("--config", default=str(Path(__file__).parent / "config.example.yaml"),
+                        help="Config de base (indicateurs, scheduler, stratégies...)")
+    parser.add_argument("--memory", action="store_true",
+                        help="Comptabilité mémoire par process (mem-<rôle>-<pid>.jsonl)")
+    parser.add_argument("--speedups", action="store_true",
+                        help="uvloop + orjson (comparaison A/B ; la section speedups de --config est ignorée)")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Mode shardé : feeds et charts répartis sur N process")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Dossier de sortie (défaut : soak-<N>-<date>)")
+    parser.add_argument("--log-level", default="INFO", help="Niveau des logs du bot")
+    args = parser.parse_args()
+    logging.getLogger("tb").setLevel(args.log_level)
+    try:
+        speedups.configure({"uvloop": True, "orjson": True} if args.speedups else None)
+        speedups.run(soak(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
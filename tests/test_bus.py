@@ -0,0 +1,41 @@
+import time
+from bot.bus import EventBus, Trade, CandleClose
+
+
+def _drain(bus: EventBus):
+    for _ in range(1000):
+        if not bus._ready:
+            return
+        bus._dispatch()
+
+
+def test_multi_topic_subscription_keeps_publish_order_across_slices():
+    """Une tranche épuisée au milieu des trades ne fait pas passer la clôture devant."""
+    bus = EventBus(slice_ms=1.0)
+    seen = []
+
+    def strategies(e):
+        if e.TOPIC == "trade":
+            time.sleep(0.002)           # handler lent : chaque trade épuise la tranche
+            seen.append(f"t{e.ts}")
+        else:
+            seen.append("close")
+
+    bus.subscribe((Trade, CandleClose), strategies, name="strategies", priority=90, max_queue=None)
+    bus.subscribe(Trade, lambda e: None, name="paper", priority=100, max_queue=None)
+    for i in range(5):
+        bus.publish(Trade("BTC/USDT", 100.0, 1.0, i))
+    bus.publish(CandleClose("BTC/USDT", {"_ms": 0}))
+    bus.publish(Trade("BTC/USDT", 100.0, 1.0, 5))
+    _drain(bus)
+
+    assert seen == ["t0", "t1", "t2", "t3", "t4", "close", "t5"]
+
+
+def test_multi_topic_subscription_listed_once():
+    bus = EventBus()
+    sub = bus.subscribe((Trade, CandleClose), lambda e: None, name="strategies")
+    assert bus.subscriptions() == [sub]
+    assert sub.topic == "trade+candle_close"
+    bus.unsubscribe(sub)
+    assert bus.subscriptions() == []
@@ -3,10 +3,17 @@ try:
     mp.set_start_method("fork")
 except RuntimeError:
     pass  # déjà défini
+# Explicite : un shard lancé en spawn a déjà fixé sa méthode, ses charts restent en fork
+_ctx = mp.get_context("fork")
 import os
+import time
 import queue as _queue
 import pandas as pd
+from utils import profiling, speedups
 from utils.logger import log
+from utils.loop_monitor import LoopLagMonitor
+from utils.memory import memory_monitor
+from utils.trace import tracer
 
 # ── Worker (tourne dans un process séparé par paire) ──────────────
 
@@ -28,6 +35,10 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
     from webview.errors import JavascriptException as _JsErr
     from bot.indicators import EMA, RSI, MACD, QuantumIndicator
 
+    tracer.configure(f"chart-{symbol}")   # état hérité du fork → histogrammes propres
+    memory_monitor.configure(f"chart-{symbol}")
+    indicator_update = profiling.Section("indicator_update")
+
     # Monkey-patch PyWV.loop : avaler les JavascriptException au lieu de
     # crasher Thread-2 (le sync crosshair de lwc lance "Value is null"
     # quand une série synced n'a pas encore de données).
@@ -224,6 +235,22 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
             if quantum_calculator:
                 quantum_calculator.update(close, volume)
 
+    # --- Comptabilité mémoire (section `memory:`) ---
+    order_lines = []      # lignes d'ordre affichées (jamais retirées côté webview avant clear_lines)
+    if memory_monitor.enabled:
+        for period, calc in ema_calculators.items():
+            memory_monitor.track_indicator(f"ema{period}", calc)
+        for period, calc in rsi_calculators.items():
+            memory_monitor.track_indicator(f"rsi{period}", calc)
+        if macd_calculator:
+            memory_monitor.track_indicator("macd", macd_calculator)
+        if quantum_calculator:
+            memory_monitor.track_indicator("quantum", quantum_calculator)
+        memory_monitor.track("order lines", order_lines.__len__)
+        memory_monitor.track("queue", lambda q: q.qsize(), data_q)
+        if compass_proxy:
+            memory_monitor.track("compass queue", lambda c: c.queue.qsize(), compass_proxy)
+
     # --- State variables ---
     current_candle_time = None
     last_processed_close = None
@@ -237,6 +264,7 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
                 while True:
                     msg = data_q.get_nowait()
                     if msg[0] == "candle":
+                        dequeued = time.monotonic()
                         candle = msg[1]
                         # Clean candle dict for chart update
                         clean = {k: v for k, v in candle.items() if not k.startswith("_")}
@@ -247,14 +275,16 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
                         # 1. Candle Change Detection (validation cloture)
                         if current_candle_time is not None and this_time != current_candle_time:
                             # Clôture bougie précédente -> update indicateurs (EMA, RSI, MACD)
-                            for calc in ema_calculators.values():
-                                calc.update(last_processed_close)
-                            for calc in rsi_calculators.values():
-                                calc.update(last_processed_close)
-                            if macd_calculator:
-                                macd_calculator.update(last_processed_close)
+                            with indicator_update:
+                                for calc in ema_calculators.values():
+                                    calc.update(last_processed_close)
+                                for calc in rsi_calculators.values():
+                                    calc.update(last_processed_close)
+                                if macd_calculator:
+                                    macd_calculator.update(last_processed_close)
+                                if quantum_calculator:
+                                    quantum_calculator.update(last_processed_close, last_processed_volume)
                             if quantum_calculator:
-                                quantum_calculator.update(last_processed_close, last_processed_volume)
                                 # Envoyer la distribution au compass (après fitting)
                                 if compass_proxy and quantum_calculator.initialized:
                                     q = quantum_calculator
@@ -341,6 +371,8 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
                         else:
                             chart.update(pd.Series(clean))
                         chart.topbar["price"].set(f"{close_price:.2f}")
+                        if "_trace" in candle:
+                            tracer.record_candle(candle["_trace"], dequeued, time.monotonic())
 
                     elif msg[0] == "order_line":
                         _, side, price, amount = msg
@@ -350,8 +382,10 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
                             price, color=color, width=1, style="dotted",
                             text=label, axis_label_visible=True,
                         )
+                        order_lines.append(price)
                     elif msg[0] == "clear_lines":
                         chart.clear_horizontal_lines()
+                        order_lines.clear()
             except _queue.Empty:
                 pass
             except Exception as e:
@@ -362,9 +396,14 @@ def _chart_worker(symbol: str, config: dict, candle_sec: int,
             await asyncio.sleep(0.1)
 
     async def main():
-        await asyncio.gather(chart.show_async(), poll())
+        await asyncio.gather(chart.show_async(), poll(), LoopLagMonitor(f"chart-{symbol}").run(),
+                             profiling.run(), *([tracer.run()] if tracer.enabled else []),
+                             *([memory_monitor.run()] if memory_monitor.enabled else []))
 
-    asyncio.run(main())
+    # Après la création des process fils (pywebview, compass) : ils ne doivent pas
+    # hériter d'un profileur actif
+    profiling.start(f"chart-{symbol}")
+    speedups.run(main())
 
 
 # ── Worker PNL (process séparé, fenêtre dédiée) ──────────────────
@@ -382,6 +421,7 @@ def _pnl_chart_worker(config: dict, data_q: mp.Queue):
     import asyncio
     from lightweight_charts import Chart
 
+    memory_monitor.configure("pnl")
     chart = Chart(
         width=config.get("width", 800),
         height=config.get("height", 500),
@@ -416,9 +456,11 @@ def _pnl_chart_worker(config: dict, data_q: mp.Queue):
             await asyncio.sleep(0.05)
 
     async def main():
-        await asyncio.gather(chart.show_async(), poll())
+        await asyncio.gather(chart.show_async(), poll(), LoopLagMonitor("pnl").run(), profiling.run(),
+                             *([memory_monitor.run()] if memory_monitor.enabled else []))
 
-    asyncio.run(main())
+    profiling.start("pnl")
+    speedups.run(main())
 
 
 
@@ -427,12 +469,34 @@ def _pnl_chart_worker(config: dict, data_q: mp.Queue):
 _all_proxies: list = []
 
 
+def _kill_proxy(proxy):
+    """SIGKILL au groupe du worker (worker + sous-process pywebview), sans attendre."""
+    proxy._q.close()
+    proxy._q.cancel_join_thread()
+    if proxy._proc.is_alive():
+        import signal
+        try:
+            os.killpg(proxy._proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def terminate_all(timeout: float = 1.0):
+    """Tue toutes les fenêtres d'un coup : SIGKILL à tous, puis une attente commune."""
+    for proxy in _all_proxies:
+        _kill_proxy(proxy)
+    deadline = time.monotonic() + timeout
+    for proxy in _all_proxies:
+        proxy._proc.join(timeout=max(0.0, deadline - time.monotonic()))
+
+
 class _ChartProxy:
     """Proxy vers un chart dans un process séparé."""
     def __init__(self, symbol: str, config: dict, candle_sec: int, ema_config: list,
                  rsi_config: list, macd_config: dict, quantum_config: dict, history: list = None):
-        self._q = mp.Queue()
-        self._proc = mp.Process(
+        self.symbol = symbol
+        self._q = _ctx.Queue()
+        self._proc = _ctx.Process(
             target=_chart_worker,
             args=(symbol, config, candle_sec, ema_config, rsi_config, macd_config, quantum_config, self._q, history or []),
             daemon=False,
@@ -444,22 +508,18 @@ class _ChartProxy:
         self._q.put(msg)
 
     def terminate(self):
-        self._q.close()
-        self._q.cancel_join_thread()
-        if self._proc.is_alive():
-            import signal
-            try:
-                os.killpg(self._proc.pid, signal.SIGKILL)
-            except ProcessLookupError:
-                pass
-            self._proc.join(timeout=0.1)
+        """Ferme cette fenêtre seule (paire retirée ou relancée au rechargement de la config)."""
+        _kill_proxy(self)
+        self._proc.join(timeout=0.1)
+        if self in _all_proxies:
+            _all_proxies.remove(self)
 
 
 class _PnlProxy:
     """Proxy vers le chart PNL dans un process séparé."""
     def __init__(self, config: dict):
-        self._q = mp.Queue()
-        self._proc = mp.Process(
+        self._q = _ctx.Queue()
+        self._proc = _ctx.Process(
             target=_pnl_chart_worker,
             args=(config, self._q),
             daemon=False,
@@ -471,15 +531,25 @@ class _PnlProxy:
         self._q.put(msg)
 
     def terminate(self):
-        self._q.close()
-        self._q.cancel_join_thread()
-        if self._proc.is_alive():
-            import signal
-            try:
-                os.killpg(self._proc.pid, signal.SIGKILL)
-            except ProcessLookupError:
-                pass
-            self._proc.join(timeout=0.1)
+        _kill_proxy(self)
+        self._proc.join(timeout=0.1)
+
+
+def create_chart(symbol: str, flags: dict, config: dict, candle_sec: int, history: list):
+    """Lance la fenêtre d'une paire : EMA/RSI/MACD/Quantum de la config, filtrés par ses flags."""
+    quantum_config = config.get("quantum")
+    # On combine la config quantum globale avec les flags locaux
+    sym_quantum = None
+    if quantum_config and (flags["quantum_line"] or flags["quantum_window"] or flags.get("lin_compass")):
+        sym_quantum = quantum_config.copy()
+        sym_quantum["show_line"] = flags["quantum_line"]
+        sym_quantum["show_window"] = flags["quantum_window"]
+        sym_quantum["show_lin_compass"] = flags.get("lin_compass", False)
+    return _ChartProxy(symbol, config["chart"], candle_sec,
+                       config.get("ema", []) if flags["ema"] else [],
+                       config.get("rsi", []) if flags["rsi"] else [],
+                       config.get("macd") if flags["macd"] else None,
+                       sym_quantum, history)
 
 
 def create_pnl_chart(config: dict):
@@ -489,6 +559,11 @@ def create_pnl_chart(config: dict):
 
 def update_candle(chart, candle: dict):
     """Envoie la bougie au process du chart."""
+    stamps = candle.get("_trace")
+    if stamps:
+        now = time.monotonic()
+        tracer.record("process_enqueue", now - stamps[3])
+        candle["_trace"] = stamps + (now,)
     chart.send("candle", candle)
 
 
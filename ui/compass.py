@@ -1,8 +1,14 @@
 import multiprocessing as mp
 import time
-import json
+import base64
+import queue as _queue
 import webview
 import numpy as np
+from utils import profiling, speedups
+from utils.loop_monitor import LoopLagMonitor
+from utils.memory import memory_monitor
+
+FRAME_INTERVAL = 1 / 30  # secondes — cadence max des appels evaluate_js
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -339,29 +345,45 @@ HTML_TEMPLATE = """
         // ═══════════════════════════════════════════════════
         // API called from Python
         // ═══════════════════════════════════════════════════
-        window.update_distribution = function(data) {{
+        // Les tableaux arrivent en Float32Array encodés base64 (little-endian)
+        function decodeF32(b64) {{
+            const bin = atob(b64);
+            const bytes = new Uint8Array(bin.length);
+            for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+            return new Float32Array(bytes.buffer);
+        }}
+
+        function setDistribution(data) {{
             n = data.n;
             omega = data.omega;
             sigma = data.sigma;
             fitQuality = data.fit_quality;
-            rGrid = data.r_grid;
-            fittedPdf = data.fitted_pdf;
-            histCounts = data.hist_counts;
-            histEdges = data.hist_edges;
+            rGrid = decodeF32(data.r_grid);
+            fittedPdf = decodeF32(data.fitted_pdf);
+            histCounts = decodeF32(data.hist_counts);
+            histEdges = decodeF32(data.hist_edges);
             hasData = true;
-            drawDist();
-            drawCompass();
-        }};
-
-        window.update_tick = function(cr) {{
-            currentReturn = cr;
-            if (hasData) drawDist();
-        }};
+        }}
 
-        window.update_phase = function(t) {{
-            theta = t;
-            hasPhase = true;
-            drawCompass();
+        // 1 appel JS par frame : dist / tick / phase optionnels, 1 seul redraw par panneau
+        window.update_frame = function(frame) {{
+            let redrawDist = false, redrawComp = false;
+            if (frame.dist) {{
+                setDistribution(frame.dist);
+                redrawDist = true;
+                redrawComp = true;
+            }}
+            if (frame.tick !== undefined) {{
+                currentReturn = frame.tick;
+                redrawDist = hasData;
+            }}
+            if (frame.phase !== undefined) {{
+                theta = frame.phase;
+                hasPhase = true;
+                redrawComp = true;
+            }}
+            if (redrawDist) drawDist();
+            if (redrawComp) drawCompass();
         }};
 
         drawDist();
@@ -371,6 +393,15 @@ HTML_TEMPLATE = """
 </html>
 """
 
+def _b64(raw: bytes) -> str:
+    """Encode les octets float32 (little-endian) en base64 pour decodeF32() côté JS."""
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _f32_bytes(arr) -> bytes:
+    return np.ascontiguousarray(arr, dtype="<f4").tobytes()
+
+
 class Api:
     def __init__(self):
         self._window = None
@@ -423,49 +454,55 @@ def _compass_process(symbol: str, data_queue: mp.Queue,
     api.set_window(window)
 
     def update_loop():
+        # Thread de rendu : lag = durée de traitement d'une frame, blocages détectés
+        monitor = LoopLagMonitor(f"compass-{symbol}")
+        monitor.start_watchdog()
+        profiling.start(f"compass-{symbol}")     # mode cpu : ce thread (le main tourne webview)
+        memory_monitor.configure(f"compass-{symbol}")
+        memory_monitor.track("queue", lambda q: q.qsize(), data_queue)
         while True:
             try:
-                latest_tick = None
-                latest_dist = None
-                latest_phase = None
-                while not data_queue.empty():
-                    msg = data_queue.get_nowait()
-                    if msg[0] == "tick":
-                        latest_tick = msg
-                    elif msg[0] == "dist":
-                        latest_dist = msg
-                    elif msg[0] == "phase":
-                        latest_phase = msg
-
-                if latest_dist:
-                    _, n, omega, sigma, fit_quality, r_grid, fitted_pdf, hist_counts, hist_edges = latest_dist
-                    data = json.dumps({
-                        "n": n, "omega": omega, "sigma": sigma, "fit_quality": fit_quality,
-                        "r_grid": r_grid, "fitted_pdf": fitted_pdf,
-                        "hist_counts": hist_counts, "hist_edges": hist_edges,
-                    })
-                    try:
-                        window.evaluate_js(f"window.update_distribution({data})")
-                    except Exception:
-                        pass
-
-                if latest_tick:
-                    _, cr = latest_tick
+                # Bloque jusqu'à l'arrivée de données (pas de polling à vide)
+                with monitor.idle():
+                    msg = data_queue.get()
+                frame_start = time.monotonic()
+                latest = {msg[0]: msg}
+                # Coalescer tout ce qui est déjà en attente : seul le dernier compte
+                while True:
                     try:
-                        window.evaluate_js(f"window.update_tick({cr})")
-                    except Exception:
-                        pass
-
-                if latest_phase:
-                    _, theta_val = latest_phase
-                    try:
-                        window.evaluate_js(f"window.update_phase({theta_val})")
-                    except Exception:
-                        pass
-
+                        msg = data_queue.get_nowait()
+                    except _queue.Empty:
+                        break
+                    latest[msg[0]] = msg
+
+                frame = {}
+                if "dist" in latest:
+                    _, n, omega, sigma, fit_quality, r_grid, fitted_pdf, hist_counts, hist_edges = latest["dist"]
+                    frame["dist"] = {
+                        "n": n, "omega": omega, "sigma": sigma, "fit_quality": fit_quality,
+                        "r_grid": _b64(r_grid), "fitted_pdf": _b64(fitted_pdf),
+                        "hist_counts": _b64(hist_counts), "hist_edges": _b64(hist_edges),
+                    }
+                if "tick" in latest:
+                    frame["tick"] = latest["tick"][1]
+                if "phase" in latest:
+                    frame["phase"] = latest["phase"][1]
+
+                try:
+                    window.evaluate_js(f"window.update_frame({speedups.dumps(frame)})")
+                except Exception:
+                    pass
+
+                # Max 1 appel JS par frame : le reste s'accumule dans la queue
+                elapsed = time.monotonic() - frame_start
+                monitor.add(elapsed)
+                profiling.poll()
+                memory_monitor.poll()
+                if elapsed < FRAME_INTERVAL:
+                    with monitor.idle():
+                        time.sleep(FRAME_INTERVAL - elapsed)
             except Exception:
-                pass
-            time.sleep(0.1)
+                time.sleep(FRAME_INTERVAL)
 
     import threading
     t = threading.Thread(target=update_loop, daemon=True)
@@ -484,6 +521,7 @@ class CompassProxy:
             daemon=False,
         )
         self.process.start()
+        self._last_dist_key = None
 
     def update_tick(self, current_return: float):
         """Met à jour le marqueur de return courant (chaque tick)."""
@@ -492,11 +530,17 @@ class CompassProxy:
 
     def update_distribution(self, n, omega, sigma, fit_quality,
                             r_grid, fitted_pdf, hist_counts, hist_edges):
-        """Met à jour la distribution complète (chaque bougie)."""
-        if self.process.is_alive():
-            self.queue.put(("dist", n, omega, sigma, fit_quality,
-                            r_grid.tolist(), fitted_pdf.tolist(),
-                            hist_counts.tolist(), hist_edges.tolist()))
+        """Met à jour la distribution complète (seulement si le fit a changé)."""
+        if not self.process.is_alive():
+            return
+        # Même (n, σ, fit) → mêmes returns fittés : rien à renvoyer
+        key = (n, omega, sigma, fit_quality)
+        if key == self._last_dist_key:
+            return
+        self._last_dist_key = key
+        self.queue.put(("dist", n, omega, sigma, fit_quality,
+                        _f32_bytes(r_grid), _f32_bytes(fitted_pdf),
+                        _f32_bytes(hist_counts), _f32_bytes(hist_edges)))
 
     def update_phase(self, theta: float):
         """Met à jour la phase θ du compass ATI (chaque tick)."""
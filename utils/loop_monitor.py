@@ -0,0 +1,170 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+from utils import speedups
+from utils.logger import log
+from utils.metrics import LatencyStats
+
+# Bornes des buckets de l'histogramme de lag (ms), dernier bucket = au-delà
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Réglages communs à tous les process (section `loop_monitor:`), hérités au fork
+_defaults: dict = {}
+
+
+def configure(config: dict | None):
+    """À appeler avant de créer les process (fork) ou au démarrage d'un worker spawn."""
+    _defaults.clear()
+    _defaults.update(config or {})
+
+
+def settings() -> dict:
+    """Réglages courants (à transmettre aux process lancés en spawn)."""
+    return dict(_defaults)
+
+
+class LoopLagMonitor:
+    """Mesure le retard (lag) d'une boucle et détecte les blocages.
+
+    - Boucle asyncio (`run()`) : une tâche dort `interval` secondes et mesure
+      de combien son réveil est en retard : tout code synchrone qui bloque la
+      boucle apparaît directement dans ce retard.
+    - Boucle à thread (compass) : `add(durée)` à chaque itération.
+    - Chien de garde : un thread vérifie le dernier battement ; au-delà de
+      `stall_ms`, il capture la pile du thread bloqué et la logge (une fois par
+      emplacement et par rapport). Les attentes volontaires (`with idle():`)
+      ne comptent pas.
+    - Toutes les `report_every` secondes : log p50/p99/max + blocages, et une
+      ligne JSON (histogramme) dans `dir/loop-<nom>-<pid>.jsonl` si `dir` est défini.
+    """
+    def __init__(self, name: str = "main", interval: float | None = None,
+                 report_every: float | None = None, stall_ms: float | None = None,
+                 directory: str | None = None):
+        self.name = name
+        self.interval = interval or _defaults.get("interval", 0.05)
+        self.report_every = report_every or _defaults.get("report_every", 60.0)
+        self.stall = (stall_ms or _defaults.get("stall_ms", 250)) / 1000
+        directory = directory or _defaults.get("dir")
+        self.dir = Path(directory) if directory else None
+        self.lag = LatencyStats()
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._idle_since: float | None = None
+        self._idle_total = 0.0
+        self._thread_id: int | None = None
+        self._stop = threading.Event()
+        self._stalled = False
+        self._seen: dict[str, int] = {}         # emplacement du blocage → occurrences
+        self._last_report = time.monotonic()
+
+    @property
+    def max_lag(self) -> float:
+        """Max global depuis le démarrage (secondes)."""
+        return self.lag.max_ever
+
+    def summary(self) -> dict:
+        return self.lag.summary()
+
+    def start_watchdog(self):
+        """Surveille le thread appelant (celui qui fait tourner la boucle)."""
+        if self._thread_id is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        threading.Thread(target=self._watch, name=f"watchdog-{self.name}", daemon=True).start()
+
+    def stop_watchdog(self):
+        """Arrête le chien de garde (boucle surveillée terminée ou annulée)."""
+        self._stop.set()
+        self._thread_id = None
+
+    def beat(self):
+        self._beat = time.monotonic()
+        self._stalled = False
+
+    @contextmanager
+    def idle(self):
+        """Attente volontaire (queue, sémaphore) : ni lag ni blocage."""
+        self._idle_since = time.monotonic()
+        try:
+            yield
+        finally:
+            self._idle_total += time.monotonic() - self._idle_since
+            self._idle_since = None
+            self.beat()
+
+    def _watch(self):
+        period = min(self.interval, self.stall / 2)
+        while not self._stop.wait(period):
+            if self._idle_since is not None or self._stalled:
+                continue
+            late = time.monotonic() - self._beat
+            if late < self.stall:
+                continue
+            self._stalled = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            # Cadres internes d'asyncio retirés : reste le code qui bloque
+            stack = [f for f in traceback.extract_stack(frame)
+                     if f"{os.sep}asyncio{os.sep}" not in f.filename][-12:]
+            where = f"{stack[-1].filename}:{stack[-1].lineno}" if stack else "?"
+            self._seen[where] = self._seen.get(where, 0) + 1
+            if self._seen[where] == 1:
+                log.warning(f"[LOOP {self.name}] bloquée depuis {late * 1000:.0f}ms — pile :\n"
+                            + "".join(traceback.format_list(stack)).rstrip())
+            del frame
+
+    def add(self, seconds: float):
+        """Un échantillon de lag (boucles sans `run()`) ; vaut aussi battement."""
+        self.lag.add(seconds)
+        self.beat()
+        now = time.monotonic()
+        if now - self._last_report >= self.report_every:
+            self._report()
+            self._last_report = now
+
+    def _report(self):
+        st = self.summary()
+        buckets = self.lag.histogram(BUCKETS_MS)
+        repeated = sum(n - 1 for n in self._seen.values())
+        log.info(
+            f"[LOOP {self.name}] lag p50={st['p50_ms']:.1f}ms "
+            f"p99={st['p99_ms']:.1f}ms max={st['max_ms']:.1f}ms ({st['count']} mesures)"
+            + (f" — {self.stalls} blocage(s) > {self.stall * 1000:.0f}ms"
+               + (f" ({repeated} pile(s) déjà loggée(s))" if repeated else "")
+               if self.stalls else "")
+        )
+        if self.dir is not None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            line = {"loop": self.name, "pid": os.getpid(), "time": time.time(), **st,
+                    "buckets_ms": BUCKETS_MS, "buckets": buckets, "stalls": self.stalls,
+                    "stall_sites": self._seen}
+            with open(self.dir / f"loop-{self.name.replace('/', '_')}-{os.getpid()}.jsonl", "ab") as f:
+                f.write(speedups.dumpb(line) + b"\n")
+        self.lag.reset()
+        self.stalls = 0
+        self._seen = {}
+
+    async def run(self):
+        self.start_watchdog()
+        try:
+            while True:
+                start = time.monotonic()
+                self._idle_total = 0.0
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                lag = now - start - self.interval - self._idle_total
+                if lag >= self.stall:
+                    log.warning(f"[LOOP {self.name}] boucle bloquée {lag * 1000:.0f}ms")
+                self.add(max(0.0, lag))
+        finally:
+            # Sinon le thread continue après l'annulation et signale l'arrêt comme un blocage
+            self.stop_watchdog()
@@ -0,0 +1,216 @@
+"""Comptabilité mémoire par sous-système et rapports de fuite (section `memory:`).
+
+Chaque process enregistre les structures qui peuvent grossir
+(`memory_monitor.track("feed BTC/USDT candles", lambda f: len(f.candles), feed)`). Toutes les
+`interval` secondes le moniteur relève leur taille (éléments), la RSS du
+process et, si `tracemalloc_top` > 0, les lignes qui allouent le plus (et
+celles qui ont le plus grossi depuis le relevé précédent). Une ligne JSON
+compacte par relevé dans `dir/mem-<rôle>-<pid>.jsonl` (à tracer après un long
+run) ; un avertissement `[MEM rôle]` quand une structure ou la RSS grossit plus
+vite que `warn_items_per_hour` / `warn_rss_mb_per_hour` sur les `window` derniers
+relevés.
+"""
+import asyncio
+import os
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from pathlib import Path
+from utils import speedups
+from utils.logger import log
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    return None
+
+
+class MemoryMonitor:
+    """Tailles des structures suivies, RSS et allocations tracemalloc du process courant."""
+    def __init__(self):
+        self.enabled = False
+        self.role = "main"
+        self.dir = Path("metrics")
+        self.interval = 60.0
+        self.top = 10
+        self.frames = 1
+        self.window = 10
+        self.warn_items = 1000.0
+        self.warn_rss = 50.0
+        self._tracked: dict[str, tuple] = {}        # nom → (mesure, weakref propriétaire | None)
+        self._history: deque = deque(maxlen=self.window)     # (t, rss, {nom: taille})
+        self._snapshot = None
+        self._last = time.monotonic()
+
+    def configure(self, role: str, config: dict | None = None):
+        """À appeler au démarrage de chaque process (un fork hérite de l'état du parent)."""
+        if config is not None:
+            self.enabled = config.get("enabled", False)
+            self.dir = Path(config.get("dir", "metrics"))
+            self.interval = config.get("interval", 60.0)
+            self.top = config.get("tracemalloc_top", 10)
+            self.frames = config.get("tracemalloc_frames", 1)
+            self.window = max(2, config.get("window", 10))
+            self.warn_items = config.get("warn_items_per_hour", 1000)
+            self.warn_rss = config.get("warn_rss_mb_per_hour", 50)
+        self.role = role
+        self._tracked = {}
+        self._history = deque(maxlen=self.window)
+        self._snapshot = None
+        self._last = time.monotonic()
+        if not self.enabled or not self.top:
+            return
+        if tracemalloc.is_tracing():
+            tracemalloc.clear_traces()       # allocations héritées du parent : hors rapport
+        else:
+            tracemalloc.start(self.frames)
+
+    def settings(self) -> dict:
+        """Réglages courants (à transmettre aux process lancés en spawn)."""
+        return {"enabled": self.enabled, "dir": str(self.dir), "interval": self.interval,
+                "tracemalloc_top": self.top, "tracemalloc_frames": self.frames,
+                "window": self.window, "warn_items_per_hour": self.warn_items,
+                "warn_rss_mb_per_hour": self.warn_rss}
+
+    def track(self, name: str, measure, owner=None):
+        """Suit une structure : `measure(owner)` (ou `measure()` sans propriétaire) → nb d'éléments.
+
+        Le propriétaire est tenu par référence faible : une structure dont
+        le propriétaire a disparu sort du rapport.
+        """
+        if not self.enabled:
+            return
+        self._tracked[name] = (measure, None if owner is None else weakref.ref(owner))
+
+    def track_indicator(self, name: str, ind):
+        """Listes internes d'un indicateur (`_history`, `prices`…), indicateurs imbriqués compris (MACD)."""
+        if not self.enabled:
+            return
+        for attr, value in vars(ind).items():
+            if isinstance(value, list):
+                self.track(f"{name} {attr.lstrip('_')}", lambda i, a=attr: len(getattr(i, a)), ind)
+            elif hasattr(value, "update") and hasattr(value, "__dict__"):
+                self.track_indicator(f"{name} {attr}", value)
+
+    def untrack(self, prefix: str):
+        for name in [n for n in self._tracked if n.startswith(prefix)]:
+            del self._tracked[name]
+
+    def sizes(self) -> dict[str, int]:
+        sizes = {}
+        for name, (measure, ref) in list(self._tracked.items()):
+            if ref is None:
+                target = ()
+            else:
+                owner = ref()
+                if owner is None:
+                    del self._tracked[name]
+                    continue
+                target = (owner,)
+            try:
+                sizes[name] = measure(*target)
+            except (NotImplementedError, OSError, ValueError):
+                pass                # qsize() indisponible (macOS), queue fermée
+        return sizes
+
+    def _allocators(self) -> tuple[list, list]:
+        """(top allocations, top croissances depuis le relevé précédent) : [lieu, Ko, nb]."""
+        if not self.top or not tracemalloc.is_tracing():
+            return [], []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        top = [[f"{s.traceback[0].filename}:{s.traceback[0].lineno}", round(s.size / 1024, 1), s.count]
+               for s in snapshot.statistics("lineno")[:self.top]]
+        growth = []
+        if self._snapshot is not None:
+            growth = [[f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                       round(s.size_diff / 1024, 1), s.count_diff]
+                      for s in snapshot.compare_to(self._snapshot, "lineno")[:self.top]
+                      if s.size_diff > 0]
+        self._snapshot = snapshot
+        return top, growth
+
+    def _rates(self, now: float, rss: float | None, sizes: dict) -> tuple[float | None, dict]:
+        """Croissance par heure depuis le plus ancien relevé de la fenêtre."""
+        if len(self._history) < self.window - 1:
+            return None, {}             # fenêtre incomplète : la montée en charge n'est pas une fuite
+        t0, rss0, sizes0 = self._history[0]
+        hours = (now - t0) / 3600
+        if hours <= 0:
+            return None, {}
+        rss_rate = (rss - rss0) / hours if rss is not None and rss0 is not None else None
+        rates = {name: (size - sizes0[name]) / hours
+                 for name, size in sizes.items() if name in sizes0}
+        return rss_rate, rates
+
+    def sample(self) -> dict:
+        now = time.time()
+        rss = _rss_mb()
+        sizes = self.sizes()
+        rss_rate, rates = self._rates(now, rss, sizes)
+        top, growth = self._allocators()
+        traced = tracemalloc.get_traced_memory()[0] / 2**20 if tracemalloc.is_tracing() else None
+        self._history.append((now, rss, sizes))
+        return {"t": round(now, 1), "role": self.role, "pid": os.getpid(),
+                "rss_mb": None if rss is None else round(rss, 1),
+                "traced_mb": None if traced is None else round(traced, 1),
+                "sizes": sizes, "rss_mb_per_h": None if rss_rate is None else round(rss_rate, 1),
+                "growth_per_h": {k: round(v) for k, v in rates.items() if v},
+                "top": top, "growth": growth}
+
+    def report(self) -> dict:
+        snap = self.sample()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / f"mem-{self.role.replace('/', '_')}-{snap['pid']}.jsonl", "ab") as f:
+            f.write(speedups.dumpb(snap) + b"\n")
+
+        largest = sorted(snap["sizes"].items(), key=lambda kv: -kv[1])[:5]
+        log.info(f"[MEM {self.role}] RSS {snap['rss_mb']}Mo"
+                 + (f" (tracemalloc {snap['traced_mb']}Mo)" if snap["traced_mb"] is not None else "")
+                 + (" — " + ", ".join(f"{name} {size}" for name, size in largest) if largest else ""))
+        if snap["growth"]:
+            where, kb, count = snap["growth"][0]
+            log.info(f"[MEM {self.role}] plus forte croissance : {where} +{kb}Ko ({count:+d} blocs)")
+
+        fast = {k: v for k, v in snap["growth_per_h"].items() if v > self.warn_items}
+        if fast:
+            log.warning(f"[MEM {self.role}] croissance > {self.warn_items:.0f}/h : " + ", ".join(
+                f"{name} +{rate:.0f}/h ({snap['sizes'][name]})"
+                for name, rate in sorted(fast.items(), key=lambda kv: -kv[1])[:10])
+                + (f" … (+{len(fast) - 10})" if len(fast) > 10 else ""))
+        rss_rate = snap["rss_mb_per_h"]
+        if rss_rate is not None and rss_rate > self.warn_rss:
+            log.warning(f"[MEM {self.role}] RSS +{rss_rate:.0f}Mo/h (seuil {self.warn_rss:.0f}Mo/h)")
+        return snap
+
+    def poll(self):
+        """Boucles sans `run()` (compass) : relevé si l'intervalle est écoulé."""
+        if self.enabled and time.monotonic() - self._last >= self.interval:
+            self._last = time.monotonic()
+            self.report()
+
+    async def run(self):
+        """Tâche de fond : un relevé par intervalle, dans un thread (un snapshot
+        tracemalloc prend des centaines de ms sur un gros process)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.report)
+
+
+# Singleton par process
+memory_monitor = MemoryMonitor()
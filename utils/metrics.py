@@ -0,0 +1,40 @@
+from bisect import bisect_left
+from collections import deque
+
+
+class LatencyStats:
+    """Fenêtre glissante d'échantillons de latence (secondes) → p50/p99/max en ms."""
+    def __init__(self, size: int = 10_000):
+        self._samples: deque[float] = deque(maxlen=size)
+        self.total_count = 0          # depuis le démarrage (non remis à zéro)
+        self.max_ever = 0.0
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self.total_count += 1
+        if seconds > self.max_ever:
+            self.max_ever = seconds
+
+    def __len__(self):
+        return len(self._samples)
+
+    def summary(self) -> dict:
+        if not self._samples:
+            return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        s = sorted(self._samples)
+        return {
+            "count": len(s),
+            "p50_ms": s[len(s) // 2] * 1000,
+            "p99_ms": s[min(len(s) - 1, int(len(s) * 0.99))] * 1000,
+            "max_ms": s[-1] * 1000,
+        }
+
+    def histogram(self, bounds_ms) -> list[int]:
+        """Nombre d'échantillons par bucket (bornes en ms, dernier bucket = au-delà)."""
+        counts = [0] * (len(bounds_ms) + 1)
+        for s in self._samples:
+            counts[bisect_left(bounds_ms, s * 1000)] += 1
+        return counts
+
+    def reset(self):
+        self._samples.clear()
@@ -0,0 +1,337 @@
+"""Profilage par process (main, charts, compass, workers) et sections chaudes nommées.
+
+Profilage global (`python main.py --profile cpu|sample`), choisi au lancement :
+- `cpu`    : cProfile déterministe sur le thread de la boucle du process
+             → `<dir>/<rôle>-<pid>.prof` (pstats, snakeviz).
+- `sample` : échantillonneur statistique (thread dédié, `sys._current_frames`,
+             `hz` Hz, temps mur) sur tous les threads du process
+             → `<dir>/<rôle>-<pid>.folded` (flamegraph.pl, speedscope).
+Les fichiers sont réécrits (cumulés) toutes les `interval` secondes : les
+process chart sont tués par killpg à l'arrêt, le dernier état reste sur disque.
+
+Sections chaudes (`Section("candle_build")`) : désactivées, elles coûtent
+l'appel de `__enter__` / `__exit__` (un test d'attribut chacun) par passage.
+SIGUSR2 les active / désactive dans le process qui le reçoit, sans
+redémarrage. `pkill -USR2 -f main.py` atteint le process principal et ses
+fils forkés (charts, compass, PNL) ; les process lancés en spawn (workers
+stratégie, shards) n'ont pas cette ligne de commande : le principal leur
+relaie le signal (`relay()`), et un shard à ses fenêtres et workers. À la
+désactivation : durées par section dans le log et
+`<dir>/<rôle>-<pid>-sections-<n>.prof` (cProfile restreint aux sections synchrones).
+"""
+import asyncio
+import cProfile
+import functools
+import inspect
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from utils.logger import log
+from utils.metrics import LatencyStats
+
+MODES = ("cpu", "sample")
+
+# Réglages communs (CLI de main.py), hérités au fork
+_defaults: dict = {}
+
+
+def configure(config: dict | None):
+    """À appeler avant de créer les process (fork) ou au démarrage d'un worker spawn.
+
+    Clés : `mode` (`cpu`, `sample` ou None), `dir`, `hz`, `interval`, `roles`
+    (préfixes de rôle profilés : `main`, `chart`, `compass`, `pnl`, `strategy`, `shard` ;
+    tous si vide). Les sections restent activables partout.
+    """
+    _defaults.clear()
+    _defaults.update(config or {})
+
+
+def settings() -> dict:
+    """Réglages courants (à transmettre aux process lancés en spawn)."""
+    return dict(_defaults)
+
+
+class _Sampler:
+    """Piles de tous les threads (sauf le sien) toutes les 1/hz s, agrégées par pile."""
+    def __init__(self, hz: int):
+        self.period = 1 / hz
+        self.counts: dict[tuple, int] = {}       # (thread, codes racine → feuille) → échantillons
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.period):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for tid, frame in frames.items():
+                    if tid == own:
+                        continue
+                    codes = []
+                    while frame is not None:
+                        codes.append(frame.f_code)
+                        frame = frame.f_back
+                    key = (names.get(tid, str(tid)), tuple(reversed(codes)))
+                    self.counts[key] = self.counts.get(key, 0) + 1
+            del frames
+
+    def dump(self, path: Path):
+        """Format « folded » : `thread;racine;...;feuille N` par ligne."""
+        with self._lock:
+            counts = list(self.counts.items())
+        with open(path, "w") as f:
+            for (thread, codes), n in sorted(counts, key=lambda kv: -kv[1]):
+                frames = ";".join(f"{getattr(c, 'co_qualname', c.co_name)} "
+                                  f"({os.path.basename(c.co_filename)}:{c.co_firstlineno})"
+                                  for c in codes)
+                f.write(f"{thread};{frames} {n}\n")
+
+
+class _Sections:
+    """État des sections du process : activation, durées, cProfile dédié."""
+    def __init__(self):
+        self.on = False
+        self.pending = False          # rapport à écrire (hors handler de signal)
+        self.generation = 0
+        self.started = 0.0
+        self.stats: dict[str, LatencyStats] = {}
+        self.totals: dict[str, float] = {}
+        self.profiler: cProfile.Profile | None = None
+        self.profiled = 0
+        self.depth = 0
+
+    def toggle(self, *_):
+        if self.on:
+            self.on = False
+            self.pending = True
+            return
+        self.generation += 1
+        self.started = time.monotonic()
+        self.stats, self.totals = {}, {}
+        # Un seul cProfile par thread : avec `--profile cpu`, durées seulement
+        self.profiler = cProfile.Profile() if _state.cprofile is None else None
+        self.profiled, self.depth = 0, 0
+        self.on = True
+        log.info(f"[PROFILE {_state.role}] sections activées (SIGUSR2 pour arrêter)")
+
+    def enter(self):
+        if self.depth == 0 and self.profiler is not None:
+            self.profiler.enable()
+        self.depth += 1
+
+    def leave(self):
+        self.depth = max(0, self.depth - 1)
+        if self.depth == 0 and self.profiler is not None:
+            self.profiler.disable()
+            self.profiled += 1
+
+    def record(self, name: str, seconds: float):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LatencyStats()
+            self.totals[name] = 0.0
+        stats.add(seconds)
+        self.totals[name] += seconds
+
+    def report(self):
+        self.pending = False
+        elapsed = time.monotonic() - self.started
+        role = _state.role
+        if not self.stats:
+            log.info(f"[PROFILE {role}] sections désactivées — aucune section exécutée")
+            return
+        log.info(f"[PROFILE {role}] sections ({elapsed:.0f}s) — " + " | ".join(
+            f"{name} n={stats.total_count} p50={st['p50_ms']:.3f}ms p99={st['p99_ms']:.3f}ms "
+            f"max={st['max_ms']:.3f}ms total={self.totals[name]:.2f}s"
+            for name, stats in sorted(self.stats.items(), key=lambda kv: -self.totals[kv[0]])
+            for st in (stats.summary(),)))
+        if self.profiler is not None and self.profiled and self.depth == 0:
+            path = _state.path(f"-sections-{self.generation}.prof")
+            self.profiler.dump_stats(path)
+            log.info(f"[PROFILE {role}] profil des sections → {path}")
+        self.profiler = None
+
+
+_sections = _Sections()
+
+# Sources de pids à qui relayer SIGUSR2 (process fils lancés en spawn, fenêtres d'un shard)
+_relays: list = []
+
+
+def _on_signal(*_):
+    _sections.toggle()
+    for pids in _relays:
+        for pid in pids():
+            try:
+                os.kill(pid, signal.SIGUSR2)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+
+def relay(pids):
+    """`pids()` → pids qui reçoivent aussi chaque SIGUSR2 reçu par ce process
+    (après `start()`, qui efface les relais hérités du parent)."""
+    _relays.append(pids)
+
+
+def install_signal():
+    """Pose le handler SIGUSR2 (thread principal seulement). À faire avant de forker
+    des fils : ils en héritent, sinon SIGUSR2 les tue (action par défaut)."""
+    if hasattr(signal, "SIGUSR2") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR2, _on_signal)
+
+
+class Section:
+    """Section chaude nommée : `with SECTION:` (synchrone, non réentrante) ou décorateur.
+
+    Décorée, une coroutine n'est que chronométrée (un cProfile à travers un
+    `await` mesurerait les autres tâches de la boucle).
+    """
+    __slots__ = ("name", "_t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._t0 = None
+
+    def __enter__(self):
+        if _sections.on:
+            _sections.enter()
+            self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._t0 is not None:
+            elapsed = time.perf_counter() - self._t0
+            self._t0 = None
+            _sections.leave()
+            _sections.record(self.name, elapsed)
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def _timed(*args, **kwargs):
+                if not _sections.on:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _sections.record(name, time.perf_counter() - start)
+            return _timed
+
+        @functools.wraps(fn)
+        def _wrapped(*args, **kwargs):
+            with self:
+                return fn(*args, **kwargs)
+        return _wrapped
+
+
+class _State:
+    def __init__(self):
+        self.role = "main"
+        self.mode: str | None = None
+        self.dir = Path("profiles")
+        self.interval = 30.0
+        self.cprofile: cProfile.Profile | None = None
+        self.sampler: _Sampler | None = None
+        self.last_dump = time.monotonic()
+
+    def path(self, suffix: str) -> Path:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return self.dir / f"{self.role.replace('/', '_')}-{os.getpid()}{suffix}"
+
+
+_state = _State()
+
+
+def start(role: str):
+    """Démarre le profilage du process courant sous le nom `role`.
+
+    En mode `cpu`, seul le thread appelant est profilé : appeler depuis le
+    thread de la boucle (compass : thread de rendu). Un fork hérite du
+    profileur du parent : il est arrêté et remplacé.
+    """
+    if _state.cprofile is not None:
+        _state.cprofile.disable()
+    if _state.sampler is not None:
+        _state.sampler.stop()
+    _state.role = role
+    _state.cprofile = _state.sampler = None
+    _sections.__init__()
+    _relays.clear()              # relais du parent (fork) : pas ceux de ce process
+    install_signal()
+
+    mode = _defaults.get("mode")
+    roles = _defaults.get("roles")
+    if mode is None or (roles and role.split("-")[0] not in roles):
+        _state.mode = None
+        return
+    _state.mode = mode
+    _state.dir = Path(_defaults.get("dir", "profiles"))
+    _state.interval = _defaults.get("interval", 30.0)
+    _state.last_dump = time.monotonic()
+    if mode == "cpu":
+        _state.cprofile = cProfile.Profile()
+        _state.cprofile.enable()
+    else:
+        _state.sampler = _Sampler(_defaults.get("hz", 100)).start()
+    log.info(f"[PROFILE {role}] profilage {mode} → {_state.path('.prof' if mode == 'cpu' else '.folded')}")
+
+
+def dump():
+    """Écrit le profil cumulé (mode `cpu` : depuis le thread profilé)."""
+    _state.last_dump = time.monotonic()
+    if _state.cprofile is not None:
+        _state.cprofile.dump_stats(_state.path(".prof"))     # dump_stats désactive
+        _state.cprofile.enable()
+    elif _state.sampler is not None:
+        _state.sampler.dump(_state.path(".folded"))
+
+
+def poll():
+    """Rapport de sections en attente et dump périodique (appelé par la boucle)."""
+    if _sections.pending:
+        _sections.report()
+    if _state.mode and time.monotonic() - _state.last_dump >= _state.interval:
+        dump()
+
+
+def stop():
+    """Dernier dump et arrêt du profilage global."""
+    if _sections.pending or _sections.on:
+        _sections.on = False
+        _sections.report()
+    if _state.mode is None:
+        return
+    dump()
+    if _state.cprofile is not None:
+        _state.cprofile.disable()
+    if _state.sampler is not None:
+        _state.sampler.stop()
+    log.info(f"[PROFILE {_state.role}] profil écrit dans {_state.dir}")
+    _state.mode = _state.cprofile = _state.sampler = None
+
+
+async def run(period: float = 0.5):
+    """Tâche de fond des process asyncio : `poll()` régulier, dump à l'arrêt."""
+    try:
+        while True:
+            await asyncio.sleep(period)
+            poll()
+    finally:
+        if _state.mode:
+            dump()
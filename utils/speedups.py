@@ -0,0 +1,91 @@
+"""Profil d'exécution rapide (section `speedups:`) : uvloop et orjson, optionnels.
+
+- `uvloop` : boucle asyncio de libuv pour main, charts, PNL et workers
+  stratégie (`speedups.run(main())` à la place de `asyncio.run`).
+- `orjson` : tout le JSON qui sort du process (frames du compass vers le JS,
+  exports JSONL trace / loop / mémoire, cache des marchés) via
+  `speedups.dumps` / `speedups.loads`.
+
+Paquet absent ou option désactivée → asyncio et `json` standard, même sortie
+(JSON compact). `configure()` dans le process principal avant les forks ;
+les workers spawn reçoivent `settings()` dans leur spec.
+"""
+import asyncio
+import json
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Options demandées (config), héritées au fork
+_defaults: dict = {"uvloop": False, "orjson": False}
+
+# np.float32/np.int64, tableaux numpy ; clés int/float converties en str comme json
+_ORJSON_OPTS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def configure(config: dict | None):
+    """Clés : `uvloop`, `orjson` (bool, défaut False)."""
+    config = config or {}
+    _defaults["uvloop"] = bool(config.get("uvloop", False))
+    _defaults["orjson"] = bool(config.get("orjson", False))
+
+
+def settings() -> dict:
+    """Réglages courants (à transmettre aux process lancés en spawn)."""
+    return dict(_defaults)
+
+
+def use_uvloop() -> bool:
+    return _defaults["uvloop"] and uvloop is not None
+
+
+def use_orjson() -> bool:
+    return _defaults["orjson"] and orjson is not None
+
+
+def describe() -> str:
+    """Backends effectifs, pour le log de démarrage (signale les paquets manquants)."""
+    def one(name: str, module, fallback: str) -> str:
+        if not _defaults[name]:
+            return fallback
+        return name if module is not None else f"{fallback} ({name} absent)"
+    return f"boucle {one('uvloop', uvloop, 'asyncio')}, JSON {one('orjson', orjson, 'json')}"
+
+
+def dumps(obj) -> str:
+    """JSON compact (str)."""
+    if use_orjson():
+        return orjson.dumps(obj, option=_ORJSON_OPTS).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def dumpb(obj) -> bytes:
+    """JSON compact (bytes) : fichiers ouverts en binaire, sans décodage intermédiaire."""
+    if use_orjson():
+        return orjson.dumps(obj, option=_ORJSON_OPTS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def loads(data: str | bytes):
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    return uvloop.new_event_loop() if use_uvloop() else asyncio.new_event_loop()
+
+
+def run(main):
+    """`asyncio.run(main)` sur une boucle uvloop si activée."""
+    if not use_uvloop():
+        return asyncio.run(main)
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        return runner.run(main)
@@ -0,0 +1,86 @@
+"""Traces de latence de bout en bout : trade Binance → bougie rendue dans le chart.
+
+Chaque message bougie porte un tuple `_trace` complété à chaque étape :
+    (ts trade exchange ms, réception wall s, réception mono, traitement mono, mise en queue mono)
+Les étapes sont mesurées en horloge monotone (commune aux process sous
+Linux), sauf exchange → réception qui compare au timestamp Binance (horloge
+murale, inclut le décalage d'horloge). Chaque process tient ses propres
+histogrammes par étape et les exporte en JSON lines dans `trace.dir`.
+"""
+import asyncio
+import os
+import time
+from pathlib import Path
+from utils import speedups
+from utils.logger import log
+from utils.metrics import LatencyStats
+
+# Bornes des buckets exportés (ms), dernier bucket = au-delà
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Tracer:
+    """Histogrammes de latence par étape pour le process courant."""
+    def __init__(self):
+        self.enabled = False
+        self.role = "main"
+        self.dir = Path("metrics")
+        self.interval = 10.0
+        self.stages: dict[str, LatencyStats] = {}
+
+    def configure(self, role: str, config: dict | None = None):
+        """À appeler au démarrage de chaque process (un fork hérite de l'état du parent)."""
+        if config is not None:
+            self.enabled = config.get("enabled", False)
+            self.dir = Path(config.get("dir", "metrics"))
+            self.interval = config.get("interval", 10.0)
+        self.role = role
+        self.stages = {}
+
+    def record(self, stage: str, seconds: float):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = LatencyStats()
+        stats.add(seconds)
+
+    def record_candle(self, stamps: tuple, dequeued: float, rendered: float):
+        """Fin de parcours (process chart) : queue, rendu et total de bout en bout."""
+        exchange_ms, recv_wall, recv_mono, _, enqueued = stamps
+        self.record("queue", dequeued - enqueued)
+        self.record("render", rendered - dequeued)
+        self.record("total", max(0.0, recv_wall - exchange_ms / 1000) + rendered - recv_mono)
+
+    def snapshot(self) -> dict:
+        stages = {}
+        for name, stats in self.stages.items():
+            stages[name] = {**stats.summary(), "buckets": stats.histogram(BUCKETS_MS)}
+            stats.reset()
+        return {"role": self.role, "pid": os.getpid(), "time": time.time(),
+                "buckets_ms": BUCKETS_MS, "stages": stages}
+
+    def export(self) -> dict:
+        snap = self.snapshot()
+        active = {k: v for k, v in snap["stages"].items() if v["count"]}
+        if not active:
+            return snap
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"trace-{self.role.replace('/', '_')}-{snap['pid']}.jsonl"
+        with open(path, "ab") as f:
+            f.write(speedups.dumpb(snap) + b"\n")
+        log.info(f"[TRACE {self.role}] " + " | ".join(
+            f"{name} p50={st['p50_ms']:.2f}ms p99={st['p99_ms']:.2f}ms max={st['max_ms']:.2f}ms"
+            for name, st in active.items()))
+        return snap
+
+    async def run(self):
+        """Tâche de fond : export périodique (une ligne JSON par intervalle)."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.export()
+        finally:
+            self.export()
+
+
+# Singleton par process
+tracer = Tracer()